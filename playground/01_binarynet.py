@@ -20,6 +20,9 @@ train_labels = tf.keras.utils.to_categorical(train_labels, num_classes)
 test_labels = tf.keras.utils.to_categorical(test_labels, num_classes)
 
 
+# Zero padding can't be represented by binary activations in hardware.
+padding_kwargs = dict(padding="same", pad_values=1.0)
+
 # All quantized layers except the first will use the same options
 kwargs = dict(
     input_quantizer="ste_sign",
@@ -40,17 +43,17 @@ model = tf.keras.models.Sequential(
             input_shape=(32, 32, 3),
         ),
         tf.keras.layers.BatchNormalization(momentum=0.999, scale=False),
-        lq.layers.QuantConv2D(128, 3, padding="same", **kwargs),
+        lq.layers.QuantConv2D(128, 3, **padding_kwargs, **kwargs),
         tf.keras.layers.MaxPool2D(pool_size=(2, 2), strides=(2, 2)),
         tf.keras.layers.BatchNormalization(momentum=0.999, scale=False),
-        lq.layers.QuantConv2D(256, 3, padding="same", **kwargs),
+        lq.layers.QuantConv2D(256, 3, **padding_kwargs, **kwargs),
         tf.keras.layers.BatchNormalization(momentum=0.999, scale=False),
-        lq.layers.QuantConv2D(256, 3, padding="same", **kwargs),
+        lq.layers.QuantConv2D(256, 3, **padding_kwargs, **kwargs),
         tf.keras.layers.MaxPool2D(pool_size=(2, 2), strides=(2, 2)),
         tf.keras.layers.BatchNormalization(momentum=0.999, scale=False),
-        lq.layers.QuantConv2D(512, 3, padding="same", **kwargs),
+        lq.layers.QuantConv2D(512, 3, **padding_kwargs, **kwargs),
         tf.keras.layers.BatchNormalization(momentum=0.999, scale=False),
-        lq.layers.QuantConv2D(512, 3, padding="same", **kwargs),
+        lq.layers.QuantConv2D(512, 3, **padding_kwargs, **kwargs),
         tf.keras.layers.MaxPool2D(pool_size=(2, 2), strides=(2, 2)),
         tf.keras.layers.BatchNormalization(momentum=0.999, scale=False),
         tf.keras.layers.Flatten(),
@@ -1,21 +1,64 @@
+import argparse
 from dataclasses import dataclass
+import json
 import math
-from random import randint
-from typing import Dict, List, Optional
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
 
-from bitstring import Bits
-import larq as lq
 import numpy as np
-import tensorflow as tf
 
-# TODO: copied from test_utils.general
-def to_fixedint(number: int, bitwidth: int, is_unsigned: bool = True):
-    """Convert signed int to fixed int."""
+
+def bits_to_literal(bits: np.ndarray) -> str:
+    """Convert an array of bits (MSB first) to a sized hexadecimal literal."""
+    padding = -len(bits) % 8
+    packed = np.packbits(np.concatenate((np.zeros(padding, dtype=np.uint8), bits)))
+    # Each four padding bits yield a leading zero digit.
+    return f'{len(bits)}x"{packed.tobytes().hex()[padding // 4:]}"'
+
+
+def literal_to_bits(literal: str) -> np.ndarray:
+    """Convert a binary or sized hexadecimal literal to an array of bits
+    (MSB first)."""
+    match = re.fullmatch(r'(\d+)x"([0-9a-fA-F]*)"', literal)
+    if match is None:
+        return np.frombuffer(literal.strip('"').encode(), dtype=np.uint8) - ord("0")
+    length, digits = int(match.group(1)), match.group(2)
+    # bytes.fromhex() needs an even number of digits
+    digits = digits.zfill(len(digits) + len(digits) % 2)
+    bits = np.unpackbits(np.frombuffer(bytes.fromhex(digits), dtype=np.uint8))
+    return bits[len(bits) - length :]
+
+
+def to_fixedint(numbers: np.ndarray, bitwidth: int, is_unsigned: bool = True):
+    """Convert signed integers to fixed integers, i. e. two's complement."""
     if is_unsigned:
-        number_dict = {"uint": number, "length": bitwidth}
+        lower, upper = 0, 2 ** bitwidth
     else:
-        number_dict = {"int": number, "length": bitwidth}
-    return int(Bits(**number_dict).bin, 2)
+        lower, upper = -(2 ** (bitwidth - 1)), 2 ** (bitwidth - 1)
+    if np.any((numbers < lower) | (numbers >= upper)):
+        raise ValueError(f"Values don't fit in {bitwidth} bit: {numbers}")
+    return np.mod(numbers, 2 ** bitwidth)
+
+
+def thresholds_to_bits(thresholds, bitwidth: int, is_unsigned: bool) -> np.ndarray:
+    """Convert the thresholds to fixed point bits."""
+    # The hardware activates at "data > threshold", the model at
+    # "data >= threshold". Both are equal for the integer ceil(threshold) - 1.
+    t_int = np.ceil(np.asarray(thresholds, dtype=np.float64)).astype(np.int64) - 1
+    if is_unsigned:
+        # a negative threshold activates always, like 0 except for data = 0
+        t_int = np.maximum(t_int, 0)
+    t_fixedint = to_fixedint(
+        t_int,
+        bitwidth,
+        is_unsigned=is_unsigned,
+    )
+    # TODO: Thresholds are somehow reversed. Check why.
+    # The first threshold contains the most significant bits.
+    bits = (t_fixedint[:, np.newaxis] >> np.arange(bitwidth - 1, -1, -1)) & 1
+    return bits.astype(np.uint8).flatten()
 
 
 @dataclass
@@ -35,11 +78,17 @@ class Layer:
         self.signals = []
         self.previous_layer_info = None
 
+        # start and end of frame, valid together with the control signal
+        self.frame_signals = [
+            Parameter(f"sl_sof_{name}", "std_logic"),
+            Parameter(f"sl_eof_{name}", "std_logic"),
+        ]
+
     def get_constants(self) -> List[Parameter]:
         return list(self.constants.values())
 
     def get_signals(self) -> List[Parameter]:
-        return self.signals
+        return self.signals + self.frame_signals
 
     def update(self, previous_layer_info):
         pass
@@ -53,14 +102,25 @@ class Layer:
 
 class Convolution(Layer):
     def __init__(self, name, input_channel, input_channel_bitwidth, parameter):
-        super().__init__(name, parameter)
+        # no folding by default, i. e. all output channel are computed in parallel
+        # no padding by default
+        defaults = [
+            Parameter("C_FOLDING", "integer", "1"),
+            Parameter("C_PAD", "integer", "0"),
+            Parameter("C_PAD_VALUE", "integer", "0"),
+        ]
+        super().__init__(name, defaults + parameter)
 
         self.control_signal = Parameter(f"sl_valid_{self.info['name']}", "std_logic")
-        self.signals = [self.control_signal]
+        self.ready_signal = Parameter(f"sl_rdy_{self.info['name']}", "std_logic")
+        self.signals = [self.control_signal, self.ready_signal]
 
         self.input_channel = input_channel
         self.input_channel_bitwidth = input_channel_bitwidth
 
+        # If set, the weights and thresholds are read from rom init files.
+        self.init_file_directory = None
+
     def update(self, previous_layer_info):
         self.previous_name = previous_layer_info["name"]
 
@@ -68,7 +128,7 @@ class Convolution(Layer):
             f"slv_data_{self.info['name']}",
             f"std_logic_vector(C_OUTPUT_CHANNEL_{self.info['name'].upper()} * C_OUTPUT_CHANNEL_BITWIDTH_{self.info['name'].upper()} - 1 downto 0)",
         )
-        self.signals.append(self.data_signal)
+        self.signals = [self.control_signal, self.ready_signal, self.data_signal]
 
         # channel
         self.info["channel"] = int(self.constants["C_OUTPUT_CHANNEL"].value)
@@ -100,11 +160,13 @@ class Convolution(Layer):
             previous_layer_info["width"],
             int(self.constants["C_KERNEL_SIZE"].value),
             int(self.constants["C_STRIDE"].value),
+            int(self.constants["C_PAD"].value),
         )
         self.info["height"] = new_size(
             previous_layer_info["height"],
             int(self.constants["C_KERNEL_SIZE"].value),
             int(self.constants["C_STRIDE"].value),
+            int(self.constants["C_PAD"].value),
         )
 
     def add_weights(self, weights=None):
@@ -113,17 +175,17 @@ class Convolution(Layer):
         bitwidth = output_channel * self.input_channel * kernel_size ** 2
 
         if weights is None:
-            slv_weights = "".join([str(randint(0, 1)) for _ in range(bitwidth)])
+            slv_weights = np.random.randint(0, 2, bitwidth, dtype=np.uint8)
         else:
             # TODO: sanity checks
             # https://docs.larq.dev/larq/api/quantizers/#stesign
             # TODO: Weights are somehow reversed. Check why.
-            slv_weights = "".join(["0" if t < 0 else "1" for t in weights])
+            slv_weights = (np.asarray(weights) >= 0).astype(np.uint8)
 
         self.constants["C_WEIGHTS"] = Parameter(
             f"C_WEIGHTS_{self.info['name'].upper()}",
             f"std_logic_vector({bitwidth} - 1 downto 0)",
-            f'"{slv_weights}"',
+            bits_to_literal(slv_weights),
         )
 
     def add_thresholds(self, thresholds=None):
@@ -137,31 +199,68 @@ class Convolution(Layer):
         total_bitwidth = output_channel * threshold_bitwidth
         if thresholds is None:
             # TODO: Random option for signed?
-            slv_thresholds = "".join(
-                [str(randint(0, 1)) for _ in range(total_bitwidth)]
-            )
+            slv_thresholds = np.random.randint(0, 2, total_bitwidth, dtype=np.uint8)
         else:
             # TODO: sanity checks
-            slv_thresholds_list = []
-            for t in thresholds:
-                t_fixedint = to_fixedint(
-                    int(t),
-                    threshold_bitwidth,
-                    is_unsigned=self.input_channel_bitwidth == 1,
-                )
-                slv_thresholds_list.append(
-                    bin(t_fixedint)[2:].zfill(threshold_bitwidth)
-                )
-            # TODO: Thresholds are somehow reversed. Check why.
-            slv_thresholds = "".join(slv_thresholds_list)
-            assert all([bit in ["0", "1"] for bit in slv_thresholds]), slv_thresholds
+            slv_thresholds = thresholds_to_bits(
+                thresholds, threshold_bitwidth, self.input_channel_bitwidth == 1
+            )
         self.constants["C_THRESHOLDS"] = Parameter(
             f"C_THRESHOLDS_{self.info['name'].upper()}",
             f"std_logic_vector({total_bitwidth} - 1 downto 0)",
-            f'"{slv_thresholds}"',
+            bits_to_literal(slv_thresholds),
         )
 
+    def write_init_files(self):
+        """Write the weights and thresholds to rom init files. Each line contains
+        the hexadecimal weights (thresholds) of one output channel slice."""
+        folding = int(self.constants["C_FOLDING"].value)
+        output_channel = int(self.constants["C_OUTPUT_CHANNEL"].value)
+
+        # least significant bit first
+        weights = literal_to_bits(self.constants["C_WEIGHTS"].value)[::-1]
+        thresholds = literal_to_bits(self.constants["C_THRESHOLDS"].value)[::-1]
+        # output channel increments fastest for the weights and slowest for the thresholds
+        parameter = {
+            "WEIGHTS": weights.reshape(-1, output_channel).T,
+            "THRESHOLDS": thresholds.reshape(output_channel, -1),
+        }
+
+        os.makedirs(self.init_file_directory, exist_ok=True)
+        for kind, values in parameter.items():
+            filename = os.path.abspath(
+                os.path.join(
+                    self.init_file_directory,
+                    f"{kind.lower()}_{self.info['name']}.mem",
+                )
+            )
+            with open(filename, "w") as outfile:
+                for row in values.reshape(folding, -1):
+                    # only the digits of the literal
+                    outfile.write(bits_to_literal(row[::-1]).split('"')[1] + "\n")
+            self.constants[f"C_{kind}_FILE"] = Parameter(
+                f"C_{kind}_FILE_{self.info['name'].upper()}", "string", f'"{filename}"'
+            )
+
+    def get_constants(self) -> List[Parameter]:
+        constants = dict(self.constants)
+        if "C_WEIGHTS_FILE" in constants:
+            # The weights and thresholds are read from the init files.
+            del constants["C_WEIGHTS"], constants["C_THRESHOLDS"]
+        return list(constants.values())
+
     def get_instance(self):
+        if "C_WEIGHTS_FILE" in self.constants:
+            init_files = f""",
+
+    C_WEIGHTS_FILE    => {self.constants["C_WEIGHTS_FILE"].name},
+    C_THRESHOLDS_FILE => {self.constants["C_THRESHOLDS_FILE"].name}"""
+            weights = thresholds = "(others => '0')"
+        else:
+            init_files = ""
+            weights = self.constants["C_WEIGHTS"].name
+            thresholds = self.constants["C_THRESHOLDS"].name
+
         return f"""
 i_convolution_{self.info["name"]} : entity bnn_lib.window_convolution_activation
   generic map (
@@ -174,17 +273,27 @@ i_convolution_{self.info["name"]} : entity bnn_lib.window_convolution_activation
     C_OUTPUT_CHANNEL_BITWIDTH => {self.constants["C_OUTPUT_CHANNEL_BITWIDTH"].name},
 
     C_IMG_WIDTH  => {self.constants["C_IMG_WIDTH"].name},
-    C_IMG_HEIGHT => {self.constants["C_IMG_HEIGHT"].name}
+    C_IMG_HEIGHT => {self.constants["C_IMG_HEIGHT"].name},
+
+    C_PAD       => {self.constants["C_PAD"].name},
+    C_PAD_VALUE => {self.constants["C_PAD_VALUE"].name},
+
+    C_FOLDING => {self.constants["C_FOLDING"].name}{init_files}
   )
   port map (
     isl_clk        => isl_clk,
     isl_start      => isl_start,
     isl_valid      => sl_valid_{self.previous_name},
+    isl_sof        => sl_sof_{self.previous_name},
+    isl_eof        => sl_eof_{self.previous_name},
     islv_data      => slv_data_{self.previous_name},
-    islv_weights   => {self.constants["C_WEIGHTS"].name},
-    islv_threshold => {self.constants["C_THRESHOLDS"].name},
+    islv_weights   => {weights},
+    islv_threshold => {thresholds},
     oslv_data      => {self.data_signal.name},
-    osl_valid      => {self.control_signal.name}
+    osl_valid      => {self.control_signal.name},
+    osl_sof        => sl_sof_{self.info['name']},
+    osl_eof        => sl_eof_{self.info['name']},
+    osl_rdy        => {self.ready_signal.name}
   );"""
 
 
@@ -245,9 +354,13 @@ i_maximum_pooling_{self.info["name"]} : entity bnn_lib.window_maximum_pooling
     isl_clk   => isl_clk,
     isl_start => isl_start,
     isl_valid => sl_valid_{self.previous_name},
+    isl_sof   => sl_sof_{self.previous_name},
+    isl_eof   => sl_eof_{self.previous_name},
     islv_data => slv_data_{self.previous_name},
     oslv_data => {self.data_signal.name},
-    osl_valid => {self.control_signal.name}
+    osl_valid => {self.control_signal.name},
+    osl_sof   => sl_sof_{self.info['name']},
+    osl_eof   => sl_eof_{self.info['name']}
   );"""
 
 
@@ -276,7 +389,7 @@ class Serializer(Layer):
             f"slv_data_{self.info['name']}",
             f"std_logic_vector({self.constants['C_DATA_BITWIDTH'].name} - 1 downto 0)",
         )
-        self.signals.append(self.data_signal)
+        self.signals = [self.control_signal, self.data_signal]
 
     def get_instance(self):
         return f"""
@@ -288,9 +401,13 @@ i_serializer_{self.info["name"]} : entity util.serializer
   port map (
     isl_clk        => isl_clk,
     isl_valid      => sl_valid_{self.previous_name},
+    isl_sof        => sl_sof_{self.previous_name},
+    isl_eof        => sl_eof_{self.previous_name},
     islv_data      => slv_data_{self.previous_name},
     oslv_data      => {self.data_signal.name},
-    osl_valid      => {self.control_signal.name}
+    osl_valid      => {self.control_signal.name},
+    osl_sof        => sl_sof_{self.info['name']},
+    osl_eof        => sl_eof_{self.info['name']}
   );"""
 
 
@@ -329,7 +446,7 @@ class AveragePooling(Layer):
             f"slv_data_{self.info['name']}",
             f"std_logic_vector({self.constants['C_BITWIDTH'].name} - 1 downto 0)",
         )
-        self.signals.append(self.data_signal)
+        self.signals = [self.control_signal, self.data_signal]
 
     def get_instance(self):
         return f"""
@@ -345,9 +462,238 @@ i_average_pooling_{self.info["name"]} : entity bnn_lib.average_pooling
     isl_clk   => isl_clk,
     isl_start => isl_start,
     isl_valid => sl_valid_{self.previous_name},
+    isl_sof   => sl_sof_{self.previous_name},
+    isl_eof   => sl_eof_{self.previous_name},
+    islv_data => slv_data_{self.previous_name},
+    oslv_data => {self.data_signal.name},
+    osl_valid => {self.control_signal.name},
+    osl_sof   => sl_sof_{self.info['name']},
+    osl_eof   => sl_eof_{self.info['name']}
+  );"""
+
+
+class Dense(Layer):
+    def __init__(
+        self,
+        name,
+        input_height,
+        input_width,
+        input_channel,
+        input_channel_bitwidth,
+        parameter,
+    ):
+        super().__init__(name, parameter)
+
+        self.control_signal = Parameter(f"sl_valid_{self.info['name']}", "std_logic")
+        self.signals = [self.control_signal]
+
+        # The flattened input is processed as pixel stream.
+        self.input_pixel = input_height * input_width
+        self.input_channel = input_channel
+        self.input_channel_bitwidth = input_channel_bitwidth
+
+        # If set, the weights are read from a rom init file.
+        self.init_file_directory = None
+
+    def update(self, previous_layer_info):
+        self.previous_name = previous_layer_info["name"]
+
+        self.data_signal = Parameter(
+            f"slv_data_{self.info['name']}",
+            f"std_logic_vector(C_OUTPUT_CHANNEL_{self.info['name'].upper()} * C_OUTPUT_CHANNEL_BITWIDTH_{self.info['name'].upper()} - 1 downto 0)",
+        )
+        self.signals = [self.control_signal, self.data_signal]
+
+        self.constants["C_INPUT_CHANNEL"] = Parameter(
+            f"C_INPUT_CHANNEL_{self.info['name'].upper()}",
+            "integer",
+            previous_layer_info["channel"],
+        )
+        self.constants["C_INPUT_CHANNEL_BITWIDTH"] = Parameter(
+            f"C_INPUT_CHANNEL_BITWIDTH_{self.info['name'].upper()}",
+            "integer",
+            previous_layer_info["bitwidth"],
+        )
+        self.constants["C_IMG_WIDTH"] = Parameter(
+            f"C_IMG_WIDTH_{self.info['name'].upper()}",
+            "integer",
+            str(previous_layer_info["width"]),
+        )
+        self.constants["C_IMG_HEIGHT"] = Parameter(
+            f"C_IMG_HEIGHT_{self.info['name'].upper()}",
+            "integer",
+            str(previous_layer_info["height"]),
+        )
+
+        # The output is a single pixel.
+        self.info["channel"] = int(self.constants["C_OUTPUT_CHANNEL"].value)
+        self.info["bitwidth"] = int(self.constants["C_OUTPUT_CHANNEL_BITWIDTH"].value)
+        self.info["width"] = 1
+        self.info["height"] = 1
+
+    def add_weights(self, weights=None):
+        output_channel = int(self.constants["C_OUTPUT_CHANNEL"].value)
+        bitwidth = output_channel * self.input_channel * self.input_pixel
+
+        if weights is None:
+            slv_weights = np.random.randint(0, 2, bitwidth, dtype=np.uint8)
+        else:
+            # The weights are in the order of the flattened input.
+            slv_weights = (np.asarray(weights) >= 0).astype(np.uint8)
+
+        # The weights of the first pixel are at the least significant bits,
+        # i. e. at the first rom address.
+        slv_weights = slv_weights.reshape(self.input_pixel, -1)[::-1].flatten()
+        self.constants["C_WEIGHTS"] = Parameter(
+            f"C_WEIGHTS_{self.info['name'].upper()}",
+            f"std_logic_vector({bitwidth} - 1 downto 0)",
+            bits_to_literal(slv_weights),
+        )
+
+    def add_thresholds(self, thresholds=None):
+        output_channel = int(self.constants["C_OUTPUT_CHANNEL"].value)
+        threshold_bitwidth = (
+            self.input_channel_bitwidth
+            + math.ceil(math.log2(self.input_channel * self.input_pixel + 1))
+            + 1
+        )
+        total_bitwidth = output_channel * threshold_bitwidth
+        if thresholds is None:
+            slv_thresholds = np.random.randint(0, 2, total_bitwidth, dtype=np.uint8)
+        else:
+            slv_thresholds = thresholds_to_bits(
+                thresholds, threshold_bitwidth, self.input_channel_bitwidth == 1
+            )
+        self.constants["C_THRESHOLDS"] = Parameter(
+            f"C_THRESHOLDS_{self.info['name'].upper()}",
+            f"std_logic_vector({total_bitwidth} - 1 downto 0)",
+            bits_to_literal(slv_thresholds),
+        )
+
+    def write_init_files(self):
+        """Write the weights to a rom init file. Each line contains the
+        hexadecimal weights of one pixel."""
+        # least significant bit first
+        weights = literal_to_bits(self.constants["C_WEIGHTS"].value)[::-1]
+
+        os.makedirs(self.init_file_directory, exist_ok=True)
+        filename = os.path.abspath(
+            os.path.join(self.init_file_directory, f"weights_{self.info['name']}.mem")
+        )
+        with open(filename, "w") as outfile:
+            for row in weights.reshape(self.input_pixel, -1):
+                # only the digits of the literal
+                outfile.write(bits_to_literal(row[::-1]).split('"')[1] + "\n")
+        self.constants["C_WEIGHTS_FILE"] = Parameter(
+            f"C_WEIGHTS_FILE_{self.info['name'].upper()}", "string", f'"{filename}"'
+        )
+
+    def get_constants(self) -> List[Parameter]:
+        constants = dict(self.constants)
+        if "C_WEIGHTS_FILE" in constants:
+            # The weights are read from the init file.
+            del constants["C_WEIGHTS"]
+        return list(constants.values())
+
+    def get_instance(self):
+        if "C_WEIGHTS_FILE" in self.constants:
+            weights = f"C_WEIGHTS_FILE => {self.constants['C_WEIGHTS_FILE'].name}"
+        else:
+            weights = f"C_WEIGHTS => {self.constants['C_WEIGHTS'].name}"
+
+        return f"""
+i_dense_{self.info["name"]} : entity bnn_lib.dense
+  generic map (
+    C_INPUT_CHANNEL           => {self.constants["C_INPUT_CHANNEL"].name},
+    C_INPUT_CHANNEL_BITWIDTH  => {self.constants["C_INPUT_CHANNEL_BITWIDTH"].name},
+    C_OUTPUT_CHANNEL          => {self.constants["C_OUTPUT_CHANNEL"].name},
+    C_OUTPUT_CHANNEL_BITWIDTH => {self.constants["C_OUTPUT_CHANNEL_BITWIDTH"].name},
+
+    C_IMG_WIDTH  => {self.constants["C_IMG_WIDTH"].name},
+    C_IMG_HEIGHT => {self.constants["C_IMG_HEIGHT"].name},
+
+    {weights}
+  )
+  port map (
+    isl_clk        => isl_clk,
+    isl_start      => isl_start,
+    isl_valid      => sl_valid_{self.previous_name},
+    isl_sof        => sl_sof_{self.previous_name},
+    isl_eof        => sl_eof_{self.previous_name},
+    islv_data      => slv_data_{self.previous_name},
+    islv_threshold => {self.constants["C_THRESHOLDS"].name},
+    oslv_data      => {self.data_signal.name},
+    osl_valid      => {self.control_signal.name},
+    osl_sof        => sl_sof_{self.info['name']},
+    osl_eof        => sl_eof_{self.info['name']}
+  );"""
+
+
+class Argmax(Layer):
+    """Send the indices (and optionally the scores) of the best classes instead
+    of all class scores. The scores have to arrive one class per cycle, i. e.
+    after the average pooling or the serializer."""
+
+    def __init__(self, name, classes, parameter):
+        # only the best class by default
+        defaults = [
+            Parameter("C_TOP_K", "integer", "1"),
+            Parameter("C_OUTPUT_SCORE", "integer", "0"),
+        ]
+        super().__init__(name, defaults + parameter)
+
+        self.classes = classes
+        self.control_signal = Parameter(f"sl_valid_{self.info['name']}", "std_logic")
+        self.signals = [self.control_signal]
+
+    def update(self, previous_layer_info):
+        self.previous_name = previous_layer_info["name"]
+
+        if previous_layer_info["channel"] != self.classes:
+            raise Exception(
+                f"Argmax expects {self.classes} classes, but got {previous_layer_info['channel']}."
+            )
+        self.constants["C_BITWIDTH"] = Parameter(
+            f"C_BITWIDTH_{self.info['name'].upper()}",
+            "integer",
+            previous_layer_info["bitwidth"],
+        )
+        self.constants["C_CLASSES"] = Parameter(
+            f"C_CLASSES_{self.info['name'].upper()}", "integer", self.classes
+        )
+
+        # one word per index and score
+        self.info["channel"] = int(self.constants["C_TOP_K"].value) * (
+            1 + int(self.constants["C_OUTPUT_SCORE"].value)
+        )
+
+        self.data_signal = Parameter(
+            f"slv_data_{self.info['name']}",
+            f"std_logic_vector({self.constants['C_BITWIDTH'].name} - 1 downto 0)",
+        )
+        self.signals = [self.control_signal, self.data_signal]
+
+    def get_instance(self):
+        return f"""
+i_argmax_{self.info["name"]} : entity bnn_lib.argmax
+  generic map (
+    C_BITWIDTH => {self.constants["C_BITWIDTH"].name},
+
+    C_CLASSES      => {self.constants["C_CLASSES"].name},
+    C_TOP_K        => {self.constants["C_TOP_K"].name},
+    C_OUTPUT_SCORE => {self.constants["C_OUTPUT_SCORE"].name}
+  )
+  port map (
+    isl_clk   => isl_clk,
+    isl_start => isl_start,
+    isl_valid => sl_valid_{self.previous_name},
+    isl_sof   => sl_sof_{self.previous_name},
+    isl_eof   => sl_eof_{self.previous_name},
     islv_data => slv_data_{self.previous_name},
     oslv_data => {self.data_signal.name},
-    osl_valid => {self.control_signal.name}
+    osl_valid => {self.control_signal.name},
+    osl_sof   => sl_sof_{self.info['name']},
+    osl_eof   => sl_eof_{self.info['name']}
   );"""
 
 
@@ -383,13 +729,14 @@ class Bnn:
         self.layers = []
         self.output_classes = output_classes
         self.output_bitwidth = output_bitwidth
-        self.previous_layer_info = {
+        self.input_layer_info = {
             "name": "in_deserialized",
             "channel": input_channel,
             "bitwidth": input_bitwidth,
             "width": image_width,
             "height": image_height,
         }
+        self.previous_layer_info = dict(self.input_layer_info)
 
         self.input_data_signal_deserialized = Parameter(
             f"slv_data_{self.previous_layer_info['name']}",
@@ -398,6 +745,10 @@ class Bnn:
         self.input_control_signal_deserialized = Parameter(
             f"sl_valid_{self.previous_layer_info['name']}", "std_logic"
         )
+        self.input_frame_signals_deserialized = [
+            Parameter(f"sl_sof_{self.previous_layer_info['name']}", "std_logic"),
+            Parameter(f"sl_eof_{self.previous_layer_info['name']}", "std_logic"),
+        ]
 
         self.libraries = """
 library ieee;
@@ -406,14 +757,27 @@ library ieee;
 library bnn_lib;
 library util;"""
 
-        self.entity = f"""
+        self.package = """
+package bnn_pkg is
+  -- values per image at the input (height * width * channel)
+  constant C_INPUT_VALUES : integer := {input_values};
+  -- words per image at the output, i. e. all class scores or the best classes
+  constant C_OUTPUT_WORDS : integer := {output_words};
+  -- bitwidth of an output word
+  constant C_OUTPUT_BITWIDTH : integer := {output_bitwidth};
+end package bnn_pkg;
+"""
+
+    def get_entity(self):
+        # The output bitwidth is known only after all layers are added.
+        return f"""
 entity bnn is
   generic (
     -- TODO: Height and width are only used for the testsuite.
-    C_INPUT_HEIGHT : integer := {self.previous_layer_info["height"]};
-    C_INPUT_WIDTH : integer := {self.previous_layer_info["width"]};
-    C_INPUT_CHANNEL : integer := {self.previous_layer_info["channel"]};
-    C_INPUT_CHANNEL_BITWIDTH : integer := {self.previous_layer_info["bitwidth"]};
+    C_INPUT_HEIGHT : integer := {self.input_layer_info["height"]};
+    C_INPUT_WIDTH : integer := {self.input_layer_info["width"]};
+    C_INPUT_CHANNEL : integer := {self.input_layer_info["channel"]};
+    C_INPUT_CHANNEL_BITWIDTH : integer := {self.input_layer_info["bitwidth"]};
     C_OUTPUT_CHANNEL : integer := {self.output_classes};
     C_OUTPUT_CHANNEL_BITWIDTH : integer := {self.output_bitwidth}
   );
@@ -421,9 +785,13 @@ entity bnn is
     isl_clk    : in    std_logic;
     isl_start  : in    std_logic;
     isl_valid  : in    std_logic;
+    -- start and end of frame, valid together with isl_valid
+    isl_sof    : in    std_logic;
+    isl_eof    : in    std_logic;
     islv_data  : in    std_logic_vector(C_INPUT_CHANNEL_BITWIDTH - 1 downto 0);
     oslv_data  : out   std_logic_vector(C_OUTPUT_CHANNEL_BITWIDTH - 1 downto 0);
     osl_valid  : out   std_logic;
+    osl_rdy    : out   std_logic;
     osl_finish : out   std_logic
   );
 end entity bnn;
@@ -435,6 +803,37 @@ end entity bnn;
     def replace_last_layer(self, layer):
         self.layers[-1] = layer
 
+    def update_layers(self) -> List[Dict]:
+        """Propagate the info (size, channel, bitwidth) through all layers.
+        Return the input info of each layer."""
+        layer_info = dict(self.input_layer_info)
+        input_infos = []
+        for layer in self.layers:
+            input_infos.append(layer_info)
+            layer.update(layer_info)
+            layer_info = {**layer_info, **layer.get_info()}
+        self.previous_layer_info = layer_info
+        return input_infos
+
+    def get_last_padded_layer(self):
+        """Return the deepest padded convolution after the first layer or None.
+        It flushes its padding at the end of a frame and can't accept the next
+        frame meanwhile."""
+        padded_layers = [
+            layer
+            for layer in self.layers[1:]
+            if isinstance(layer, Convolution)
+            and int(layer.constants["C_PAD"].value) > 0
+        ]
+        return padded_layers[-1] if padded_layers else None
+
+    def use_init_files(self, directory: str):
+        """Read the weights and thresholds of all convolution layers (the
+        weights of all dense layers) from rom init files instead of constants."""
+        for layer in self.layers:
+            if isinstance(layer, (Convolution, Dense)):
+                layer.init_file_directory = directory
+
     def to_vhdl(self):
         output = []
         declarations = []
@@ -447,6 +846,7 @@ end entity bnn;
                 [
                     self.input_data_signal_deserialized,
                     self.input_control_signal_deserialized,
+                    *self.input_frame_signals_deserialized,
                 ],
             )
         )
@@ -463,18 +863,22 @@ i_deserializer : entity util.deserializer
   port map (
     isl_clk   => isl_clk,
     isl_valid => isl_valid,
+    isl_sof   => isl_sof,
+    isl_eof   => isl_eof,
     islv_data => islv_data,
     oslv_data => {self.input_data_signal_deserialized.name},
-    osl_valid => {self.input_control_signal_deserialized.name}
+    osl_valid => {self.input_control_signal_deserialized.name},
+    osl_sof   => {self.input_frame_signals_deserialized[0].name},
+    osl_eof   => {self.input_frame_signals_deserialized[1].name}
   );
 """
         )
 
         # parse the bnn
+        self.update_layers()
         for layer in self.layers:
-            layer.update(self.previous_layer_info)
-            self.previous_layer_info.update(layer.get_info())
-
+            if isinstance(layer, (Convolution, Dense)) and layer.init_file_directory:
+                layer.write_init_files()
             declarations.append(f"-- layer {layer.info['name']}")
             declarations.append(parameter_to_vhdl("constant", layer.get_constants()))
             declarations.append(parameter_to_vhdl("signal", layer.get_signals()))
@@ -482,19 +886,74 @@ i_deserializer : entity util.deserializer
             implementation.append(layer.get_instance())
 
         # connect output signals
-        if self.output_classes != self.previous_layer_info["channel"]:
+        if isinstance(self.layers[-1], Argmax):
+            classes = self.layers[-1].classes
+        else:
+            classes = self.previous_layer_info["channel"]
+        if self.output_classes != classes:
             raise Exception(
-                f"Output classes ({self.output_classes}) don't match channel of the last layer ({self.previous_layer_info['channel']})."
+                f"Output classes ({self.output_classes}) don't match channel of the last layer ({classes})."
             )
         implementation.append("")
-        implementation.append(f"osl_finish <= '0';")
+        # The input has to wait for the first layer, if it is folded or if it
+        # flushes the padding at the end of a frame. Later folded layers rely on
+        # the input interval of the parallelism plan.
+        ready = []
+        first_layer = self.layers[0]
+        if isinstance(first_layer, Convolution) and (
+            int(first_layer.constants["C_FOLDING"].value) > 1
+            or int(first_layer.constants["C_PAD"].value) > 0
+        ):
+            ready.append(first_layer.ready_signal.name)
+        # Later padded layers are several cycles away from the input. Thus the
+        # next frame waits, until the last padded layer has flushed the current
+        # frame, i. e. until its last output. Else the next frame would arrive
+        # at a padded layer, while it flushes.
+        padded_layer = self.get_last_padded_layer()
+        if padded_layer is not None:
+            declarations.append(
+                parameter_to_vhdl(
+                    "signal", [Parameter("sl_frame_pending", "std_logic", "'0'")]
+                )
+            )
+            implementation.append(
+                f"""proc_frame_pending : process (isl_clk) is
+begin
+
+  if (rising_edge(isl_clk)) then
+    if (isl_start = '1' or
+        ({padded_layer.control_signal.name} = '1' and sl_eof_{padded_layer.info['name']} = '1')) then
+      sl_frame_pending <= '0';
+    elsif (isl_valid = '1' and isl_eof = '1') then
+      sl_frame_pending <= '1';
+    end if;
+  end if;
+
+end process proc_frame_pending;
+"""
+            )
+            ready.append("not sl_frame_pending")
+        if not ready:
+            ready.append("'1'")
+        implementation.append(f"osl_rdy <= {' and '.join(ready)};")
+        # The last output of a frame is marked. The next frame can follow immediately.
+        implementation.append(f"osl_finish <= {layer.frame_signals[1].name};")
         implementation.append(f"osl_valid <= {layer.control_signal.name};")
         implementation.append(f"oslv_data <= {layer.data_signal.name};")
         implementation.append("")
 
         # generate the output
+        output.append(
+            self.package.format(
+                input_values=self.input_layer_info["height"]
+                * self.input_layer_info["width"]
+                * self.input_layer_info["channel"],
+                output_words=self.previous_layer_info["channel"],
+                output_bitwidth=self.output_bitwidth,
+            )
+        )
         output.append(self.libraries)
-        output.append(self.entity)
+        output.append(self.get_entity())
         output.append("architecture rtl of bnn is\n")
         output.extend(declarations)
         output.append("begin\n")
@@ -595,38 +1054,183 @@ def get_stride(strides):
     return stride
 
 
-def bnn_from_larq(path: str) -> Bnn:
+def get_padding(layer):
+    """Padding of each side. "same" padding is only supported, if it is
+    symmetric, like for odd kernel size and stride 1."""
+    parameter = layer.get_config()
+    if parameter["padding"] == "valid":
+        return 0
+
+    kernel_size = get_kernel_size(parameter["kernel_size"])
+    stride = get_stride(parameter["strides"])
+    # see "tf.nn.convolution": the output size is ceil(size / stride)
+    paddings = {
+        max(kernel_size - (size % stride or stride), 0)
+        for size in layer.input.shape[1:3]
+    }
+    padding = paddings.pop()
+    if paddings or padding % 2 != 0:
+        raise Exception(
+            f"Only symmetric padding is supported. Got kernel size {kernel_size}, "
+            f"stride {stride} and input shape {layer.input.shape}"
+        )
+    return padding // 2
+
+
+def get_pad_value(pad_value, bitwidth):
+    """Convert the pad value to the hardware format."""
+    if bitwidth == 1:
+        # Zero can't be represented by binary input.
+        if pad_value not in (-1, 1):
+            raise Exception(
+                f"Only pad values of -1 and 1 are supported for binary input. "
+                f"Got {pad_value}"
+            )
+        return "0" if pad_value == -1 else "1"
+    if pad_value != int(pad_value) or not 0 <= pad_value < 2 ** bitwidth:
+        raise Exception(f"Pad value {pad_value} doesn't fit in {bitwidth} bit.")
+    return str(int(pad_value))
+
+
+def get_score_bitwidth(fan_in: int, input_bitwidth: int) -> int:
+    """Bitwidth of a dense class score without batch normalization, like
+    "get_score_bitwidth()" of "dense.vhd". The xnor-popcount of binary input is
+    unsigned. Else the sum is signed."""
+    if input_bitwidth == 1:
+        return math.ceil(math.log2(fan_in + 1))
+    return input_bitwidth + math.ceil(math.log2(fan_in + 1)) + 1
+
+
+# Files of the framework independent model representation
+IR_TOPOLOGY = "topology.json"
+IR_WEIGHTS = "weights.npz"
+
+
+def larq_to_ir(path: str) -> Tuple[dict, Dict[str, np.ndarray]]:
+    """Extract the topology and the weights of a larq model. The topology
+    contains only the parameters, which are needed to generate the bnn."""
+    # Import lazily, since tensorflow takes some time to load.
+    import larq as lq
+    import tensorflow as tf
+
     model = tf.keras.models.load_model(path)
     lq.models.summary(model)
 
-    input_channel = model.input.shape[-1]
-    input_channel_bitwidth = 8
+    layers = []
+    weights = {}
+    for layer in model.layers:
+        parameter = layer.get_config()
+        name = parameter["name"]
+        if isinstance(layer, lq.layers.QuantConv2D):
+            layers.append(
+                {
+                    "type": "conv",
+                    "name": name,
+                    "kernel_size": get_kernel_size(parameter["kernel_size"]),
+                    "stride": get_stride(parameter["strides"]),
+                    "padding": get_padding(layer),
+                    "pad_value": parameter.get("pad_values", 0.0),
+                    "output_channel": layer.output.shape[-1],
+                }
+            )
+            weights[f"{name}.kernel"] = layer.get_weights()[0]
+        elif isinstance(layer, tf.keras.layers.BatchNormalization):
+            layers.append({"type": "batchnorm", "name": name})
+            for key, value in zip(("beta", "mean", "variance"), layer.get_weights()):
+                weights[f"{name}.{key}"] = value
+        elif isinstance(layer, tf.keras.layers.MaxPooling2D):
+            if parameter["padding"] != "valid":
+                raise Exception("Only valid padding is supported for pooling.")
+            layers.append(
+                {
+                    "type": "maxpooling",
+                    "name": name,
+                    "kernel_size": get_kernel_size(parameter["pool_size"]),
+                    "stride": get_stride(parameter["strides"]),
+                }
+            )
+        elif isinstance(layer, tf.keras.layers.GlobalAveragePooling2D):
+            layers.append({"type": "average_pooling", "name": name})
+        elif isinstance(layer, tf.keras.layers.Flatten):
+            layers.append(
+                {"type": "flatten", "name": name, "shape": layer.input.shape[1:]}
+            )
+        elif isinstance(layer, lq.layers.QuantDense):
+            layers.append(
+                {
+                    "type": "dense",
+                    "name": name,
+                    "output_channel": layer.output.shape[-1],
+                }
+            )
+            weights[f"{name}.kernel"] = layer.get_weights()[0]
+        elif isinstance(layer, tf.keras.layers.Activation):
+            layers.append({"type": "activation", "name": name})
+        else:
+            raise Exception(f"Unsupported layer: {type(layer)}")
+
+    topology = {
+        "input_shape": model.input.shape[1:],  # h x w x ch
+        "output_shape": model.output.shape[1:],  # ch
+        "layers": layers,
+    }
+    # The shapes are tensorflow specific. Convert them to plain integers.
+    return json.loads(json.dumps(topology, default=list)), weights
+
+
+def save_ir(path: str, topology: dict, weights: Dict[str, np.ndarray]):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, IR_TOPOLOGY), "w") as outfile:
+        json.dump(topology, outfile, indent=2)
+    np.savez(os.path.join(path, IR_WEIGHTS), **weights)
+
+
+def load_ir(path: str) -> Tuple[dict, Dict[str, np.ndarray]]:
+    with open(os.path.join(path, IR_TOPOLOGY)) as infile:
+        topology = json.load(infile)
+    with np.load(os.path.join(path, IR_WEIGHTS)) as infile:
+        weights = dict(infile)
+    return topology, weights
+
+
+def is_ir(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, IR_TOPOLOGY))
+
+
+def bnn_from_ir(
+    topology: dict,
+    weights: Dict[str, np.ndarray],
+    input_channel_bitwidth: int = 8,
+    top_k: int = 0,
+    output_score: bool = False,
+) -> Bnn:
+    """Convert the model representation to a bnn. See "bnn_from_larq()"."""
+    input_channel = topology["input_shape"][-1]
     output_channel_bitwidth = 8
     bnn = Bnn(
-        *model.input.shape[1:],  # h x w x ch
+        *topology["input_shape"],  # h x w x ch
         input_channel_bitwidth,
-        *model.output.shape[1:],  # ch
+        *topology["output_shape"],  # ch
         output_channel_bitwidth,
     )
 
-    # Find last convolution layer for disabling batch normalization
+    # Find last convolution or dense layer for disabling batch normalization
     last_conv_layer_name = None
-    for layer in model.layers:
-        if isinstance(layer, lq.layers.QuantConv2D):
-            last_conv_layer_name = layer.get_config()["name"]
+    for layer in topology["layers"]:
+        if layer["type"] in ("conv", "dense"):
+            last_conv_layer_name = layer["name"]
 
-    last_layer = None  # Only used for sanity checks.
+    last_layer_type = None  # Only used for sanity checks.
     fan_in = None
     channel = input_channel
     channel_bw = input_channel_bitwidth
+    flatten_shape = None  # h x w x ch of the flattened feature map
 
-    for layer in model.layers:
-        # Compare "filters" with layer.output.shape[-1]?
-        parameter = layer.get_config()
-        if isinstance(layer, lq.layers.QuantConv2D):
+    for layer in topology["layers"]:
+        if layer["type"] == "conv":
             print("conv")
 
-            if parameter["name"] == last_conv_layer_name:
+            if layer["name"] == last_conv_layer_name:
                 channel_bw_out = (
                     output_channel_bitwidth  # dont append batchnorm at last layer
                 )
@@ -634,50 +1238,56 @@ def bnn_from_larq(path: str) -> Bnn:
                 channel_bw_out = 1
 
             l = Convolution(
-                parameter["name"],
+                layer["name"],
                 channel,
                 channel_bw,
                 [
+                    Parameter("C_KERNEL_SIZE", "integer", layer["kernel_size"]),
+                    Parameter("C_STRIDE", "integer", layer["stride"]),
+                    Parameter("C_PAD", "integer", layer["padding"]),
+                    # The pad value is irrelevant without padding.
                     Parameter(
-                        "C_KERNEL_SIZE",
+                        "C_PAD_VALUE",
                         "integer",
-                        get_kernel_size(parameter["kernel_size"]),
+                        get_pad_value(layer["pad_value"], channel_bw)
+                        if layer["padding"]
+                        else "0",
                     ),
-                    Parameter("C_STRIDE", "integer", get_stride(parameter["strides"])),
-                    Parameter("C_OUTPUT_CHANNEL", "integer", layer.output.shape[-1]),
+                    Parameter("C_OUTPUT_CHANNEL", "integer", layer["output_channel"]),
                     Parameter(
                         "C_OUTPUT_CHANNEL_BITWIDTH",
                         "integer",
                         str(channel_bw_out)
-                        if parameter["name"] == last_conv_layer_name
+                        if layer["name"] == last_conv_layer_name
                         else "1",
                     ),
                 ],
             )
 
-            l.add_weights(layer.get_weights()[0].flat)
+            l.add_weights(weights[f"{layer['name']}.kernel"].flat)
             l.add_thresholds()  # add dummy threshold for now -> gets overwritten if there is a batch norm layer
             bnn.add_layer(l)
 
             # used at the next batch norm
-            fan_in = (
-                get_kernel_size(parameter["kernel_size"]) ** 2 * channel * channel_bw
-            )
+            fan_in = layer["kernel_size"] ** 2 * channel * channel_bw
             # used at the next conv
-            channel = layer.output.shape[-1]
+            channel = layer["output_channel"]
             channel_bw = channel_bw_out
-        elif isinstance(layer, tf.keras.layers.BatchNormalization):
+        elif layer["type"] == "batchnorm":
             print("batchnorm")
-            if not isinstance(last_layer, lq.layers.QuantConv2D):
+            if last_layer_type not in ("conv", "dense"):
                 raise Exception(
-                    f"Batchnorm must follow convolution, not {type(last_layer)}"
+                    f"Batchnorm must follow conv or dense, not {last_layer_type}"
                 )
             # TODO: Check for last layer output bitwith == 1
             if l.info["name"] == last_conv_layer_name or channel_bw != 1:
                 raise Exception()
 
             # calculate batch normalization threshold
-            beta, mean, variance = layer.get_weights()
+            beta, mean, variance = (
+                weights[f"{layer['name']}.{key}"]
+                for key in ("beta", "mean", "variance")
+            )
             threshold_batchnorm = mean - beta * np.sqrt(variance + 0.001)
 
             if l.input_channel_bitwidth == 1:  # unsigned
@@ -687,39 +1297,161 @@ def bnn_from_larq(path: str) -> Bnn:
                 l.add_thresholds(threshold_batchnorm.tolist())
 
             bnn.replace_last_layer(l)
-        elif isinstance(layer, tf.keras.layers.MaxPooling2D):
+        elif layer["type"] == "maxpooling":
             print("maxpooling")
             l = MaximumPooling(
-                parameter["name"],
+                layer["name"],
                 [
-                    Parameter(
-                        "C_KERNEL_SIZE",
-                        "integer",
-                        get_kernel_size(parameter["pool_size"]),
-                    ),
-                    Parameter("C_STRIDE", "integer", get_stride(parameter["strides"])),
+                    Parameter("C_KERNEL_SIZE", "integer", layer["kernel_size"]),
+                    Parameter("C_STRIDE", "integer", layer["stride"]),
                 ],
             )
             bnn.add_layer(l)
-        elif isinstance(layer, tf.keras.layers.GlobalAveragePooling2D):
+        elif layer["type"] == "average_pooling":
             print("average pooling")
-            l = AveragePooling(parameter["name"], [])
+            l = AveragePooling(layer["name"], [])
             bnn.add_layer(l)
-        elif isinstance(layer, tf.keras.layers.Flatten):
-            print("flatten")  # ignore
-        elif isinstance(layer, tf.keras.layers.Dense):
+        elif layer["type"] == "flatten":
+            print("flatten")
+            # The average pooling output is serialized, i. e. no feature map.
+            if last_layer_type == "average_pooling":
+                raise Exception("Flatten after average pooling isn't supported.")
+            flatten_shape = layer["shape"]
+        elif layer["type"] == "dense":
             print("dense")
-        elif isinstance(layer, tf.keras.layers.Activation):
+            if last_layer_type == "flatten":
+                height, width, _ = flatten_shape
+            elif bnn.layers and isinstance(bnn.layers[-1], Dense):
+                # The output of a dense layer is a single pixel.
+                height, width = 1, 1
+            else:
+                raise Exception(
+                    f"Dense must follow flatten or dense, not {last_layer_type}"
+                )
+
+            if layer["name"] == last_conv_layer_name:
+                # The class score must not wrap, i. e. it may need more than
+                # the default output bitwidth.
+                channel_bw_out = max(
+                    output_channel_bitwidth,
+                    get_score_bitwidth(height * width * channel, channel_bw),
+                )
+            else:
+                channel_bw_out = 1
+
+            l = Dense(
+                layer["name"],
+                height,
+                width,
+                channel,
+                channel_bw,
+                [
+                    Parameter("C_OUTPUT_CHANNEL", "integer", layer["output_channel"]),
+                    Parameter("C_OUTPUT_CHANNEL_BITWIDTH", "integer", channel_bw_out),
+                ],
+            )
+
+            dense_weights = weights[f"{layer['name']}.kernel"]
+            if layer["name"] == last_conv_layer_name:
+                # The serializer sends the least significant output channel
+                # first. Reverse the output channel to send the first class first.
+                dense_weights = dense_weights[:, ::-1]
+            l.add_weights(dense_weights.flat)
+            l.add_thresholds()  # dummy threshold, see convolution
+            bnn.add_layer(l)
+
+            # used at the next batch norm
+            fan_in = height * width * channel * channel_bw
+            # used at the next layer
+            channel = layer["output_channel"]
+            channel_bw = channel_bw_out
+        elif layer["type"] == "activation":
             print("activation")  # ignore
         else:
-            raise Exception(f"Unsupported layer: {type(layer)}")
-        last_layer = layer
+            raise Exception(f"Unsupported layer: {layer['type']}")
+        last_layer_type = layer["type"]
+
+    # Pooling, serializer and argmax keep the bitwidth of the scores.
+    bnn.output_bitwidth = channel_bw
+    if isinstance(bnn.layers[-1], Dense):
+        # The dense output is a single pixel, but the bnn sends one class per cycle.
+        bnn.add_layer(Serializer("serializer", []))
+    if top_k > 0:
+        bnn.add_layer(
+            Argmax(
+                "argmax",
+                bnn.output_classes,
+                [
+                    Parameter("C_TOP_K", "integer", top_k),
+                    Parameter("C_OUTPUT_SCORE", "integer", int(output_score)),
+                ],
+            )
+        )
     return bnn
 
 
+def bnn_from_larq(
+    path: str,
+    input_channel_bitwidth: int = 8,
+    top_k: int = 0,
+    output_score: bool = False,
+) -> Bnn:
+    """Convert a larq model to a bnn. With an input bitwidth of 1, the host
+    binarizes the pixels, i. e. the first convolution gets binary input.
+    With "top_k" > 0, the bnn sends the indices (and optionally the scores)
+    of the best classes instead of all class scores.
+    The path can be a saved larq model or its exported representation
+    (see "--export-ir"). The latter doesn't need tensorflow."""
+    if is_ir(path):
+        model = load_ir(path)
+    else:
+        model = larq_to_ir(path)
+    return bnn_from_ir(*model, input_channel_bitwidth, top_k, output_score)
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--init-files", help="write weights and thresholds to rom init files"
+    )
+    parser.add_argument(
+        "--input-bitwidth",
+        type=int,
+        default=8,
+        choices=[1, 8],
+        help="bitwidth of the bnn input, 1 bit inputs are packed",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=0,
+        help="send the indices of the k best classes instead of all scores",
+    )
+    parser.add_argument(
+        "--output-score",
+        action="store_true",
+        help="send the score after each index of the best classes",
+    )
+    parser.add_argument(
+        "--model",
+        default="../models/test",
+        help="larq model or its exported representation",
+    )
+    parser.add_argument(
+        "--export-ir",
+        metavar="DIRECTORY",
+        help="export the larq model to a representation without tensorflow",
+    )
+    args = parser.parse_args()
+
+    if args.export_ir:
+        save_ir(args.export_ir, *larq_to_ir(args.model))
+        sys.exit()
+
     # bnn = custom_bnn()
-    bnn = bnn_from_larq("../models/test")
+    bnn = bnn_from_larq(args.model, args.input_bitwidth, args.top_k, args.output_score)
+    if args.init_files:
+        bnn.use_init_files(args.init_files)
     vhdl = bnn.to_vhdl()
     with open("../src/bnn.vhd", "w") as outfile:
         outfile.write(vhdl)
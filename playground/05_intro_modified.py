@@ -19,6 +19,13 @@ else:
         (test_images, test_labels,),
     ) = tf.keras.datasets.cifar10.load_data()
 
+# Binarize the input at 128, like the host does for 1 bit input
+# ("make toplevel INPUT_BITWIDTH=1").
+binary_input = False
+if binary_input:
+    train_images = np.where(train_images >= 128, 1, -1)
+    test_images = np.where(test_images >= 128, 1, -1)
+
 # All quantized layers except the first will use the same options
 kwargs = dict(
     input_quantizer="ste_sign",
@@ -29,10 +36,12 @@ kwargs = dict(
 model = tf.keras.models.Sequential()
 
 # In the first layer we only quantize the weights and not the input
+# (except for binary input)
 model.add(
     lq.layers.QuantConv2D(
         8,
         (3, 3),
+        input_quantizer="ste_sign" if binary_input else None,
         kernel_quantizer="ste_sign",
         kernel_constraint="weight_clip",
         use_bias=False,
@@ -0,0 +1,82 @@
+"""Benchmark the toplevel generation for the "01_binarynet.py" architecture.
+
+The weights and thresholds are random, i. e. no training is needed. The dense
+layers are omitted.
+"""
+
+from importlib import import_module
+import sys
+import time
+
+import numpy as np
+
+toplevel = import_module("04_custom_toplevel")
+
+# input shape and convolution layers
+# (kernel size, padding, output channel, max pooling)
+INPUT_SHAPE = (32, 32, 3, 8)
+LAYERS = [
+    (3, 0, 128, False),
+    (3, 1, 128, True),
+    (3, 1, 256, False),
+    (3, 1, 256, True),
+    (3, 1, 512, False),
+    (3, 1, 512, True),
+]
+
+
+def binarynet():
+    """Create the "01_binarynet.py" architecture with random weights."""
+    height, width, channel, bitwidth = INPUT_SHAPE
+    bnn = toplevel.Bnn(height, width, channel, bitwidth, LAYERS[-1][2], 1)
+    for index, (kernel_size, padding, output_channel, max_pooling) in enumerate(LAYERS):
+        layer = toplevel.Convolution(
+            f"conv{index}",
+            channel,
+            bitwidth,
+            [
+                toplevel.Parameter("C_KERNEL_SIZE", "integer", str(kernel_size)),
+                toplevel.Parameter("C_STRIDE", "integer", "1"),
+                # binary input is padded with +1
+                toplevel.Parameter("C_PAD", "integer", str(padding)),
+                toplevel.Parameter(
+                    "C_PAD_VALUE", "integer", "1" if bitwidth == 1 else "0"
+                ),
+                toplevel.Parameter("C_OUTPUT_CHANNEL", "integer", output_channel),
+                toplevel.Parameter("C_OUTPUT_CHANNEL_BITWIDTH", "integer", "1"),
+            ],
+        )
+        fan_in = kernel_size ** 2 * channel
+        layer.add_weights(np.random.uniform(-1, 1, fan_in * output_channel))
+        layer.add_thresholds(np.random.uniform(0, fan_in, output_channel).tolist())
+        bnn.add_layer(layer)
+
+        if max_pooling:
+            bnn.add_layer(
+                toplevel.MaximumPooling(
+                    f"max{index}",
+                    [
+                        toplevel.Parameter("C_KERNEL_SIZE", "integer", "2"),
+                        toplevel.Parameter("C_STRIDE", "integer", "2"),
+                    ],
+                )
+            )
+        channel, bitwidth = output_channel, 1
+    return bnn
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    t_layers, t_vhdl = [], []
+    for _ in range(runs):
+        t_start = time.perf_counter()
+        bnn = binarynet()
+        t_end = time.perf_counter()
+        vhdl = bnn.to_vhdl()
+        t_layers.append(t_end - t_start)
+        t_vhdl.append(time.perf_counter() - t_end)
+
+    print(f"weights and thresholds: {min(t_layers):.3f} s")
+    print(f"vhdl generation: {min(t_vhdl):.3f} s")
+    print(f"bnn.vhd size: {len(vhdl.encode()) / 1024:.0f} KiB")
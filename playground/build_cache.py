@@ -0,0 +1,327 @@
+"""Incremental build of the bitstream with a content-addressed cache.
+
+The build is split into stages: toplevel generation, analysis of each VHDL
+library, synthesis check, synthesis to JSON, place and route and packing. The
+key of a stage is the hash of its configuration (i. e. the command), the
+content of its input files and the keys of the stages it depends on.
+
+A stage is skipped if its outputs are up to date. Else the outputs get restored
+from the cache directory. Only if the key isn't cached, the stage gets executed
+and its outputs are stored in the cache.
+"""
+
+import argparse
+from dataclasses import dataclass, field
+import hashlib
+from importlib import import_module
+import json
+import os
+import shutil
+import subprocess
+import sys
+from typing import Callable, List, Optional
+
+# Helpers of the generator, which are only imported on demand (e. g. to plan the
+# folding). They aren't found by "generator_sources()".
+GENERATOR_HELPERS = [
+    "latency_estimator.py",
+    "parallelism_planner.py",
+    "resource_estimator.py",
+]
+
+
+def file_digest(path: str) -> str:
+    """Hash of a file or of all files in a directory."""
+    sha = hashlib.sha256()
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for filename in sorted(files):
+                filepath = os.path.join(root, filename)
+                sha.update(os.path.relpath(filepath, path).encode())
+                sha.update(file_digest(filepath).encode())
+    else:
+        with open(path, "rb") as infile:
+            for chunk in iter(lambda: infile.read(1 << 20), b""):
+                sha.update(chunk)
+    return sha.hexdigest()
+
+
+def copy(source: str, destination: str):
+    """Copy a file or a directory. The destination gets replaced."""
+    if os.path.isdir(source):
+        shutil.rmtree(destination, ignore_errors=True)
+        shutil.copytree(source, destination)
+    else:
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        shutil.copy2(source, destination)
+
+
+@dataclass
+class Stage:
+    name: str
+    # Command line or any other configuration, which isn't contained in a file.
+    config: str
+    inputs: List[str]
+    outputs: List[str]
+    run: Callable[[], None]
+    dependencies: List["Stage"] = field(default_factory=list)
+    key: Optional[str] = None
+
+
+class BuildCache:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def key(self, stage: Stage) -> str:
+        sha = hashlib.sha256()
+        sha.update(stage.name.encode())
+        sha.update(stage.config.encode())
+        for path in stage.inputs:
+            # Only the filename, to keep the key valid in other directories.
+            sha.update(os.path.basename(os.path.normpath(path)).encode())
+            sha.update(file_digest(path).encode())
+        for dependency in stage.dependencies:
+            sha.update(dependency.key.encode())
+        return sha.hexdigest()
+
+    def entry(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def execute(self, stage: Stage) -> str:
+        """Execute a stage, if needed. The dependencies have to be executed
+        already. Returns "skipped", "restored" or "executed"."""
+        stage.key = self.key(stage)
+        entry = self.entry(stage.key)
+        manifest_file = os.path.join(entry, "manifest.json")
+
+        if os.path.isfile(manifest_file):
+            with open(manifest_file) as infile:
+                digests = json.load(infile)
+            if all(
+                os.path.exists(output) and file_digest(output) == digest
+                for output, digest in zip(stage.outputs, digests)
+            ):
+                return "skipped"
+            for index, output in enumerate(stage.outputs):
+                copy(os.path.join(entry, str(index)), output)
+            return "restored"
+
+        stage.run()
+        # Write to a temporary directory first. Thus an interrupted build
+        # doesn't leave an incomplete entry.
+        temporary_entry = entry + ".tmp"
+        shutil.rmtree(temporary_entry, ignore_errors=True)
+        os.makedirs(temporary_entry)
+        for index, output in enumerate(stage.outputs):
+            copy(output, os.path.join(temporary_entry, str(index)))
+        with open(os.path.join(temporary_entry, "manifest.json"), "w") as outfile:
+            json.dump([file_digest(output) for output in stage.outputs], outfile)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.rename(temporary_entry, entry)
+        return "executed"
+
+
+def command(cmd: List[str], workdir: str, stdout: Optional[str] = None):
+    """Return a function, which runs a command in the working directory."""
+
+    def run():
+        if stdout is None:
+            subprocess.run(cmd, cwd=workdir, check=True)
+        else:
+            with open(os.path.join(workdir, stdout), "w") as outfile:
+                subprocess.run(cmd, cwd=workdir, check=True, stdout=outfile)
+
+    return run
+
+
+def generator_sources() -> List[str]:
+    """Source files of the toplevel generator, i. e. the generator, all modules
+    of this repository it imports and the helpers."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    directory = os.path.dirname(os.path.abspath(__file__))
+    generator = import_module("04_custom_toplevel")
+    sources = {os.path.abspath(generator.__file__)}
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.abspath(path).startswith(root + os.sep):
+            sources.add(os.path.abspath(path))
+    sources.update(os.path.join(directory, helper) for helper in GENERATOR_HELPERS)
+    return sorted(sources)
+
+
+def generate_toplevel(
+    model: str,
+    output: str,
+    init_files: Optional[str],
+    input_bitwidth: int,
+    top_k: int,
+    output_score: bool,
+):
+    def run():
+        # Import lazily, since tensorflow takes some time to load.
+        toplevel = import_module("04_custom_toplevel")
+        bnn = toplevel.bnn_from_larq(model, input_bitwidth, top_k, output_score)
+        if init_files:
+            bnn.use_init_files(init_files)
+        vhdl = bnn.to_vhdl()
+        with open(output, "w") as outfile:
+            outfile.write(vhdl)
+
+    return run
+
+
+def bitstream_stages(args) -> List[Stage]:
+    workdir = os.path.abspath(args.workdir)
+    ghdl_flags = args.ghdl_flags.split()
+    std = next(
+        (flag.split("=")[1] for flag in ghdl_flags if flag.startswith("--std=")), "93"
+    )
+
+    toplevel = Stage(
+        "toplevel",
+        f"init_files={args.init_files} input_bitwidth={args.input_bitwidth} "
+        f"top_k={args.top_k} output_score={args.output_score}",
+        [args.model, *generator_sources()],
+        [args.toplevel] + ([args.init_files] if args.init_files else []),
+        generate_toplevel(
+            args.model,
+            args.toplevel,
+            args.init_files,
+            args.input_bitwidth,
+            args.top_k,
+            args.output_score,
+        ),
+    )
+    stages = [toplevel]
+
+    # The libraries are analyzed in the given order. Each library may depend on
+    # the previous ones.
+    libraries = []
+    for library, *sources in args.library:
+        cmd = ["ghdl", "-a", *ghdl_flags, f"--work={library}"]
+        libraries.append(
+            Stage(
+                f"ghdl -a {library}",
+                " ".join(cmd),
+                sources,
+                [os.path.join(workdir, f"{library}-obj{std}.cf")],
+                command(cmd + [os.path.abspath(source) for source in sources], workdir),
+                list(libraries),
+            )
+        )
+    stages.extend(libraries)
+
+    work = f"--work={args.library[-1][0]}"
+    generics = f"-gC_INPUT_BITWIDTH={args.input_bitwidth}"
+    cmd = ["ghdl", "--synth", *ghdl_flags, generics, work, args.top]
+    # The init files are read at elaboration. Thus they aren't covered by the
+    # analyzed libraries, e. g. if only the weights change.
+    synthesis_check = Stage(
+        "ghdl --synth",
+        " ".join(cmd),
+        [args.init_files] if args.init_files else [],
+        [os.path.join(workdir, f"{args.top}_synth.vhd")],
+        command(cmd, workdir, stdout=f"{args.top}_synth.vhd"),
+        list(libraries),
+    )
+    script = (
+        f"ghdl {args.ghdl_flags} {generics} {work} --no-formal {args.top}; "
+        "synth_ecp5 -abc9 -json bnn.json"
+    )
+    cmd = ["yosys", "-m", "ghdl", "-p", script]
+    synthesis = Stage(
+        "yosys",
+        " ".join(cmd),
+        [],
+        [os.path.join(workdir, "bnn.json")],
+        command(cmd, workdir),
+        [synthesis_check],
+    )
+    lpf = os.path.abspath(args.lpf)
+    cmd = [
+        "nextpnr-ecp5",
+        f"--{args.device}",
+        "--package",
+        args.package,
+        "--json",
+        "bnn.json",
+        "--lpf",
+        lpf,
+        "--textcfg",
+        "bnn_out.config",
+        "--lpf-allow-unconstrained",
+    ]
+    place_and_route = Stage(
+        "nextpnr",
+        " ".join(arg for arg in cmd if arg != lpf),  # the lpf file is an input
+        [args.lpf],
+        [os.path.join(workdir, "bnn_out.config")],
+        command(cmd, workdir),
+        [synthesis],
+    )
+    cmd = ["ecppack", "bnn_out.config", "bnn.bit"]
+    packing = Stage(
+        "ecppack",
+        " ".join(cmd),
+        [],
+        [os.path.join(workdir, "bnn.bit")],
+        command(cmd, workdir),
+        [place_and_route],
+    )
+    stages.extend([synthesis_check, synthesis, place_and_route, packing])
+    return stages
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="../models/test", help="larq model")
+    parser.add_argument("--toplevel", default="../src/bnn.vhd")
+    parser.add_argument(
+        "--init-files", help="write weights and thresholds to rom init files"
+    )
+    parser.add_argument(
+        "--library",
+        nargs="+",
+        action="append",
+        required=True,
+        metavar=("NAME", "SOURCE"),
+        help="VHDL library and its sources, in order of analysis",
+    )
+    parser.add_argument(
+        "--input-bitwidth",
+        type=int,
+        default=8,
+        choices=[1, 8],
+        help="bitwidth of the bnn input, 1 bit inputs are packed",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=0,
+        help="send the indices of the k best classes instead of all scores",
+    )
+    parser.add_argument(
+        "--output-score",
+        action="store_true",
+        help="send the score after each index of the best classes",
+    )
+    parser.add_argument("--ghdl-flags", default="--std=08")
+    parser.add_argument("--top", default="bnn_uart", help="toplevel entity")
+    parser.add_argument("--device", default="85k")
+    parser.add_argument("--package", default="CABGA381")
+    parser.add_argument("--lpf", default="../syn/ulx3s_v20.lpf")
+    parser.add_argument("--workdir", default="../build/syn")
+    parser.add_argument("--cache", default="../build/cache")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    cache = BuildCache(args.cache)
+    for stage in bitstream_stages(args):
+        status = cache.execute(stage)
+        print(f"{stage.name}: {status} ({stage.key[:12]})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,306 @@
+"""Bit-exact NumPy model of the generated bnn toplevel.
+
+The model gets evaluated from the same weight and threshold bit strings, which
+get written into "bnn.vhd". All calculations are integer based and mirror the
+hardware, including the channel order inside the hardware and the fixed point
+reciprocal of the average pooling. Many images can be evaluated at once.
+"""
+
+from importlib import import_module
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+toplevel = import_module("04_custom_toplevel")
+
+# number of ones for each byte value
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# see "average_pooling.vhd"
+C_FRACW_REZI = 16
+FIXED_GUARD_BITS = 3
+
+
+def parse_bits(value) -> np.ndarray:
+    """Convert a VHDL bit string literal to an array of bits.
+    The first element is the most significant bit."""
+    return toplevel.literal_to_bits(str(value))
+
+
+def bits_to_integers(bits: np.ndarray, bitwidth: int, is_unsigned: bool = True):
+    """Split a bit array (MSB first) into integers of a specific bitwidth.
+    The first integer is taken from the least significant bits, like
+    "get_slice()" of the "array_pkg" does."""
+    slices = bits[::-1].reshape(-1, bitwidth).astype(np.int64)
+    integers = slices @ (1 << np.arange(bitwidth, dtype=np.int64))
+    if not is_unsigned:
+        integers = np.where(
+            integers >= 2 ** (bitwidth - 1), integers - 2 ** bitwidth, integers
+        )
+    return integers
+
+
+def popcount(packed: np.ndarray) -> np.ndarray:
+    """Count the ones of packed bits along the last axis."""
+    return POPCOUNT_TABLE[packed].sum(axis=-1, dtype=np.int64)
+
+
+def get_windows(activations: np.ndarray, kernel_size: int, stride: int):
+    """Obtain all windows of a batch of images (N x H x W x CH).
+    The result has the shape N x H_out x W_out x K x K x CH."""
+    windows = np.lib.stride_tricks.sliding_window_view(
+        activations, (kernel_size, kernel_size), axis=(1, 2)
+    )
+    return windows[:, ::stride, ::stride].transpose(0, 1, 2, 4, 5, 3)
+
+
+def round_fixed(value: np.ndarray, fraction_bits: int) -> np.ndarray:
+    """Round like "resize()" of the "fixed_pkg" with "fixed_round",
+    i. e. to nearest and ties to even."""
+    integer = value >> fraction_bits
+    remainder = value & ((1 << fraction_bits) - 1)
+    half = 1 << (fraction_bits - 1)
+    rounds = (remainder > half) | ((remainder == half) & ((integer & 1) == 1))
+    return integer + rounds
+
+
+def reciprocal(divisor: int) -> int:
+    """Calculate the reciprocal like "reciprocal()" of the "fixed_pkg".
+    The result is scaled by 2 ** C_FRACW_REZI."""
+    quotient = 2 ** (C_FRACW_REZI + FIXED_GUARD_BITS) // divisor
+    return int(round_fixed(np.int64(quotient), FIXED_GUARD_BITS))
+
+
+class ConvolutionModel:
+    """Model of "window_convolution_activation.vhd"."""
+
+    def __init__(self, layer):
+        self.kernel_size = int(layer.constants["C_KERNEL_SIZE"].value)
+        self.stride = int(layer.constants["C_STRIDE"].value)
+        self.padding = int(layer.constants["C_PAD"].value)
+        self.pad_value = int(layer.constants["C_PAD_VALUE"].value)
+        self.input_channel = int(layer.input_channel)
+        self.input_channel_bitwidth = int(layer.input_channel_bitwidth)
+        self.output_channel = int(layer.constants["C_OUTPUT_CHANNEL"].value)
+        self.output_channel_bitwidth = int(
+            layer.constants["C_OUTPUT_CHANNEL_BITWIDTH"].value
+        )
+
+        # The hardware window starts at the bottom right pixel, while the image
+        # is in raster order. Bit "(k * C_INPUT_CHANNEL + ch) * C_OUTPUT_CHANNEL + och"
+        # belongs to window position k, input channel ch and output channel och.
+        weights = parse_bits(layer.constants["C_WEIGHTS"].value)[::-1]
+        weights = weights.reshape(
+            self.kernel_size ** 2, self.input_channel, self.output_channel
+        )[::-1]
+        self.weights = weights.reshape(-1, self.output_channel)
+
+        threshold_bitwidth = (
+            self.input_channel_bitwidth
+            + int(np.ceil(np.log2(self.input_channel * self.kernel_size ** 2 + 1)))
+            + 1
+        )
+        self.thresholds = bits_to_integers(
+            parse_bits(layer.constants["C_THRESHOLDS"].value),
+            threshold_bitwidth,
+            is_unsigned=self.input_channel_bitwidth == 1,
+        )
+
+    def convolution(self, activations: np.ndarray) -> np.ndarray:
+        if self.padding > 0:
+            # The pad value is the same for all input channel.
+            pad_width = ((0, 0), (self.padding,) * 2, (self.padding,) * 2, (0, 0))
+            activations = np.pad(activations, pad_width, constant_values=self.pad_value)
+        windows = get_windows(activations, self.kernel_size, self.stride)
+        windows = windows.reshape(windows.shape[:3] + (-1,))
+
+        if self.input_channel_bitwidth == 1:
+            # xnor and popcount, i. e. fan in - popcount(xor)
+            packed_windows = np.packbits(windows, axis=-1)
+            packed_weights = np.packbits(self.weights.T, axis=-1)
+            mismatches = popcount(packed_windows[..., np.newaxis, :] ^ packed_weights)
+            return windows.shape[-1] - mismatches
+
+        # multiplication with +-1
+        signs = 2 * self.weights.astype(np.int64) - 1
+        return windows.astype(np.int64) @ signs
+
+    def __call__(self, activations: np.ndarray) -> np.ndarray:
+        result = self.convolution(activations)
+        if self.output_channel_bitwidth == 1:
+            # batch normalization as threshold
+            return (result > self.thresholds).astype(np.uint8)
+        # The output gets resized (truncated) to the output bitwidth.
+        return np.mod(result, 2 ** self.output_channel_bitwidth)
+
+
+class DenseModel(ConvolutionModel):
+    """Model of "dense.vhd"."""
+
+    def __init__(self, layer):
+        self.input_channel_bitwidth = int(layer.input_channel_bitwidth)
+        self.output_channel = int(layer.constants["C_OUTPUT_CHANNEL"].value)
+        self.output_channel_bitwidth = int(
+            layer.constants["C_OUTPUT_CHANNEL_BITWIDTH"].value
+        )
+
+        # Bit "(pixel * C_INPUT_CHANNEL + ch) * C_OUTPUT_CHANNEL + och" belongs to
+        # the pixel in stream order, input channel ch and output channel och.
+        weights = parse_bits(layer.constants["C_WEIGHTS"].value)[::-1]
+        self.weights = weights.reshape(-1, self.output_channel)
+
+        threshold_bitwidth = (
+            self.input_channel_bitwidth
+            + int(np.ceil(np.log2(len(self.weights) + 1)))
+            + 1
+        )
+        self.thresholds = bits_to_integers(
+            parse_bits(layer.constants["C_THRESHOLDS"].value),
+            threshold_bitwidth,
+            is_unsigned=self.input_channel_bitwidth == 1,
+        )
+
+    def convolution(self, activations: np.ndarray) -> np.ndarray:
+        # The flattened image, i. e. the output is a single pixel.
+        inputs = activations.reshape(len(activations), 1, 1, -1)
+
+        if self.input_channel_bitwidth == 1:
+            packed_inputs = np.packbits(inputs, axis=-1)
+            packed_weights = np.packbits(self.weights.T, axis=-1)
+            mismatches = popcount(packed_inputs[..., np.newaxis, :] ^ packed_weights)
+            return inputs.shape[-1] - mismatches
+
+        signs = 2 * self.weights.astype(np.int64) - 1
+        return inputs.astype(np.int64) @ signs
+
+    def __call__(self, activations: np.ndarray) -> np.ndarray:
+        result = self.convolution(activations)
+        if self.output_channel_bitwidth == 1:
+            return (result > self.thresholds).astype(np.uint8)
+        # The output bitwidth covers the whole score, i. e. the score doesn't wrap.
+        # Only negative scores of multi bit input are in two's complement.
+        if self.input_channel_bitwidth > 1:
+            return np.mod(result, 2 ** self.output_channel_bitwidth)
+        return result
+
+
+class MaximumPoolingModel:
+    """Model of "window_maximum_pooling.vhd"."""
+
+    def __init__(self, layer):
+        self.kernel_size = int(layer.constants["C_KERNEL_SIZE"].value)
+        self.stride = int(layer.constants["C_STRIDE"].value)
+
+    def __call__(self, activations: np.ndarray) -> np.ndarray:
+        if self.kernel_size == 0:
+            return activations
+        windows = get_windows(activations, self.kernel_size, self.stride)
+        return windows.max(axis=(3, 4))
+
+
+class AveragePoolingModel:
+    """Model of "average_pooling.vhd"."""
+
+    def __init__(self, bitwidth: int):
+        self.bitwidth = bitwidth
+
+    def __call__(self, activations: np.ndarray) -> np.ndarray:
+        height, width = activations.shape[1:3]
+        sums = activations.sum(axis=(1, 2), dtype=np.int64)
+        average = round_fixed(sums * reciprocal(height * width), C_FRACW_REZI)
+        # The buffer gets rotated, i. e. the last channel is sent first.
+        return np.mod(average, 2 ** self.bitwidth)[:, ::-1]
+
+
+class SerializerModel:
+    """Model of "serializer.vhd". The first channel is sent first."""
+
+    def __call__(self, activations: np.ndarray) -> np.ndarray:
+        return activations.reshape(activations.shape[0], -1)
+
+
+class ArgmaxModel:
+    """Model of "argmax.vhd". The index of a class is its position in the stream."""
+
+    def __init__(self, layer):
+        self.top_k = int(layer.constants["C_TOP_K"].value)
+        self.output_score = int(layer.constants["C_OUTPUT_SCORE"].value)
+
+    def __call__(self, activations: np.ndarray) -> np.ndarray:
+        scores = activations.reshape(activations.shape[0], -1).astype(np.int64)
+        # A stable sort ranks equal scores by index, like the hardware.
+        ranking = np.argsort(-scores, axis=1, kind="stable")[:, : self.top_k]
+        if not self.output_score:
+            return ranking
+        ranked_scores = np.take_along_axis(scores, ranking, axis=1)
+        return np.stack((ranking, ranked_scores), axis=-1).reshape(len(scores), -1)
+
+
+class GoldenModel:
+    """Evaluate a "Bnn" of the toplevel generator bit-exact."""
+
+    def __init__(self, bnn):
+        self.layers = []
+
+        bitwidth = bnn.input_layer_info["bitwidth"]
+        for layer in bnn.layers:
+            if isinstance(layer, toplevel.Convolution):
+                model = ConvolutionModel(layer)
+                bitwidth = model.output_channel_bitwidth
+            elif isinstance(layer, toplevel.Dense):
+                model = DenseModel(layer)
+                bitwidth = model.output_channel_bitwidth
+            elif isinstance(layer, toplevel.MaximumPooling):
+                model = MaximumPoolingModel(layer)
+            elif isinstance(layer, toplevel.AveragePooling):
+                model = AveragePoolingModel(bitwidth)
+            elif isinstance(layer, toplevel.Serializer):
+                model = SerializerModel()
+            elif isinstance(layer, toplevel.Argmax):
+                model = ArgmaxModel(layer)
+            else:
+                raise Exception(f"Unsupported layer: {type(layer)}")
+            self.layers.append(model)
+
+    def features(self, images: np.ndarray) -> List[np.ndarray]:
+        """Obtain the output of all layers for a batch of images (N x H x W x CH).
+        The channel of the feature maps are in hardware order."""
+        features = [images]
+        for layer in self.layers:
+            features.append(layer(features[-1]))
+        return features[1:]
+
+    def predict(self, images: np.ndarray, batch_size: int = 1000) -> np.ndarray:
+        """Obtain the output of the bnn for a batch of images (N x H x W x CH).
+        Class scores are in the order they are sent by the bnn."""
+        return np.concatenate(
+            [
+                self.features(images[index : index + batch_size])[-1]
+                for index in range(0, len(images), batch_size)
+            ]
+        )
+
+    def accuracy(self, images: np.ndarray, labels: np.ndarray) -> float:
+        """Calculate the accuracy of the bnn for a batch of images."""
+        predictions = self.predict(images).reshape(len(images), -1)
+        return float(np.mean(np.argmax(predictions, axis=1) == labels.flatten()))
+
+
+if __name__ == "__main__":
+    import tensorflow as tf
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "../models/test"
+    golden_model = GoldenModel(toplevel.bnn_from_larq(model_path))
+
+    _, (test_images, test_labels) = tf.keras.datasets.mnist.load_data()
+    test_images = test_images.reshape(test_images.shape + (1,))
+
+    t_start = time.perf_counter()
+    accuracy = golden_model.accuracy(test_images, test_labels)
+    t_end = time.perf_counter()
+    print(
+        f"Accuracy on {len(test_images)} images: {accuracy * 100:.2f} % "
+        f"({t_end - t_start:.2f} s)"
+    )
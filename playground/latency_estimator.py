@@ -0,0 +1,330 @@
+"""Static latency and throughput estimation of a generated bnn.
+
+The valid signals of all layers are modelled cycle accurate, based on the
+pipeline stages of the vhdl modules. No simulation or synthesis is needed.
+"""
+
+import argparse
+from dataclasses import asdict, dataclass
+from importlib import import_module
+import json
+import math
+import sys
+from typing import Dict, List
+
+import numpy as np
+
+toplevel = import_module("04_custom_toplevel")
+
+
+@dataclass
+class LayerLatency:
+    name: str
+    type: str
+    # number of valid cycles at the input and output of the layer
+    input_count: int
+    output_count: int
+    # first input -> first output
+    fill_latency: int
+    # first output -> last output
+    processing_span: int
+    # last input -> last output
+    drain_latency: int
+    # minimum number of cycles between two images
+    occupancy: int
+
+
+def adder_tree_latency(input_count: int) -> int:
+    """Latency of "adder_tree.vhd": one cycle for the input and one for each stage."""
+    return math.ceil(math.log2(input_count)) + 1
+
+
+def convolution_latency(kernel_size: int, input_channel: int, bitwidth: int) -> int:
+    """Latency of "convolution.vhd"."""
+    input_count = kernel_size ** 2 * input_channel
+    if bitwidth == 1:
+        # xnor, popcount of 7 bits, adder tree
+        return 2 + adder_tree_latency(math.ceil(input_count / 7))
+    # multiplication by +-1, adder tree
+    return 1 + adder_tree_latency(input_count)
+
+
+def selected_windows(
+    pixel: np.ndarray, info: Dict, kernel_size: int, stride: int, padding: int
+) -> np.ndarray:
+    """Whether a pixel (index in the padded stream) completes a window."""
+    row, column = np.divmod(pixel, info["width"])
+    # The first pixels of a row complete the windows of the previous row.
+    wrap = column < padding
+    row = np.where(wrap, row - 1, row)
+    column = np.where(wrap, column + info["width"], column)
+    first = kernel_size - 1 - padding
+    return (
+        (row >= first)
+        & (row < info["height"] + padding)
+        & (column >= first)
+        & ((row - first) % stride == 0)
+        & ((column - first) % stride == 0)
+    )
+
+
+def window_ctrl(
+    times: np.ndarray,
+    info: Dict,
+    kernel_size: int,
+    stride: int,
+    padding: int = 0,
+    repeat: int = 1,
+):
+    """Valid cycles at the output of "window_ctrl.vhd"."""
+    if kernel_size == 1:
+        # no buffering and no trimming
+        return times
+
+    if padding > 0:
+        # After the last pixel, the padding rows get flushed. A pixel is
+        # flushed when the window control is ready, i. e. when the previous
+        # pixel passed the buffers (and the channel repeater).
+        flush_count = padding * info["width"] + padding
+        selected = selected_windows(
+            np.arange(len(times) + flush_count), info, kernel_size, stride, padding
+        )
+        flush_times = []
+        last_time = times[-1]
+        selected_times = times[selected[: len(times)]]
+        last_selected = selected_times[-1] if len(selected_times) else -sys.maxsize
+        for index in range(len(times), len(times) + flush_count):
+            ready_time = last_time + 3
+            if repeat > 1:
+                ready_time = max(ready_time, last_selected + repeat + 4)
+            last_time = ready_time + 1
+            if selected[index]:
+                last_selected = last_time
+            flush_times.append(last_time)
+        times = np.concatenate((times, flush_times))
+    else:
+        selected = selected_windows(
+            np.arange(len(times)), info, kernel_size, stride, padding
+        )
+
+    # Only complete windows get forwarded. Delayed by line buffer,
+    # window buffer and selector.
+    return times[selected] + 3
+
+
+def min_interval(times: np.ndarray) -> int:
+    """Minimum number of cycles between two valid cycles."""
+    if len(times) < 2:
+        return sys.maxsize
+    return int(np.diff(times).min())
+
+
+def deserializer(times: np.ndarray, channel: int) -> np.ndarray:
+    """Valid cycles at the output of "deserializer.vhd"."""
+    return times[channel - 1 :: channel] + 1
+
+
+def layer_times(layer, info: Dict, times: np.ndarray):
+    """Valid cycles at the output of a layer and its occupancy."""
+    occupancy = len(times)
+
+    if isinstance(layer, toplevel.Convolution):
+        kernel_size = int(layer.constants["C_KERNEL_SIZE"].value)
+        padding = int(layer.constants["C_PAD"].value)
+        folding = int(layer.constants["C_FOLDING"].value)
+        output_times = window_ctrl(
+            times,
+            info,
+            kernel_size,
+            int(layer.constants["C_STRIDE"].value),
+            padding,
+            folding,
+        )
+        if padding > 0:
+            # The next frame can't enter, until the padding of the current
+            # frame is flushed, i. e. until the last window is complete.
+            occupancy = max(occupancy, int(output_times[-1] - 3 - times[0]) + 1)
+        if folding > 1:
+            # Each window gets repeated by the channel repeater. The output
+            # is assembled, until the last slice of output channel is done.
+            if min_interval(output_times) <= folding:
+                raise Exception(
+                    f"Windows of layer {layer.info['name']} arrive every "
+                    f"{min_interval(output_times)} cycles. Folding {folding} "
+                    f"needs at least {folding + 1} cycles."
+                )
+            occupancy = max(occupancy, len(output_times) * (folding + 1))
+            output_times = output_times + folding + 1
+        output_times = output_times + convolution_latency(
+            kernel_size, info["channel"], info["bitwidth"]
+        )
+        if int(layer.constants["C_OUTPUT_CHANNEL_BITWIDTH"].value) == 1:
+            # batch normalization
+            output_times = output_times + 1
+    elif isinstance(layer, toplevel.Dense):
+        # The xnor-popcount of each pixel gets accumulated. The output is valid
+        # one cycle after the last pixel passed the convolution.
+        output_times = (
+            times[-1:] + 1 + convolution_latency(1, info["channel"], info["bitwidth"])
+        )
+        if int(layer.constants["C_OUTPUT_CHANNEL_BITWIDTH"].value) == 1:
+            # batch normalization
+            output_times = output_times + 1
+    elif isinstance(layer, toplevel.MaximumPooling):
+        kernel_size = int(layer.constants["C_KERNEL_SIZE"].value)
+        if kernel_size == 0:
+            output_times = times
+        else:
+            output_times = window_ctrl(
+                times, info, kernel_size, int(layer.constants["C_STRIDE"].value)
+            )
+            output_times = output_times + 1
+    elif isinstance(layer, toplevel.AveragePooling):
+        # The state machine starts one cycle after the last pixel.
+        # Each average needs three cycles (calculate, pipeline, output).
+        channel = info["channel"]
+        output_times = times[-1] + 5 + 3 * np.arange(channel)
+        # The next frame gets summed up meanwhile. But all averages have to be
+        # sent, before the next frame ends.
+        occupancy = max(occupancy, 3 * channel)
+    elif isinstance(layer, toplevel.Serializer):
+        channel = info["channel"]
+        output_times = (times[:, np.newaxis] + 1 + np.arange(channel)).flatten()
+        occupancy = len(times) * channel
+    elif isinstance(layer, toplevel.Argmax):
+        # The ranking is complete with the last class. The result words are
+        # registered, i. e. they start two cycles later.
+        words = int(layer.constants["C_TOP_K"].value) * (
+            1 + int(layer.constants["C_OUTPUT_SCORE"].value)
+        )
+        output_times = times[-1] + 2 + np.arange(words)
+        occupancy = max(occupancy, words)
+    else:
+        raise Exception(f"Unsupported layer: {type(layer)}")
+    return output_times, occupancy
+
+
+def estimate_latency(bnn, input_interval: int = 1) -> Dict:
+    """Estimate the latency of a bnn in cycles. The input data is sent every
+    "input_interval" cycles."""
+    input_info = bnn.input_layer_info
+    input_count = input_info["height"] * input_info["width"] * input_info["channel"]
+    input_times = np.arange(input_count) * input_interval
+
+    times = deserializer(input_times, input_info["channel"])
+    layers = [
+        LayerLatency(
+            input_info["name"],
+            "Deserializer",
+            input_count,
+            len(times),
+            int(times[0] - input_times[0]),
+            int(times[-1] - times[0]),
+            int(times[-1] - input_times[-1]),
+            input_count * input_interval,
+        )
+    ]
+
+    padded_layer = bnn.get_last_padded_layer()
+    for layer, info in zip(bnn.layers, bnn.update_layers()):
+        output_times, occupancy = layer_times(layer, info, times)
+        if layer is padded_layer:
+            # The input of the next frame waits for the last output of the
+            # last padded layer (see "Bnn.to_vhdl()").
+            occupancy = max(occupancy, int(output_times[-1] - input_times[0]) + 1)
+        layers.append(
+            LayerLatency(
+                layer.info["name"],
+                type(layer).__name__,
+                len(times),
+                len(output_times),
+                int(output_times[0] - times[0]),
+                int(output_times[-1] - output_times[0]),
+                int(output_times[-1] - times[-1]),
+                occupancy,
+            )
+        )
+        times = output_times
+
+    bottleneck = max(layers, key=lambda layer: layer.occupancy)
+    return {
+        "input_interval": input_interval,
+        "layers": [asdict(layer) for layer in layers],
+        "latency": int(times[-1] - input_times[0]),
+        "initiation_interval": bottleneck.occupancy,
+        "bottleneck": bottleneck.name,
+    }
+
+
+def add_throughput(estimation: Dict, frequency: float) -> Dict:
+    """Add the absolute latency and throughput at a specific clock frequency."""
+    estimation["frequency"] = frequency
+    estimation["latency_s"] = estimation["latency"] / frequency
+    estimation["throughput"] = frequency / estimation["initiation_interval"]
+    return estimation
+
+
+def print_table(estimation: Dict):
+    header = ("layer", "type", "inputs", "outputs", "fill", "span", "drain", "occ.")
+    rows = [
+        (
+            layer["name"],
+            layer["type"],
+            layer["input_count"],
+            layer["output_count"],
+            layer["fill_latency"],
+            layer["processing_span"],
+            layer["drain_latency"],
+            layer["occupancy"],
+        )
+        for layer in estimation["layers"]
+    ]
+    widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(8)]
+    for row in [header] + rows:
+        print(" | ".join(str(col).ljust(width) for col, width in zip(row, widths)))
+    print(
+        f"latency: {estimation['latency']} cycles ({estimation['latency_s'] * 1e6:.2f} us), "
+        f"initiation interval: {estimation['initiation_interval']} cycles "
+        f"({estimation['throughput']:.0f} images/s), "
+        f"bottleneck: {estimation['bottleneck']}"
+    )
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="../models/test", help="larq model")
+    parser.add_argument("--frequency", type=float, default=25e6, help="clock in Hz")
+    parser.add_argument(
+        "--input-interval", type=int, default=1, help="cycles between input data"
+    )
+    parser.add_argument("--json", help="write the estimation to a json file")
+    parser.add_argument("--max-latency", type=int, help="maximum latency in cycles")
+    parser.add_argument(
+        "--min-throughput", type=float, help="minimum throughput in images/s"
+    )
+    args = parser.parse_args(argv)
+
+    bnn = toplevel.bnn_from_larq(args.model)
+    estimation = add_throughput(
+        estimate_latency(bnn, args.input_interval), args.frequency
+    )
+    print_table(estimation)
+    if args.json:
+        with open(args.json, "w") as outfile:
+            json.dump(estimation, outfile, indent=2)
+
+    failed = False
+    if args.max_latency is not None and estimation["latency"] > args.max_latency:
+        print(f"Latency exceeds {args.max_latency} cycles.")
+        failed = True
+    if (
+        args.min_throughput is not None
+        and estimation["throughput"] < args.min_throughput
+    ):
+        print(f"Throughput is below {args.min_throughput} images/s.")
+        failed = True
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,172 @@
+"""Select the folding factor of each convolution layer.
+
+Fully parallel layers (full inter output parallelism, see "doc/parallelism.md")
+compute all output channel of a window in one cycle. Most of the layers don't
+receive a window each cycle, though. Such layers can be folded, i. e. the
+window gets repeated and only a part of the output channel is computed per
+cycle. The hardware gets reused for all parts.
+
+The input interval is derived from the target throughput. Then each layer gets
+folded as far as the interval between its windows allows, or only as far as
+needed to fit the device ("--min-latency"). Finally, the plan is checked against
+the latency and resource estimation.
+"""
+
+import argparse
+from importlib import import_module
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import latency_estimator
+import resource_estimator
+
+toplevel = import_module("04_custom_toplevel")
+
+
+def divisors(number: int) -> List[int]:
+    return [divisor for divisor in range(1, number + 1) if number % divisor == 0]
+
+
+def input_interval(bnn, frequency: float, throughput: float) -> int:
+    """Cycles between two input data to reach a specific throughput in images/s."""
+    info = bnn.input_layer_info
+    input_count = info["height"] * info["width"] * info["channel"]
+    interval = int(frequency / throughput) // input_count
+    if interval < 1:
+        raise Exception(
+            f"Throughput of {throughput} images/s isn't possible at {frequency} Hz."
+        )
+    return interval
+
+
+def feasible_foldings(bnn, interval: int) -> Dict[str, List[int]]:
+    """Folding factors of each convolution layer, such that the input can be
+    sent every "interval" cycles. The factor has to divide the output channel."""
+    info = bnn.input_layer_info
+    input_count = info["height"] * info["width"] * info["channel"]
+    times = latency_estimator.deserializer(
+        np.arange(input_count) * interval, info["channel"]
+    )
+
+    foldings = {}
+    for layer, info in zip(bnn.layers, bnn.update_layers()):
+        if isinstance(layer, toplevel.Convolution):
+            # The flushed padding adapts to the folding. Thus only the windows
+            # of the input pixel are relevant.
+            selected = latency_estimator.selected_windows(
+                np.arange(len(times)),
+                info,
+                int(layer.constants["C_KERNEL_SIZE"].value),
+                int(layer.constants["C_STRIDE"].value),
+                int(layer.constants["C_PAD"].value),
+            )
+            window_interval = latency_estimator.min_interval(times[selected])
+            # The channel repeater needs one cycle more than the folding factor.
+            foldings[layer.info["name"]] = [
+                folding
+                for folding in divisors(int(layer.constants["C_OUTPUT_CHANNEL"].value))
+                if folding == 1 or folding < window_interval
+            ]
+            # The folding only delays the windows. Thus the intervals of the
+            # following layers don't depend on it.
+            layer.constants["C_FOLDING"].value = str(foldings[layer.info["name"]][-1])
+        times, _ = latency_estimator.layer_times(layer, info, times)
+    return foldings
+
+
+def apply_plan(bnn, plan: Dict[str, int]):
+    for layer in bnn.layers:
+        if layer.info["name"] in plan:
+            layer.constants["C_FOLDING"].value = str(plan[layer.info["name"]])
+
+
+def plan_folding(bnn, interval: int, device: Optional[str] = None) -> Dict[str, int]:
+    """Select the folding factor of each convolution layer, such that the input
+    can be sent every "interval" cycles.
+
+    Without a device, each layer gets folded as far as possible. This needs the
+    least resources. Since folding adds latency, the layers can be folded only
+    as far as needed to fit a device instead. Starting without folding, the step
+    to the next folding factor, which saves the most slices, is taken until the
+    resource estimation fits the device. If it doesn't fit at all, the result
+    is the maximum folding."""
+    foldings = feasible_foldings(bnn, interval)
+    if device is None:
+        plan = {name: options[-1] for name, options in foldings.items()}
+        apply_plan(bnn, plan)
+        return plan
+
+    plan = {name: options[0] for name, options in foldings.items()}
+    apply_plan(bnn, plan)
+    while resource_estimator.check_device(
+        resource_estimator.estimate_resources(bnn), device
+    ):
+        steps = []
+        for name, options in foldings.items():
+            larger = [folding for folding in options if folding > plan[name]]
+            if larger:
+                apply_plan(bnn, {**plan, name: larger[0]})
+                slices = resource_estimator.estimate_resources(bnn)["slices"]
+                steps.append((slices, name, larger[0]))
+        if not steps:
+            break
+        _, name, folding = min(steps)
+        plan[name] = folding
+        apply_plan(bnn, plan)
+    return plan
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="../models/test", help="larq model")
+    parser.add_argument("--frequency", type=float, default=25e6, help="clock in Hz")
+    parser.add_argument(
+        "--throughput", type=float, required=True, help="target images/s"
+    )
+    parser.add_argument(
+        "--device", default="85k", choices=resource_estimator.DEVICES.keys()
+    )
+    parser.add_argument(
+        "--min-latency",
+        action="store_true",
+        help="fold only as far as needed to fit the device, instead of maximally",
+    )
+    parser.add_argument("--output", help="write the planned toplevel to a file")
+    parser.add_argument(
+        "--init-files", help="write weights and thresholds to rom init files"
+    )
+    args = parser.parse_args(argv)
+
+    bnn = toplevel.bnn_from_larq(args.model)
+    if args.init_files:
+        bnn.use_init_files(args.init_files)
+    interval = input_interval(bnn, args.frequency, args.throughput)
+    plan = plan_folding(bnn, interval, args.device if args.min_latency else None)
+    for name, folding in plan.items():
+        print(f"{name}: folding {folding}")
+
+    latency = latency_estimator.add_throughput(
+        latency_estimator.estimate_latency(bnn, interval), args.frequency
+    )
+    latency_estimator.print_table(latency)
+    resources = resource_estimator.estimate_resources(bnn)
+    resource_estimator.print_table(resources, args.device)
+
+    failed = False
+    if latency["throughput"] < args.throughput:
+        print(f"Throughput is below {args.throughput} images/s.")
+        failed = True
+    for warning in resource_estimator.check_device(resources, args.device):
+        print(f"WARNING: {warning}")
+        failed = True
+
+    if args.output:
+        with open(args.output, "w") as outfile:
+            outfile.write(bnn.to_vhdl())
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,578 @@
+"""Pre-synthesis resource estimation of a generated bnn for ECP5 devices.
+
+The estimation is based on the generics of the layers. The amount of LUT and
+FF is estimated for each module, based on the structure of the vhdl code.
+The number of slices is calibrated by synthesis results (yosys, nextpnr).
+"""
+
+import argparse
+from dataclasses import asdict, dataclass
+from importlib import import_module
+import json
+import math
+import re
+import sys
+from typing import Dict, List, Tuple
+
+toplevel = import_module("04_custom_toplevel")
+
+
+@dataclass
+class Device:
+    slices: int
+    ebr: int
+    dsp: int
+
+
+# ECP5 devices as reported by nextpnr. Each slice contains two LUT4 and two FF.
+DEVICES = {
+    "12k": Device(slices=6072, ebr=32, dsp=28),
+    "25k": Device(slices=12168, ebr=56, dsp=28),
+    "45k": Device(slices=21924, ebr=108, dsp=72),
+    "85k": Device(slices=41820, ebr=208, dsp=156),
+}
+
+# Slices per estimated slice (max(LUT, FF) / 2). Synthesis removes some of the
+# registers, especially of the adder trees. On the other hand, packing isn't
+# perfect. Obtained by "calibrate()" with the runs of "CALIBRATION_RUNS".
+# TODO: Only a single run is available yet, i. e. the factor matches this run
+# by construction and the residual error is unknown. Add the runs printed by
+# "make calibration" and update the factor.
+SLICE_FACTOR = 0.79
+
+# Synthesis results for calibration: (description, input shape, layers, used
+# slices). Layers are given as in "bnn_from_spec()". The weights don't matter.
+CALIBRATION_RUNS = [
+    (
+        "Mnist example of the README (05_intro_modified.py)",
+        (28, 28, 1, 8),
+        [
+            ("conv", 3, 1, 8, 1),
+            ("conv", 3, 1, 16, 1),
+            ("max", 2, 2),
+            ("conv", 3, 1, 32, 1),
+            ("max", 2, 2),
+            ("conv", 1, 1, 64, 1),
+            ("conv", 1, 1, 128, 1),
+            ("conv", 1, 1, 10, 8),
+            ("avg",),
+        ],
+        17276,
+    ),
+]
+
+# Configurations to synthesize for calibration by "make calibration". They vary
+# the number of layers, the channel and the bitwidths: (input shape, layers).
+CALIBRATION_CONFIGURATIONS = {
+    "single_conv": ((28, 28, 1, 8), [("conv", 3, 1, 10, 8), ("avg",)]),
+    "binary_input": (
+        (28, 28, 1, 1),
+        [
+            ("conv", 3, 1, 16, 1),
+            ("conv", 3, 1, 16, 1),
+            ("max", 2, 2),
+            ("conv", 1, 1, 10, 8),
+            ("avg",),
+        ],
+    ),
+    "wide": (
+        (14, 14, 1, 8),
+        [
+            ("conv", 3, 1, 32, 1),
+            ("conv", 3, 1, 64, 1),
+            ("max", 2, 2),
+            ("conv", 1, 1, 10, 8),
+            ("avg",),
+        ],
+    ),
+    "rgb": (
+        (16, 16, 3, 8),
+        [
+            ("conv", 3, 1, 16, 1),
+            ("max", 2, 2),
+            ("conv", 3, 1, 32, 1),
+            ("conv", 1, 1, 10, 4),
+            ("avg",),
+        ],
+    ),
+    "deep": (
+        (32, 32, 1, 8),
+        [
+            ("conv", 3, 1, 8, 1),
+            ("conv", 3, 1, 8, 1),
+            ("max", 2, 2),
+            ("conv", 3, 1, 16, 1),
+            ("conv", 3, 1, 16, 1),
+            ("max", 2, 2),
+            ("conv", 3, 1, 32, 1),
+            ("conv", 1, 1, 10, 8),
+            ("avg",),
+        ],
+    ),
+}
+
+
+@dataclass
+class LayerResources:
+    name: str
+    type: str
+    lut: int = 0
+    ff: int = 0
+    # memory bits, mapped to block ram (EBR) or distributed ram (LUT)
+    ram_bits: int = 0
+    ebr: int = 0
+    dsp: int = 0
+    # weights and thresholds
+    constant_bits: int = 0
+
+    def __iadd__(self, other):
+        self.lut += other.lut
+        self.ff += other.ff
+        self.ram_bits += other.ram_bits
+        self.ebr += other.ebr
+        self.dsp += other.dsp
+        self.constant_bits += other.constant_bits
+        return self
+
+
+def log2(value: int) -> int:
+    """Same as "log2()" of the "math_pkg"."""
+    return math.ceil(math.log2(value)) if value > 1 else 0
+
+
+def ebr_count(data_width: int, depth: int) -> int:
+    """Number of 18 kbit EBR for a memory of specific size."""
+    for max_depth, max_width in (
+        (512, 36),
+        (1024, 18),
+        (2048, 9),
+        (4096, 4),
+        (8192, 2),
+        (16384, 1),
+    ):
+        if depth <= max_depth:
+            return math.ceil(data_width / max_width)
+    return math.ceil(depth / 16384) * data_width
+
+
+def memory(data_width: int, depth: int) -> LayerResources:
+    """Resources of "bram.vhd". Small memories get mapped to distributed ram."""
+    resources = LayerResources("", "", ram_bits=data_width * depth)
+    if depth <= 64 and resources.ram_bits <= 4096:
+        # TRELLIS_DPR16X4: 16 x 4 bit, about three LUT each
+        resources.lut = 3 * math.ceil(data_width / 4) * math.ceil(depth / 16)
+    else:
+        resources.ebr = ebr_count(data_width, depth)
+    return resources
+
+
+def rom(data_width: int, depth: int) -> LayerResources:
+    """Resources of "brom.vhd". Shallow roms get mapped to logic."""
+    resources = LayerResources("", "", ram_bits=data_width * depth, ff=data_width)
+    if depth > 16:
+        resources.ebr = ebr_count(data_width, depth)
+    elif depth > 1:
+        resources.lut = data_width
+    return resources
+
+
+def adder_tree(input_count: int, input_bitwidth: int) -> LayerResources:
+    """Resources of "adder_tree.vhd". Each stage extends the bitwidth by one."""
+    resources = LayerResources("", "", ff=input_count * input_bitwidth)
+    count, bitwidth = input_count, input_bitwidth
+    while count > 1:
+        adders = count // 2
+        count -= adders
+        bitwidth += 1
+        # one LUT per bit, the carry chain (CCU2C) is included
+        resources.lut += adders * bitwidth
+        resources.ff += count * bitwidth
+    return resources
+
+
+def window_ctrl(
+    bitwidth: int, width: int, height: int, kernel_size: int, padding: int = 0
+):
+    """Resources of "window_ctrl.vhd"."""
+    if kernel_size == 1:
+        return LayerResources("", "")
+    if padding > 0:
+        # The padding rows and the first pixels of the next row get flushed.
+        height += padding + 1
+    # pixel counter, trimming and selection
+    counter_bits = log2(width) + log2(height) + log2(width * height + 1)
+    resources = LayerResources("", "", lut=2 * counter_bits + 10, ff=counter_bits + 4)
+    # line buffer (see "line_buffer.vhd")
+    resources += memory((kernel_size - 1) * bitwidth, 2 ** log2(width - 2))
+    # line buffer output, window buffer and selector output
+    resources.ff += (kernel_size + 2 * kernel_size ** 2) * bitwidth
+    if padding > 0:
+        # Masking of each window value, input multiplexer, masks and flush.
+        resources.lut += (kernel_size ** 2 + 1) * bitwidth + 4 * kernel_size
+        resources.ff += 4 * kernel_size + 2
+    return resources
+
+
+def convolution(kernel_size: int, input_channel: int, bitwidth: int):
+    """Resources of "convolution.vhd" for a single output channel."""
+    input_count = kernel_size ** 2 * input_channel
+    if bitwidth == 1:
+        # The weights are constant. Thus the xnor gets absorbed.
+        # Popcount of 7 bits by 4 full adders, i. e. 8 LUT.
+        resources = LayerResources("", "", ff=input_count)
+        resources.lut += math.ceil(8 * input_count / 7)
+        resources += adder_tree(math.ceil(input_count / 7), 3)
+    else:
+        # Negation for about half of the inputs.
+        product_bitwidth = bitwidth + 1
+        resources = LayerResources("", "", ff=input_count * product_bitwidth)
+        resources.lut += input_count * product_bitwidth // 2
+        resources += adder_tree(input_count, product_bitwidth)
+    return resources
+
+
+def layer_resources(layer, info: Dict) -> LayerResources:
+    """Resources of a single layer."""
+    resources = LayerResources(layer.info["name"], type(layer).__name__)
+
+    if isinstance(layer, toplevel.Convolution):
+        kernel_size = int(layer.constants["C_KERNEL_SIZE"].value)
+        output_channel = int(layer.constants["C_OUTPUT_CHANNEL"].value)
+        output_bitwidth = int(layer.constants["C_OUTPUT_CHANNEL_BITWIDTH"].value)
+        folding = int(layer.constants["C_FOLDING"].value)
+        units = output_channel // folding
+        input_bitwidth = info["channel"] * info["bitwidth"]
+        threshold_bitwidth = (
+            info["bitwidth"] + log2(kernel_size ** 2 * info["channel"] + 1) + 1
+        )
+
+        resources += window_ctrl(
+            input_bitwidth,
+            info["width"],
+            info["height"],
+            kernel_size,
+            int(layer.constants["C_PAD"].value),
+        )
+        for _ in range(units):
+            resources += convolution(kernel_size, info["channel"], info["bitwidth"])
+        if output_bitwidth == 1:
+            # comparison with a constant threshold
+            resources.lut += units * math.ceil(threshold_bitwidth / 2)
+            resources.ff += units
+        weight_bits = units * kernel_size ** 2 * info["channel"]
+        if layer.init_file_directory:
+            # The weights and thresholds are read from rom. The xnor doesn't
+            # get absorbed anymore.
+            resources += rom(weight_bits, folding)
+            resources += rom(units * threshold_bitwidth, folding)
+            resources.lut += weight_bits
+        elif folding > 1:
+            # Weights and thresholds of the current slice are selected by a
+            # counter, i. e. one LUT per bit and 16 slices.
+            selected_bits = weight_bits
+            if output_bitwidth == 1:
+                selected_bits += units * threshold_bitwidth
+            resources.lut += selected_bits * math.ceil(folding / 16)
+        if folding > 1:
+            # channel repeater, slice counter and output assembly
+            resources.ff += input_bitwidth * kernel_size ** 2 + 2 * log2(folding)
+            resources.ff += output_channel * output_bitwidth
+        resources.constant_bits = output_channel * (
+            kernel_size ** 2 * info["channel"] + threshold_bitwidth
+        )
+    elif isinstance(layer, toplevel.Dense):
+        output_channel = int(layer.constants["C_OUTPUT_CHANNEL"].value)
+        output_bitwidth = int(layer.constants["C_OUTPUT_CHANNEL_BITWIDTH"].value)
+        pixel = info["width"] * info["height"]
+        threshold_bitwidth = info["bitwidth"] + log2(pixel * info["channel"] + 1) + 1
+
+        # The weights of each pixel are read from rom. The xnor doesn't get absorbed.
+        weight_bits = info["channel"] * output_channel
+        resources += rom(weight_bits, 2 ** log2(pixel))
+        resources.lut += weight_bits
+        for _ in range(output_channel):
+            resources += convolution(1, info["channel"], info["bitwidth"])
+        # accumulator and result of each output channel, pixel counters
+        resources.lut += output_channel * threshold_bitwidth
+        resources.ff += 2 * output_channel * threshold_bitwidth + 2 * log2(pixel)
+        if output_bitwidth == 1:
+            # comparison with a constant threshold
+            resources.lut += output_channel * math.ceil(threshold_bitwidth / 2)
+            resources.ff += output_channel
+        resources.constant_bits = output_channel * (
+            pixel * info["channel"] + threshold_bitwidth
+        )
+    elif isinstance(layer, toplevel.MaximumPooling):
+        kernel_size = int(layer.constants["C_KERNEL_SIZE"].value)
+        if kernel_size != 0:
+            resources += window_ctrl(
+                info["channel"], info["width"], info["height"], kernel_size
+            )
+            # "or" of all window values for each channel
+            resources.lut += info["channel"] * math.ceil((kernel_size ** 2 - 1) / 3)
+            resources.ff += info["channel"]
+    elif isinstance(layer, toplevel.AveragePooling):
+        pixel = info["width"] * info["height"]
+        sum_bitwidth = info["bitwidth"] + log2(pixel + 1)
+        # channel buffer and accumulation
+        resources.lut += info["channel"] * sum_bitwidth
+        resources.ff += info["channel"] * sum_bitwidth + log2(pixel) + 8
+        # multiplication with the reciprocal (16 fractional bits)
+        resources.dsp += math.ceil((sum_bitwidth + 1) / 18)
+        resources.ff += 2 * (sum_bitwidth + 17) + info["bitwidth"]
+    elif isinstance(layer, toplevel.Serializer):
+        resources.lut += info["channel"] * info["bitwidth"]
+        resources.ff += info["channel"] * info["bitwidth"] + log2(info["channel"] + 1)
+    elif isinstance(layer, toplevel.Argmax):
+        top_k = int(layer.constants["C_TOP_K"].value)
+        entry_bitwidth = info["bitwidth"] + log2(info["channel"])
+        # comparison and insertion of each rank, ranking and output buffer
+        resources.lut += top_k * (math.ceil(info["bitwidth"] / 2) + entry_bitwidth)
+        resources.ff += 2 * top_k * entry_bitwidth + top_k + info["bitwidth"] + 8
+    else:
+        raise Exception(f"Unsupported layer: {type(layer)}")
+    return resources
+
+
+def estimate_resources(bnn, slice_factor: float = SLICE_FACTOR) -> Dict:
+    """Estimate the resources of a bnn."""
+    input_info = bnn.input_layer_info
+    layers = [
+        LayerResources(
+            input_info["name"],
+            "Deserializer",
+            ff=input_info["channel"] * input_info["bitwidth"] + 4,
+        )
+    ]
+    for layer, info in zip(bnn.layers, bnn.update_layers()):
+        layers.append(layer_resources(layer, info))
+
+    total = LayerResources("total", "")
+    for layer in layers:
+        total += layer
+    return {
+        "layers": [asdict(layer) for layer in layers],
+        "total": asdict(total),
+        "slices": math.ceil(slice_factor * max(total.lut, total.ff) / 2),
+    }
+
+
+def check_device(estimation: Dict, device: str) -> List[str]:
+    """Compare the estimation with the resources of a device.
+    Return a warning for each exceeded resource."""
+    budget = DEVICES[device]
+    usage = (
+        ("slices", estimation["slices"], budget.slices),
+        ("EBR", estimation["total"]["ebr"], budget.ebr),
+        ("DSP", estimation["total"]["dsp"], budget.dsp),
+    )
+    return [
+        f"Estimated {name} ({used}) exceed the {device} device ({available})."
+        for name, used, available in usage
+        if used > available
+    ]
+
+
+def bnn_from_spec(input_shape: Tuple, layers: List[Tuple]):
+    """Create a bnn with random weights from a short layer description:
+    ("conv", kernel size, stride, output channel, output bitwidth),
+    ("max", kernel size, stride) or ("avg",)."""
+    height, width, channel, bitwidth = input_shape
+    convolutions = [layer for layer in layers if layer[0] == "conv"]
+    output_channel, output_bitwidth = convolutions[-1][3:]
+    bnn = toplevel.Bnn(
+        height, width, channel, bitwidth, output_channel, output_bitwidth
+    )
+    for index, (type_, *parameter) in enumerate(layers):
+        name = f"{type_}{index}"
+        if type_ == "conv":
+            kernel_size, stride, output_channel, output_bitwidth = parameter
+            layer = toplevel.Convolution(
+                name,
+                channel,
+                bitwidth,
+                [
+                    toplevel.Parameter("C_KERNEL_SIZE", "integer", str(kernel_size)),
+                    toplevel.Parameter("C_STRIDE", "integer", str(stride)),
+                    toplevel.Parameter("C_OUTPUT_CHANNEL", "integer", output_channel),
+                    toplevel.Parameter(
+                        "C_OUTPUT_CHANNEL_BITWIDTH", "integer", output_bitwidth
+                    ),
+                ],
+            )
+            layer.add_weights()
+            layer.add_thresholds()
+            channel, bitwidth = output_channel, output_bitwidth
+        elif type_ == "max":
+            kernel_size, stride = parameter
+            layer = toplevel.MaximumPooling(
+                name,
+                [
+                    toplevel.Parameter("C_KERNEL_SIZE", "integer", str(kernel_size)),
+                    toplevel.Parameter("C_STRIDE", "integer", str(stride)),
+                ],
+            )
+        elif type_ == "avg":
+            layer = toplevel.AveragePooling(name, [])
+        else:
+            raise Exception(f"Unsupported layer: {type_}")
+        bnn.add_layer(layer)
+    return bnn
+
+
+def parse_nextpnr_log(text: str) -> int:
+    """Obtain the number of used slices from the nextpnr output."""
+    match = re.search(r"TRELLIS_SLICE:\s*(\d+)\s*/\s*\d+", text)
+    if match is None:
+        raise Exception("No slice utilization found.")
+    return int(match.group(1))
+
+
+def calibrate(runs: List[Tuple]) -> Tuple[float, List[float]]:
+    """Least squares fit of the slice factor: (bnn, used slices) for each run.
+    Return the factor and the relative error of the fitted estimation of each
+    run."""
+    estimated = [estimate_resources(bnn, 1)["slices"] for bnn, _ in runs]
+    used = [slices for _, slices in runs]
+    factor = sum(e * u for e, u in zip(estimated, used)) / sum(e * e for e in estimated)
+    errors = [factor * e / u - 1 for e, u in zip(estimated, used)]
+    return factor, errors
+
+
+def print_calibration(descriptions: List[str], runs: List[Tuple]):
+    factor, errors = calibrate(runs)
+    print(f"slice factor: {factor:.2f}")
+    for description, (bnn, slices), error in zip(descriptions, runs, errors):
+        estimated = estimate_resources(bnn, factor)["slices"]
+        print(f"{description}: {estimated} estimated, {slices} used ({error:+.1%})")
+    if len(runs) < 2:
+        # A single run is matched exactly by the fitted factor.
+        print("residual error: unknown, at least two runs are needed")
+    else:
+        rms = math.sqrt(sum(error ** 2 for error in errors) / len(errors))
+        print(
+            f"residual error: {rms:.1%} rms, "
+            f"{max(abs(error) for error in errors):.1%} max"
+        )
+    if len(runs) > 2:
+        # The fit matches its own runs better than new models. Thus estimate
+        # each run by the factor of the other runs.
+        cross_errors = []
+        for index, (bnn, slices) in enumerate(runs):
+            factor, _ = calibrate(runs[:index] + runs[index + 1 :])
+            cross_errors.append(
+                factor * estimate_resources(bnn, 1)["slices"] / slices - 1
+            )
+        print(
+            "leave-one-out error: "
+            f"{max(abs(error) for error in cross_errors):.1%} max"
+        )
+
+
+def print_table(estimation: Dict, device: str):
+    columns = ("name", "type", "lut", "ff", "ram_bits", "ebr", "dsp", "constant_bits")
+    rows = [
+        [str(layer[col]) for col in columns]
+        for layer in estimation["layers"] + [estimation["total"]]
+    ]
+    widths = [max(len(row[i]) for row in [columns] + rows) for i in range(len(columns))]
+    for row in [columns] + rows:
+        print(" | ".join(col.ljust(width) for col, width in zip(row, widths)))
+    print(
+        f"slices: {estimation['slices']}/{DEVICES[device].slices} "
+        f"({estimation['slices'] / DEVICES[device].slices * 100:.0f} %)"
+    )
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="../models/test", help="larq model")
+    parser.add_argument("--device", default="85k", choices=DEVICES.keys())
+    parser.add_argument("--json", help="write the estimation to a json file")
+    parser.add_argument(
+        "--strict", action="store_true", help="fail if the device is too small"
+    )
+    parser.add_argument(
+        "--init-files",
+        action="store_true",
+        help="weights and thresholds are read from rom init files",
+    )
+    parser.add_argument(
+        "--calibrate",
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("MODEL", "NEXTPNR_LOG"),
+        help="calculate the slice factor from synthesis runs",
+    )
+    parser.add_argument(
+        "--calibrate-configuration",
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("NAME", "NEXTPNR_LOG"),
+        help="calculate the slice factor from a synthesized calibration configuration",
+    )
+    parser.add_argument(
+        "--configuration-toplevel",
+        choices=CALIBRATION_CONFIGURATIONS.keys(),
+        help="generate the toplevel of a calibration configuration and exit",
+    )
+    args = parser.parse_args(argv)
+
+    if args.configuration_toplevel:
+        bnn = bnn_from_spec(*CALIBRATION_CONFIGURATIONS[args.configuration_toplevel])
+        with open("../src/bnn.vhd", "w") as outfile:
+            outfile.write(bnn.to_vhdl())
+        return 0
+
+    if args.calibrate or args.calibrate_configuration:
+        synthesized = [
+            (model, toplevel.bnn_from_larq(model), logfile)
+            for model, logfile in args.calibrate
+        ]
+        for name, logfile in args.calibrate_configuration:
+            if name not in CALIBRATION_CONFIGURATIONS:
+                parser.error(f"Unknown calibration configuration: {name}")
+            bnn = bnn_from_spec(*CALIBRATION_CONFIGURATIONS[name])
+            synthesized.append((name, bnn, logfile))
+
+        descriptions, runs, new_runs = [], [], []
+        for description, bnn, logfile in synthesized:
+            with open(logfile) as infile:
+                slices = parse_nextpnr_log(infile.read())
+            descriptions.append(description)
+            runs.append((bnn, slices))
+            if description in CALIBRATION_CONFIGURATIONS:
+                new_runs.append(
+                    (description, *CALIBRATION_CONFIGURATIONS[description], slices)
+                )
+        for description, input_shape, layers, slices in CALIBRATION_RUNS:
+            descriptions.append(description)
+            runs.append((bnn_from_spec(input_shape, layers), slices))
+        print_calibration(descriptions, runs)
+        if new_runs:
+            # The results have to be committed, i. e. added to the source.
+            print("Add the synthesized configurations to CALIBRATION_RUNS:")
+            for run in new_runs:
+                print(f"    {run!r},")
+        return 0
+
+    bnn = toplevel.bnn_from_larq(args.model)
+    if args.init_files:
+        # Only the usage matters. No files get written.
+        bnn.use_init_files("init")
+    estimation = estimate_resources(bnn)
+    print_table(estimation, args.device)
+    if args.json:
+        with open(args.json, "w") as outfile:
+            json.dump(estimation, outfile, indent=2)
+
+    warnings = check_device(estimation, args.device)
+    for warning in warnings:
+        print(f"WARNING: {warning}")
+    return int(args.strict and bool(warnings))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,399 @@
+"""Pipelined UART host client for the bnn on the board (see "bnn_uart.vhd").
+
+Each image is written in bulk as one frame of bytes. The board answers with the
+score of each output class, or with the best classes if the bnn ends with an
+argmax stage. Scores wider than 8 bit are split into several bytes, the least
+significant byte first (see "C_OUTPUT_BITWIDTH" of the generated bnn). With an
+input bitwidth of 1, the pixels get binarized and 8 pixels are packed into one
+byte (see "C_INPUT_BITWIDTH" of "bnn_uart.vhd"). This reduces the transfer time
+of an image by a factor of 8. Up to "max_in_flight" images are sent ahead, i. e.
+the next image is sent while the result of the previous image is received.
+
+The client uses the serial port as plain terminal device. Thus it works for the
+board as well as for the pseudo-terminal stand-in of "BoardEmulator", which
+allows to benchmark the host side without hardware.
+"""
+
+import argparse
+import asyncio
+from dataclasses import dataclass
+import math
+import os
+import pty
+import queue
+import sys
+import termios
+import threading
+import time
+import tty
+from typing import Callable, List, Optional
+
+import numpy as np
+
+# bits per byte: start bit, 8 data bits, stop bit
+UART_BITS_PER_BYTE = 10
+
+
+def open_port(port: str, baudrate: int) -> int:
+    """Open a terminal device in raw, non-blocking mode with 8N1 at the baudrate."""
+    fd = os.open(port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    tty.setraw(fd)
+    attributes = termios.tcgetattr(fd)
+    attributes[2] &= ~(termios.CSTOPB | termios.PARENB)
+    attributes[2] |= termios.CLOCAL | termios.CREAD
+    attributes[4] = attributes[5] = getattr(termios, f"B{baudrate}")
+    termios.tcsetattr(fd, termios.TCSANOW, attributes)
+    return fd
+
+
+def pack_image(image, bitwidth: int = 8) -> bytes:
+    """Pack the pixels (uint8) of an image into bytes. Only the most significant
+    "bitwidth" bits of each pixel are sent, i. e. 1 bit pixels are binarized at 128.
+    The first pixel is in the least significant bits of a byte. The last byte is
+    padded with zeros."""
+    values = np.asarray(image, dtype=np.uint8).flatten() >> (8 - bitwidth)
+    values_per_byte = 8 // bitwidth
+    values = np.pad(values, (0, -len(values) % values_per_byte))
+    shifts = np.arange(values_per_byte, dtype=np.uint8) * bitwidth
+    packed = (values.reshape(-1, values_per_byte) << shifts).sum(axis=1)
+    return packed.astype(np.uint8).tobytes()
+
+
+def unpack_scores(data: bytes, output_bytes: int = 1) -> np.ndarray:
+    """Combine the bytes of the scores. The least significant byte is first."""
+    words = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+    return words.reshape(-1, output_bytes) @ (1 << (8 * np.arange(output_bytes)))
+
+
+@dataclass
+class Statistics:
+    # seconds from sending the first byte of an image until its result is complete
+    latencies: List[float]
+    # seconds from sending the first image until the last result is complete
+    duration: float
+
+    @property
+    def images_per_second(self) -> float:
+        return len(self.latencies) / self.duration
+
+    def histogram(self, bins: int = 10, width: int = 40) -> str:
+        counts, edges = np.histogram(np.array(self.latencies) * 1e3, bins)
+        lines = []
+        for count, low, high in zip(counts, edges, edges[1:]):
+            bar = "#" * int(round(width * count / counts.max()))
+            lines.append(f"{low:9.3f} - {high:9.3f} ms | {bar} {count}")
+        return "\n".join(lines)
+
+    def report(self) -> str:
+        latencies = np.array(self.latencies) * 1e3
+        return "\n".join(
+            [
+                f"{len(self.latencies)} images in {self.duration:.3f} s: "
+                f"{self.images_per_second:.1f} images/s",
+                f"latency: min {latencies.min():.3f} ms, "
+                f"median {np.median(latencies):.3f} ms, "
+                f"max {latencies.max():.3f} ms",
+                self.histogram(),
+            ]
+        )
+
+
+class BnnClient:
+    def __init__(
+        self,
+        port: str,
+        image_size: int,
+        classes: int,
+        baudrate: int = 115200,
+        max_in_flight: int = 2,
+        timeout: float = 1.0,
+        input_bitwidth: int = 8,
+        output_bitwidth: int = 8,
+    ):
+        # "image_size" is the number of pixels (height * width * channel).
+        self.image_size = image_size
+        self.input_bitwidth = input_bitwidth
+        self.frame_size = math.ceil(image_size * input_bitwidth / 8)
+        self.classes = classes
+        self.output_bytes = math.ceil(output_bitwidth / 8)
+        self.baudrate = baudrate
+        self.max_in_flight = max_in_flight
+        # Additional time to wait for a result, besides the transfer time.
+        self.timeout = timeout
+        self.statistics: Optional[Statistics] = None
+
+        self.fd = open_port(port, baudrate)
+        self.buffer = bytearray()
+
+    def close(self):
+        os.close(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    async def wait_fd(self, add_callback, remove_callback):
+        """Wait until the port is readable or writable."""
+        future = asyncio.get_running_loop().create_future()
+        add_callback(self.fd, lambda: future.done() or future.set_result(None))
+        try:
+            await future
+        finally:
+            remove_callback(self.fd)
+
+    async def write(self, data: bytes):
+        loop = asyncio.get_running_loop()
+        view = memoryview(data)
+        while view:
+            try:
+                view = view[os.write(self.fd, view) :]
+            except BlockingIOError:
+                await self.wait_fd(loop.add_writer, loop.remove_writer)
+
+    async def read_exactly(self, size: int) -> bytes:
+        loop = asyncio.get_running_loop()
+        while len(self.buffer) < size:
+            try:
+                self.buffer.extend(os.read(self.fd, 4096))
+            except BlockingIOError:
+                await self.wait_fd(loop.add_reader, loop.remove_reader)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    async def classify_many_async(self, images) -> np.ndarray:
+        """Classify the images (uint8, any shape with "image_size" elements each).
+        Returns the class scores, one row per image."""
+        for image in images:
+            if np.size(image) != self.image_size:
+                raise Exception(
+                    f"Image has {np.size(image)} pixels. Expected {self.image_size}."
+                )
+        frames = [pack_image(image, self.input_bitwidth) for image in images]
+
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        send_times = []
+        # Worst case: The result is sent after the complete image is received.
+        result_timeout = (
+            self.timeout
+            + (self.frame_size + self.classes * self.output_bytes)
+            * UART_BITS_PER_BYTE
+            * self.max_in_flight
+            / self.baudrate
+        )
+
+        async def send():
+            for frame in frames:
+                await in_flight.acquire()
+                send_times.append(time.perf_counter())
+                await self.write(frame)
+
+        async def receive():
+            results, latencies = [], []
+            for index in range(len(frames)):
+                result = await asyncio.wait_for(
+                    self.read_exactly(self.classes * self.output_bytes), result_timeout
+                )
+                latencies.append(time.perf_counter() - send_times[index])
+                in_flight.release()
+                results.append(unpack_scores(result, self.output_bytes))
+            return results, latencies
+
+        start = time.perf_counter()
+        sender = asyncio.ensure_future(send())
+        try:
+            results, latencies = await receive()
+        finally:
+            sender.cancel()
+        self.statistics = Statistics(latencies, time.perf_counter() - start)
+        return np.array(results).reshape(len(frames), self.classes)
+
+    def classify_many(self, images) -> np.ndarray:
+        return asyncio.run(self.classify_many_async(images))
+
+    def classify(self, image) -> np.ndarray:
+        return self.classify_many([image])[0]
+
+
+def histogram_classifier(
+    classes: int, output_bytes: int = 1
+) -> Callable[[bytes], bytes]:
+    """Simple stand-in for the bnn: The score of a class is the number of
+    pixels in the corresponding brightness range."""
+
+    def classify(frame: bytes) -> bytes:
+        pixels = np.frombuffer(frame, dtype=np.uint8)
+        scores, _ = np.histogram(pixels, classes, (0, 256))
+        scores = np.minimum(scores, 256 ** output_bytes - 1)
+        return b"".join(int(score).to_bytes(output_bytes, "little") for score in scores)
+
+    return classify
+
+
+class BoardEmulator:
+    """Stand-in for the board on a pseudo-terminal. It receives frames of
+    "frame_size" bytes and answers each with the bytes of "classify". The
+    transfer time at the baudrate is emulated in both directions, the
+    processing time of the bnn by "latency"."""
+
+    def __init__(
+        self,
+        frame_size: int,
+        classify: Callable[[bytes], bytes],
+        baudrate: int = 115200,
+        latency: float = 0.0,
+    ):
+        self.frame_size = frame_size
+        self.classify = classify
+        self.byte_time = UART_BITS_PER_BYTE / baudrate
+        self.latency = latency
+
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+        self.results = queue.Queue()
+        self.running = True
+        self.threads = [
+            threading.Thread(target=self.receive, daemon=True),
+            threading.Thread(target=self.send, daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def receive(self):
+        frame = bytearray()
+        while self.running:
+            try:
+                data = os.read(self.master, self.frame_size - len(frame))
+            except OSError:
+                break
+            time.sleep(len(data) * self.byte_time)
+            frame.extend(data)
+            if len(frame) == self.frame_size:
+                ready = time.perf_counter() + self.latency
+                self.results.put((ready, self.classify(bytes(frame))))
+                frame = bytearray()
+        self.results.put(None)
+
+    def send(self):
+        while True:
+            item = self.results.get()
+            if item is None:
+                break
+            ready, result = item
+            time.sleep(max(0.0, ready - time.perf_counter()))
+            time.sleep(len(result) * self.byte_time)
+            try:
+                os.write(self.master, result)
+            except OSError:
+                break
+
+    def close(self):
+        self.running = False
+        os.close(self.slave)
+        os.close(self.master)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def find_port() -> str:
+    """Serial port of the ULX3S (FTDI FT231X)."""
+    # Import lazily, since pyserial is only needed to find the port.
+    import serial.tools.list_ports
+
+    available_ports = list(serial.tools.list_ports.grep("0403:6015"))
+    if not available_ports:
+        raise Exception("No serial port found.")
+    return available_ports[0].device
+
+
+def benchmark(client: BnnClient, images: np.ndarray, expected=None):
+    results = client.classify_many(images)
+    if expected is not None:
+        np.testing.assert_array_equal(results, expected)
+    print(client.statistics.report())
+    return results
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", help="serial port, found automatically if omitted")
+    parser.add_argument(
+        "--emulate", action="store_true", help="use a pseudo-terminal stand-in"
+    )
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--height", type=int, default=28)
+    parser.add_argument("--width", type=int, default=28)
+    parser.add_argument("--channel", type=int, default=1)
+    parser.add_argument("--classes", type=int, default=10)
+    parser.add_argument("--count", type=int, default=100, help="number of images")
+    parser.add_argument("--max-in-flight", type=int, default=2)
+    parser.add_argument(
+        "--input-bitwidth",
+        type=int,
+        default=8,
+        choices=[1, 8],
+        help="bitwidth of the bnn input, 1 bit inputs are packed",
+    )
+    parser.add_argument(
+        "--output-bitwidth",
+        type=int,
+        default=8,
+        help="bitwidth of the bnn output, see C_OUTPUT_BITWIDTH of the bnn",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="emulated bnn latency in s"
+    )
+    args = parser.parse_args(argv)
+
+    image_shape = (args.height, args.width, args.channel)
+    image_size = int(np.prod(image_shape))
+    images = np.random.randint(0, 256, (args.count,) + image_shape, dtype=np.uint8)
+
+    if args.emulate:
+        output_bytes = math.ceil(args.output_bitwidth / 8)
+        classify = histogram_classifier(args.classes, output_bytes)
+        expected = [
+            unpack_scores(
+                classify(pack_image(image, args.input_bitwidth)), output_bytes
+            )
+            for image in images
+        ]
+        with BoardEmulator(
+            math.ceil(image_size * args.input_bitwidth / 8),
+            classify,
+            args.baudrate,
+            args.latency,
+        ) as board, BnnClient(
+            board.port,
+            image_size,
+            args.classes,
+            args.baudrate,
+            args.max_in_flight,
+            input_bitwidth=args.input_bitwidth,
+            output_bitwidth=args.output_bitwidth,
+        ) as client:
+            benchmark(client, images, expected)
+    else:
+        with BnnClient(
+            args.port or find_port(),
+            image_size,
+            args.classes,
+            args.baudrate,
+            args.max_in_flight,
+            input_bitwidth=args.input_bitwidth,
+            output_bitwidth=args.output_bitwidth,
+        ) as client:
+            benchmark(client, images)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,93 @@
+"""Benchmark the ImageMonitor with the 16 output channel convolutions of
+"test_window_convolution_activation.py".
+
+The extraction of the channels is compared to the previous slicing of the
+binary string. It doesn't need a simulator. If GHDL is available, the wall
+time of the simulations is measured, too.
+"""
+
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+OUTPUT_CHANNEL = 16
+SAMPLES = 100000
+
+
+def slice_binstr(values, bitwidth):
+    """Previous ImageMonitor: Slice the binary string of each sample."""
+    width = OUTPUT_CHANNEL * bitwidth
+    output = []
+    for value in values:
+        vec = format(value, f"0{width}b")
+        output.extend(
+            int(vec[ch * bitwidth : (ch + 1) * bitwidth], 2)
+            for ch in range(OUTPUT_CHANNEL)
+        )
+    return output
+
+
+def unpack_batch(values, bitwidth):
+    """Current ImageMonitor: Store the samples and extract all channels at once."""
+    samples = [0] * len(values)
+    for count, value in enumerate(values):
+        samples[count] = value
+
+    width = OUTPUT_CHANNEL * bitwidth
+    byte_count = (width + 7) // 8
+    raw = b"".join(sample.to_bytes(byte_count, "big") for sample in samples)
+    bits = np.unpackbits(np.frombuffer(raw, dtype=np.uint8))
+    bits = bits.reshape(len(samples), -1)[:, 8 * byte_count - width :]
+    channels = bits.reshape(len(samples), OUTPUT_CHANNEL, bitwidth)
+    return (channels @ 2 ** np.arange(bitwidth - 1, -1, -1)).flatten().tolist()
+
+
+def benchmark_extraction():
+    for bitwidth in (1, 8):
+        values = [random.getrandbits(OUTPUT_CHANNEL * bitwidth) for _ in range(SAMPLES)]
+        durations = {}
+        for function in (slice_binstr, unpack_batch):
+            start = time.perf_counter()
+            function(values, bitwidth)
+            durations[function.__name__] = time.perf_counter() - start
+        assert slice_binstr(values[:100], bitwidth) == unpack_batch(
+            values[:100], bitwidth
+        )
+        speedup = durations["slice_binstr"] / durations["unpack_batch"]
+        print(
+            f"{OUTPUT_CHANNEL} channel, {bitwidth} bit: "
+            + ", ".join(
+                f"{name} {duration / SAMPLES * 1e6:.2f} us/sample"
+                for name, duration in durations.items()
+            )
+            + f", speedup {speedup:.1f}"
+        )
+
+
+def benchmark_simulation():
+    if shutil.which("ghdl") is None:
+        print("GHDL not found. Skip the simulation.")
+        return
+    start = time.perf_counter()
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "pytest",
+            "-q",
+            "test_window_convolution_activation.py",
+            "-k",
+            f"-{OUTPUT_CHANNEL}-",
+        ],
+        check=True,
+    )
+    print(f"simulation: {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    benchmark_extraction()
+    benchmark_simulation()
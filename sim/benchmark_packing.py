@@ -0,0 +1,134 @@
+"""Benchmark the packing and fixed point helpers of "test_utils.general".
+
+The NumPy based helpers are compared to the previous implementations, which
+loop in Python and use "bitstring". It doesn't need a simulator.
+"""
+
+import random
+import time
+
+from bitstring import Bits
+import numpy as np
+
+from test_utils.general import (
+    concatenate_channel,
+    concatenate_integers,
+    from_fixedint,
+    split_integers,
+    to_fixedint,
+)
+
+REPETITIONS = 10
+
+
+def concatenate_integers_loop(integer_list, bitwidth=1):
+    """Previous "concatenate_integers()": Shift each integer in."""
+    concatenated_integer = 0
+    for value in integer_list:
+        concatenated_integer = (concatenated_integer << bitwidth) + value
+    return concatenated_integer
+
+
+def concatenate_channel_loop(image, channel, bitwidth=1):
+    """Previous "concatenate_channel()": Concatenate each pixel."""
+    return [
+        concatenate_integers_loop(image[index : index + channel], bitwidth)
+        for index in range(0, len(image), channel)
+    ]
+
+
+def split_integers_loop(values, count, bitwidth=1):
+    """Slice the binary string of each value, like the previous ImageMonitor."""
+    width = count * bitwidth
+    output = []
+    for value in values:
+        vec = format(value, f"0{width}b")
+        output.append(
+            [int(vec[ch * bitwidth : (ch + 1) * bitwidth], 2) for ch in range(count)]
+        )
+    return output
+
+
+def to_fixedint_bitstring(numbers, bitwidth, is_unsigned=True):
+    """Previous "to_fixedint()": One "Bits" object per number."""
+    key = "uint" if is_unsigned else "int"
+    return [int(Bits(**{key: number, "length": bitwidth}).bin, 2) for number in numbers]
+
+
+def from_fixedint_bitstring(numbers, bitwidth, is_unsigned=True):
+    """Previous "from_fixedint()": One "Bits" object per number."""
+    bits = (Bits(bin=bin(number)[2:].zfill(bitwidth)) for number in numbers)
+    return [b.uint if is_unsigned else b.int for b in bits]
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    for _ in range(REPETITIONS):
+        result = function(*args)
+    return result, (time.perf_counter() - start) / REPETITIONS
+
+
+def compare(name, previous, current, previous_args, current_args=None):
+    expected, previous_duration = measure(previous, *previous_args)
+    result, current_duration = measure(current, *(current_args or previous_args))
+    assert np.array_equal(np.asarray(result), np.asarray(expected)), name
+    print(
+        f"{name}: {previous_duration * 1e3:.2f} ms -> {current_duration * 1e3:.2f} ms"
+        f", speedup {previous_duration / current_duration:.1f}"
+    )
+
+
+def benchmark():
+    # weights of a 3x3 convolution with 64 input and output channel
+    weights = [random.randint(0, 1) for _ in range(3 * 3 * 64 * 64)]
+    compare(
+        "concatenate_integers, 36864 x 1 bit",
+        concatenate_integers_loop,
+        concatenate_integers,
+        (weights, 1),
+    )
+    thresholds = [random.randint(0, 2 ** 12 - 1) for _ in range(64)]
+    compare(
+        "concatenate_integers, 64 x 12 bit",
+        concatenate_integers_loop,
+        concatenate_integers,
+        (thresholds, 12),
+    )
+
+    for channel, bitwidth in ((1, 8), (16, 1), (64, 1)):
+        image = [random.randint(0, 2 ** bitwidth - 1) for _ in range(28 * 28 * channel)]
+        compare(
+            f"concatenate_channel, 28x28x{channel} x {bitwidth} bit",
+            concatenate_channel_loop,
+            concatenate_channel,
+            (image, channel, bitwidth),
+        )
+        pixels = concatenate_channel(image, channel, bitwidth)
+        compare(
+            f"split_integers, 28x28x{channel} x {bitwidth} bit",
+            split_integers_loop,
+            split_integers,
+            (pixels, channel, bitwidth),
+        )
+
+    for is_unsigned in (True, False):
+        bitwidth = 12
+        lower = 0 if is_unsigned else -(2 ** (bitwidth - 1))
+        numbers = [random.randint(lower, lower + 2 ** bitwidth - 1) for _ in range(10000)]
+        compare(
+            f"to_fixedint, 10000 x {bitwidth} bit, unsigned={is_unsigned}",
+            to_fixedint_bitstring,
+            to_fixedint,
+            (numbers, bitwidth, is_unsigned),
+        )
+        fixedints = to_fixedint(numbers, bitwidth, is_unsigned)
+        compare(
+            f"from_fixedint, 10000 x {bitwidth} bit, unsigned={is_unsigned}",
+            from_fixedint_bitstring,
+            from_fixedint,
+            (fixedints.tolist(), bitwidth, is_unsigned),
+        )
+
+
+if __name__ == "__main__":
+    benchmark()
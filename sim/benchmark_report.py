@@ -0,0 +1,23 @@
+"""Compare the last run of the simulation benchmark with a previous run.
+The history gets written by "pytest --benchmark". Exits with 1, if a
+simulation regressed."""
+
+import argparse
+import sys
+
+from test_utils.benchmark import load_history, report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("history", nargs="?", default="benchmark_history.json")
+    parser.add_argument(
+        "--baseline",
+        type=int,
+        default=-2,
+        help="index of the baseline run in the history, default: the previous run",
+    )
+    args = parser.parse_args()
+
+    lines = report(load_history(args.history), args.baseline)
+    print("\n".join(lines))
+    sys.exit(any(line.startswith("REGRESSION") for line in lines))
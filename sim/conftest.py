@@ -2,12 +2,16 @@ import os
 import random
 
 import numpy as np
+import pytest
 
+from test_utils import benchmark, simulation
 from test_utils.extra_libs import (
+    WORK_DIR,
     analyze_util,
     analyze_window_ctrl_lib,
     analyze_uart_lib,
 )
+from test_utils.general import locked
 
 # https://stackoverflow.com/questions/44624407/how-to-reduce-log-line-size-in-cocotb
 os.environ["COCOTB_REDUCED_LOG_FMT"] = "1"
@@ -21,15 +25,97 @@ os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  # ERROR
 random.seed(42)
 np.random.seed(42)
 
+# Durations of the previous runs, used to start the longest tests first.
+DURATIONS_KEY = "sim/durations"
+# Assumed duration (in s) of unknown tests, which are marked as slow.
+SLOW_DURATION = 600.0
+durations = {}
+# Performance of all simulations, see "--benchmark".
+BENCHMARK_HISTORY = "benchmark_history.json"
+measurements = []
+
 
 def pytest_addoption(parser):
     parser.addoption("--waves", action="store_true", help="Record the waveform.")
+    parser.addoption(
+        "--stimulus",
+        choices=["full_rate", "random", "bursts"],
+        default="full_rate",
+        help="Pattern of the valid signal at the input.",
+    )
+    parser.addoption(
+        "--benchmark",
+        nargs="?",
+        const=BENCHMARK_HISTORY,
+        metavar="HISTORY",
+        help="Append the performance of the simulations to a JSON history file "
+        f"(default: {BENCHMARK_HISTORY}) and compare it to the previous run.",
+    )
 
 
 def pytest_configure(config):
-    analyze_util()
-    analyze_window_ctrl_lib()
-    analyze_uart_lib()
+    config.addinivalue_line(
+        "markers", "slow: long running simulation, which gets started first"
+    )
+
+    # The libraries are shared by all workers of pytest-xdist.
+    with locked(f"{WORK_DIR}/libraries.lock"):
+        analyze_util()
+        analyze_window_ctrl_lib()
+        analyze_uart_lib()
 
     if config.getoption("--waves"):
         os.environ["WAVES"] = "1"
+    os.environ["STIMULUS"] = config.getoption("--stimulus")
+
+
+def pytest_collection_modifyitems(config, items):
+    """Sort the tests by their expected duration, longest first. Thus the
+    parallel workers finish at roughly the same time."""
+    previous_durations = config.cache.get(DURATIONS_KEY, {})
+
+    def expected_duration(item):
+        if item.nodeid in previous_durations:
+            return previous_durations[item.nodeid]
+        return SLOW_DURATION if item.get_closest_marker("slow") else 0.0
+
+    # The sort is stable, i. e. unknown tests keep their order.
+    items.sort(key=expected_duration, reverse=True)
+
+
+@pytest.fixture(autouse=True)
+def record_measurements(request):
+    """Attach the performance of the simulations to the test report. Thus it
+    reaches the controller of pytest-xdist."""
+    simulation.measurements.clear()
+    yield
+    for measurement in simulation.measurements:
+        request.node.user_properties.append(("simulation", measurement))
+
+
+def pytest_runtest_logreport(report):
+    if report.when == "call":
+        durations[report.nodeid] = report.duration
+    # The measurements are added at teardown of the test.
+    if report.when == "teardown":
+        measurements.extend(
+            value for name, value in report.user_properties if name == "simulation"
+        )
+
+
+def pytest_sessionfinish(session):
+    # Only the controller of pytest-xdist writes the cache.
+    if hasattr(session.config, "workerinput"):
+        return
+    previous_durations = session.config.cache.get(DURATIONS_KEY, {})
+    session.config.cache.set(DURATIONS_KEY, {**previous_durations, **durations})
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    history_file = config.getoption("--benchmark")
+    if history_file is None or hasattr(config, "workerinput") or not measurements:
+        return
+    history = benchmark.append_run(history_file, measurements)
+    terminalreporter.section("simulation benchmark")
+    for line in benchmark.report(history):
+        terminalreporter.write_line(line)
@@ -0,0 +1,221 @@
+
+library ieee;
+  use ieee.std_logic_1164.all;
+  use ieee.numeric_std.all;
+
+library std;
+  use std.env.all;
+  use std.textio.all;
+
+library bnn_lib;
+
+-- File driven testbench of the bnn toplevel. It runs without cocotb, i. e.
+-- many images can be simulated in reasonable time.
+-- The stimulus file contains one byte per input datum and all images back to
+-- back. For each image, the result file contains one line with the cycle of
+-- the first input datum, the cycle of the last output and the output words.
+
+entity tb_bnn_file is
+  generic (
+    C_STIMULUS_FILE : string := "stimulus.bin";
+    C_RESULT_FILE   : string := "result.txt";
+
+    -- input data per image, i. e. height * width * channel
+    C_IMAGE_SIZE              : integer := 28 * 28;
+    C_INPUT_CHANNEL_BITWIDTH  : integer := 8;
+    C_OUTPUT_CHANNEL_BITWIDTH : integer := 8;
+    -- cycles between two input data
+    C_INPUT_INTERVAL : integer := 2;
+    -- maximum cycles without output, before the simulation is aborted
+    C_TIMEOUT : integer := 1_000_000
+  );
+end entity tb_bnn_file;
+
+architecture behavioral of tb_bnn_file is
+
+  constant C_CLK_PERIOD : time := 10 ns;
+  -- maximum number of images in the pipeline
+  constant C_MAX_IN_FLIGHT : integer := 256;
+
+  type t_cycle_array is array (0 to C_MAX_IN_FLIGHT - 1) of natural;
+
+  signal sl_clk    : std_logic := '0';
+  signal int_cycle : natural   := 0;
+
+  signal sl_start     : std_logic                                               := '0';
+  signal sl_valid_in  : std_logic                                               := '0';
+  signal sl_sof_in    : std_logic                                               := '0';
+  signal sl_eof_in    : std_logic                                               := '0';
+  signal slv_data_in  : std_logic_vector(C_INPUT_CHANNEL_BITWIDTH - 1 downto 0) := (others => '0');
+  signal slv_data_out : std_logic_vector(C_OUTPUT_CHANNEL_BITWIDTH - 1 downto 0);
+  signal sl_valid_out : std_logic;
+  signal sl_rdy       : std_logic;
+  signal sl_finish    : std_logic;
+
+  -- cycle of the first input datum of each image
+  signal a_start_cycle   : t_cycle_array := (others => 0);
+  signal int_images_sent : natural       := 0;
+  signal sl_input_done   : std_logic     := '0';
+
+begin
+
+  i_bnn : entity bnn_lib.bnn
+    port map (
+      isl_clk    => sl_clk,
+      isl_start  => sl_start,
+      isl_valid  => sl_valid_in,
+      isl_sof    => sl_sof_in,
+      isl_eof    => sl_eof_in,
+      islv_data  => slv_data_in,
+      oslv_data  => slv_data_out,
+      osl_valid  => sl_valid_out,
+      osl_rdy    => sl_rdy,
+      osl_finish => sl_finish
+    );
+
+  sl_clk <= not sl_clk after C_CLK_PERIOD / 2;
+
+  proc_cycle : process (sl_clk) is
+  begin
+
+    if (rising_edge(sl_clk)) then
+      int_cycle <= int_cycle + 1;
+    end if;
+
+  end process proc_cycle;
+
+  -------------------------------------------------------
+  -- Process: Stimulus
+  -- Send one datum every C_INPUT_INTERVAL cycles. The images follow each other
+  -- without gaps.
+  -------------------------------------------------------
+  proc_stimulus : process is
+
+    type t_byte_file is file of character;
+
+    file     f_stimulus : t_byte_file open read_mode is C_STIMULUS_FILE;
+    variable v_byte     : character;
+    variable v_index    : natural;
+    variable v_images   : natural;
+
+  begin
+
+    v_index  := 0;
+    v_images := 0;
+
+    sl_start <= '1';
+    wait until rising_edge(sl_clk);
+    sl_start <= '0';
+    wait until rising_edge(sl_clk);
+
+    while not endfile(f_stimulus) loop
+
+      read(f_stimulus, v_byte);
+      -- The stimulus has to be quantized to the input bitwidth already.
+      assert character'pos(v_byte) < 2 ** C_INPUT_CHANNEL_BITWIDTH
+        report "stimulus " & integer'image(character'pos(v_byte)) &
+               " exceeds the input bitwidth " & integer'image(C_INPUT_CHANNEL_BITWIDTH)
+        severity failure;
+
+      -- The input stalls, while the first layer flushes its padding.
+      while sl_rdy = '0' loop
+
+        wait until rising_edge(sl_clk);
+
+      end loop;
+
+      sl_sof_in <= '0';
+      sl_eof_in <= '0';
+
+      if (v_index = 0) then
+        a_start_cycle(v_images mod C_MAX_IN_FLIGHT) <= int_cycle;
+        sl_sof_in                                   <= '1';
+      end if;
+
+      if (v_index = C_IMAGE_SIZE - 1) then
+        sl_eof_in <= '1';
+      end if;
+
+      sl_valid_in <= '1';
+      slv_data_in <= std_logic_vector(to_unsigned(character'pos(v_byte), C_INPUT_CHANNEL_BITWIDTH));
+      wait until rising_edge(sl_clk);
+      sl_valid_in <= '0';
+
+      for cycle in 1 to C_INPUT_INTERVAL - 1 loop
+
+        wait until rising_edge(sl_clk);
+
+      end loop;
+
+      if (v_index = C_IMAGE_SIZE - 1) then
+        v_index         := 0;
+        v_images        := v_images + 1;
+        int_images_sent <= v_images;
+      else
+        v_index := v_index + 1;
+      end if;
+
+    end loop;
+
+    file_close(f_stimulus);
+    assert v_index = 0
+      report "stimulus file ends within an image"
+      severity failure;
+    sl_input_done <= '1';
+    wait;
+
+  end process proc_stimulus;
+
+  -------------------------------------------------------
+  -- Process: Result
+  -- Write one line per image. Finish, when all images are processed.
+  -------------------------------------------------------
+  proc_result : process is
+
+    file     f_result : text open write_mode is C_RESULT_FILE;
+    variable v_values : line;
+    variable v_line   : line;
+    variable v_images : natural;
+    variable v_idle   : natural;
+
+  begin
+
+    v_images := 0;
+    v_idle   := 0;
+
+    loop
+
+      wait until rising_edge(sl_clk);
+
+      if (sl_valid_out = '1') then
+        write(v_values, " " & integer'image(to_integer(unsigned(slv_data_out))));
+        v_idle := 0;
+      else
+        v_idle := v_idle + 1;
+      end if;
+
+      if (sl_finish = '1') then
+        write(v_line, integer'image(a_start_cycle(v_images mod C_MAX_IN_FLIGHT)));
+        write(v_line, " " & integer'image(int_cycle));
+        if (v_values /= null) then
+          write(v_line, v_values.all);
+          deallocate(v_values);
+        end if;
+        writeline(f_result, v_line);
+        v_images := v_images + 1;
+      end if;
+
+      if (sl_input_done = '1' and v_images = int_images_sent) then
+        file_close(f_result);
+        finish;
+      end if;
+
+      assert v_idle < C_TIMEOUT
+        report "no output for " & integer'image(C_TIMEOUT) & " cycles"
+        severity failure;
+
+    end loop;
+
+  end process proc_result;
+
+end architecture behavioral;
@@ -7,7 +7,6 @@ from typing import List
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import Timer
-from cocotb_test.simulator import run
 import pytest
 
 from test_utils.cocotb_helpers import ImageMonitor, Tick
@@ -17,6 +16,7 @@ from test_utils.general import (
     to_fixedint,
     get_files,
 )
+from test_utils.simulation import run
 
 
 @cocotb.test()
@@ -32,10 +32,9 @@ async def run_test(dut):
 
         @property
         def input_data_fixedint(self) -> int:
-            input_data_fixedint = [
-                to_fixedint(datum, input_bitwidth, is_unsigned)
-                for datum in self.input_data
-            ]
+            input_data_fixedint = to_fixedint(
+                self.input_data, input_bitwidth, is_unsigned
+            )
             return concatenate_integers(input_data_fixedint, bitwidth=input_bitwidth)
 
         @property
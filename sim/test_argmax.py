@@ -0,0 +1,102 @@
+import pathlib
+from random import randint
+
+import cocotb
+from cocotb.clock import Clock
+import numpy as np
+import pytest
+
+from test_utils.cocotb_helpers import ImageMonitor, StreamDriver, Tick
+from test_utils.general import get_files
+from test_utils.simulation import run
+
+
+@cocotb.test()
+async def run_test(dut):
+    # layer parameter
+    bitwidth = dut.C_BITWIDTH.value.integer
+    classes = dut.C_CLASSES.value.integer
+    top_k = dut.C_TOP_K.value.integer
+    output_score = dut.C_OUTPUT_SCORE.value.integer
+
+    def reference(scores):
+        # A stable sort ranks equal scores by index.
+        ranking = np.argsort(-np.array(scores), kind="stable")[:top_k]
+        if not output_score:
+            return ranking.tolist()
+        return [value for index in ranking for value in (int(index), scores[index])]
+
+    cases = (
+        # all equal, i. e. the first classes win
+        [0] * classes,
+        [2**bitwidth - 1] * classes,
+        # ascending and descending
+        list(range(classes)),
+        list(range(classes))[::-1],
+        # many equal scores
+        [randint(0, 3) for _ in range(classes)],
+        # mixed
+        [randint(0, 2**bitwidth - 1) for _ in range(classes)],
+        [randint(0, 2**bitwidth - 1) for _ in range(classes)],
+    )
+
+    # prepare coroutines
+    clock_period = 10  # ns
+    tick = Tick(clock_period=clock_period)
+    cocotb.fork(Clock(dut.isl_clk, clock_period, units="ns").start())
+    output_mon = ImageMonitor(
+        "output", dut.oslv_data, dut.osl_valid, dut.isl_clk, 1, bitwidth
+    )
+    # The frame flags are sampled with each output.
+    sof_mon = ImageMonitor("sof", dut.osl_sof, dut.osl_valid, dut.isl_clk, 1)
+    eof_mon = ImageMonitor("eof", dut.osl_eof, dut.osl_valid, dut.isl_clk, 1)
+    # The first and last class of the frame are marked.
+    driver = StreamDriver(
+        dut.isl_clk, dut.isl_valid, dut.islv_data, dut.isl_sof, dut.isl_eof
+    )
+    dut.isl_start <= 0
+    await tick.wait()
+
+    dut.isl_start <= 1
+    await tick.wait()
+    dut.isl_start <= 0
+    await tick.wait()
+
+    # run the specific testcases
+    for case in cases:
+        await driver.send(case)
+        await tick.wait_multiple(2 * top_k + 4)
+
+        print("Expected output:", reference(case))
+        print("Actual output:", output_mon.output)
+        assert output_mon.output == reference(case)
+        output_mon.clear()
+
+        # The first output starts and the last output ends the frame.
+        output_count = len(sof_mon.output)
+        assert sof_mon.output == [1] + [0] * (output_count - 1)
+        assert eof_mon.output == [0] * (output_count - 1) + [1]
+        sof_mon.clear()
+        eof_mon.clear()
+
+
+@pytest.mark.parametrize(
+    "classes,top_k,output_score",
+    [(10, 1, 0), (10, 3, 1), (10, 10, 0), (1, 1, 1), (100, 5, 0)],
+)
+def test_argmax(classes, top_k, output_score):
+    generics = {
+        "C_BITWIDTH": 8,
+        "C_CLASSES": classes,
+        "C_TOP_K": top_k,
+        "C_OUTPUT_SCORE": output_score,
+    }
+    run(
+        vhdl_sources=get_files(
+            pathlib.Path(__file__).parent.absolute() / ".." / "src", "*.vhd"
+        ),
+        toplevel="argmax",
+        module="test_argmax",
+        compile_args=["--work=bnn_lib", "--std=08"],
+        parameters=generics,
+    )
@@ -7,12 +7,12 @@ from typing import List
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import Timer
-from cocotb_test.simulator import run
 import numpy as np
-import tensorflow as tf
 
-from test_utils.cocotb_helpers import ImageMonitor, Tick
+from test_utils.cocotb_helpers import ImageMonitor, StreamDriver, Tick
 from test_utils.general import concatenate_channel, get_files
+from test_utils.reference import global_average_pooling
+from test_utils.simulation import run
 
 
 @cocotb.test()
@@ -25,12 +25,6 @@ async def run_test(dut):
         dut.C_CHANNEL.value.integer,
     )
 
-    # define the reference model
-    batch_shape = (1,) + image_shape
-    input_ = tf.keras.Input(batch_shape=batch_shape, name="img")
-    output_ = tf.keras.layers.GlobalAveragePooling2D()(input_)
-    model = tf.keras.Model(inputs=input_, outputs=output_)
-
     # define the testcases
     @dataclass
     class Testcase:
@@ -44,10 +38,11 @@ async def run_test(dut):
         @property
         def output_data(self) -> int:
             # inference
-            image_tensor = tf.convert_to_tensor(self.input_image)
-            result = model(tf.reshape(image_tensor, batch_shape))
+            result = global_average_pooling(
+                np.array(self.input_image).reshape(image_shape)
+            )
             # TODO: Not bit accurate in corner cases.
-            result_list = list(np.rint(result.numpy()).astype("uint8").flat)
+            result_list = list(np.rint(result).astype("uint8").flat)
             return result_list
 
     cases = (
@@ -73,7 +68,13 @@ async def run_test(dut):
         1,
         bitwidth * image_shape[2],
     )
-    dut.isl_valid <= 0
+    # The frame flags are sampled with each output.
+    sof_mon = ImageMonitor("sof", dut.osl_sof, dut.osl_valid, dut.isl_clk, 1)
+    eof_mon = ImageMonitor("eof", dut.osl_eof, dut.osl_valid, dut.isl_clk, 1)
+    # The first and last datum of the frame are marked.
+    driver = StreamDriver(
+        dut.isl_clk, dut.isl_valid, dut.islv_data, dut.isl_sof, dut.isl_eof
+    )
     dut.isl_start <= 0
     await tick.wait()
 
@@ -84,14 +85,7 @@ async def run_test(dut):
 
     # run the specific testcases
     for case in cases:
-        for datum in case.input_data:
-            dut.isl_valid <= 1
-            dut.islv_data <= datum
-            await tick.wait()
-            dut.isl_valid <= 0
-            await tick.wait()
-
-        dut.isl_valid <= 0
+        await driver.send(case.input_data)
         await tick.wait_multiple(40)
 
         print("Expected output:", case.output_data)
@@ -104,6 +98,29 @@ async def run_test(dut):
         )
         output_mon.clear()
 
+        # The first output starts and the last output ends the frame.
+        output_count = len(sof_mon.output)
+        assert sof_mon.output == [1] + [0] * (output_count - 1)
+        assert eof_mon.output == [0] * (output_count - 1) + [1]
+        sof_mon.clear()
+        eof_mon.clear()
+
+    # Back to back frames, i. e. the averages of a frame are sent while the next
+    # frame gets summed up.
+    for case in cases:
+        await driver.send(case.input_data)
+    await tick.wait_multiple(40)
+
+    expected = [value for case in cases for value in case.output_data]
+    assert len(output_mon.output) == len(expected)
+    assert all(
+        [
+            math.isclose(act, exp, abs_tol=1)
+            for act, exp in zip(output_mon.output, expected)
+        ]
+    )
+    assert sum(sof_mon.output) == sum(eof_mon.output) == len(cases)
+
 
 def test_average_pooling():
     generics = {
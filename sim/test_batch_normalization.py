@@ -6,10 +6,10 @@ from typing import List
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import Timer
-from cocotb_test.simulator import run
 
 from test_utils.cocotb_helpers import Tick
 from test_utils.general import get_files
+from test_utils.simulation import run
 
 
 @cocotb.test()
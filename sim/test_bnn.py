@@ -1,19 +1,36 @@
 from dataclasses import dataclass
+import json
+import os
 import pathlib
 from random import randint
 import sys
-from typing import List
+from typing import Dict, List
 
 import cocotb
 from cocotb.clock import Clock
-from cocotb.triggers import Timer
-from cocotb_test.simulator import run
-import larq as lq
+from cocotb.triggers import RisingEdge, Timer
+from cocotb.utils import get_sim_time
 import numpy as np
-import tensorflow as tf
+import pytest
 
-from test_utils.cocotb_helpers import ImageMonitor, Tick
+from test_utils.cocotb_helpers import (
+    ImageMonitor,
+    StreamDriver,
+    Tick,
+    ValidProbe,
+    fixed_gaps,
+    get_safe_int,
+)
+from test_utils.extra_libs import WORK_DIR
 from test_utils.general import get_files
+from test_utils.reference import load_bnn
+from test_utils.simulation import run
+
+# The simulation runs in its own build directory. Thus use absolute paths.
+MODEL_PATH = str(pathlib.Path(__file__).parent.absolute() / ".." / "models" / "test")
+sys.path.append(str(pathlib.Path(__file__).parent.absolute() / ".." / "playground"))
+from golden_model import GoldenModel
+import latency_estimator
 
 np.set_printoptions(threshold=sys.maxsize)
 # https://stackoverflow.com/questions/2891790/how-to-pretty-print-a-numpy-array-without-scientific-notation-and-with-given-pre
@@ -28,18 +45,10 @@ async def run_test(dut):
     input_image = np.random.randint(0, 255, (1, height, width, channel), dtype=np.uint8)
     # input_image = np.full((1, height, width, channel), 0, dtype=np.uint8)
 
-    # TODO: How to disable the custom gradient warning?
-    model = tf.keras.models.load_model("../../models/test")
-    lq.models.summary(model)
-
-    # https://keras.io/getting_started/faq/#how-can-i-obtain-the-output-of-an-intermediate-layer-feature-extraction
-    extractor = tf.keras.Model(
-        inputs=model.inputs, outputs=[layer.output for layer in model.layers]
-    )
-    features = extractor(input_image)
-
-    # class scores = (output before softmax + fan in) / 2
-    class_scores_pos = np.around((features[-2].numpy() + features[-4].shape[-1]) / 2)
+    # The golden model gets evaluated with the same weights and thresholds
+    # as the generated toplevel. Thus the result has to match exactly.
+    bnn = load_bnn(MODEL_PATH)
+    class_scores = GoldenModel(bnn).predict(input_image)
 
     output_bitwitdh = dut.C_OUTPUT_CHANNEL_BITWIDTH.value.integer
     output_mon = ImageMonitor(
@@ -51,33 +60,200 @@ async def run_test(dut):
     tick = Tick(clock_period=clock_period)
     cocotb.fork(Clock(dut.isl_clk, clock_period, units="ns").start())
 
-    dut.isl_valid <= 0
+    # The input stalls, while the first layer flushes its padding.
+    driver = StreamDriver(
+        dut.isl_clk,
+        dut.isl_valid,
+        dut.islv_data,
+        dut.isl_sof,
+        dut.isl_eof,
+        dut.osl_rdy,
+    )
     dut.isl_start <= 1
     await tick.wait()
     dut.isl_start <= 0
     await tick.wait()
 
     for _ in range(2):
-        for pixel in input_image.flat:
-            dut.isl_valid <= 1
-            dut.islv_data <= int(pixel)
-            await tick.wait()
-            dut.isl_valid <= 0
-            await tick.wait()
-
+        await driver.send(input_image.flatten())
         await tick.wait_multiple(height * width)
 
-        np.testing.assert_almost_equal(
-            np.resize(np.array(output_mon.output), class_scores_pos.shape),
-            class_scores_pos,
-            decimal=0,
+        np.testing.assert_array_equal(
+            np.resize(np.array(output_mon.output), class_scores.shape), class_scores,
         )
 
         output_mon.clear()
 
 
+def latency_breakdown(
+    estimation: Dict, input_cycles: List[int], layer_cycles: Dict[str, List[int]]
+) -> List[Dict]:
+    """Split the valid cycles of each layer into images. Calculate the
+    latencies of each layer and image like the estimation does."""
+    layer_count = estimation["layers"][0]["input_count"]
+    image_count = len(input_cycles) // layer_count
+    images = []
+    for image in range(image_count):
+        inputs = input_cycles[image * layer_count : (image + 1) * layer_count]
+        first_input = inputs[0]
+        layers = []
+        for layer in estimation["layers"]:
+            count = layer["output_count"]
+            cycles = layer_cycles[layer["name"]]
+            assert len(cycles) == image_count * count, (
+                f"Layer {layer['name']} has {len(cycles)} valid cycles. "
+                f"Expected {count} per image."
+            )
+            outputs = cycles[image * count : (image + 1) * count]
+            layers.append(
+                {
+                    "name": layer["name"],
+                    "type": layer["type"],
+                    "fill_latency": outputs[0] - inputs[0],
+                    "processing_span": outputs[-1] - outputs[0],
+                    "drain_latency": outputs[-1] - inputs[-1],
+                }
+            )
+            inputs = outputs
+        images.append({"latency": inputs[-1] - first_input, "layers": layers})
+    return images
+
+
+def print_breakdown(estimation: Dict, image: Dict, clock_frequency: float = 100e6):
+    """Print the measured latencies of an image next to the estimated ones."""
+    header = ("layer", "type", "fill", "span", "drain")
+    rows = [
+        (
+            measured["name"],
+            measured["type"],
+            *(
+                f"{measured[key]} ({estimated[key]})"
+                for key in ("fill_latency", "processing_span", "drain_latency")
+            ),
+        )
+        for measured, estimated in zip(image["layers"], estimation["layers"])
+    ]
+    widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(5)]
+    for row in [header] + rows:
+        print(" | ".join(str(col).ljust(width) for col, width in zip(row, widths)))
+    print(
+        f"latency: {image['latency']} ({estimation['latency']}) cycles, "
+        f"{image['latency'] / clock_frequency * 1e6:.2f} us at "
+        f"{clock_frequency / 1e6:.0f} MHz"
+    )
+
+
+async def monitor_finish(dut, clock_period: int, finish_cycles: List[int]):
+    """Store the cycle of each frame end at the output."""
+    while True:
+        await RisingEdge(dut.isl_clk)
+        if get_safe_int(dut.osl_finish) == 1:
+            finish_cycles.append(get_sim_time(units="ns") // clock_period)
+
+
+@cocotb.test()
+async def run_test_streaming(dut):
+    """Send the images back to back, i. e. without start pulse and without
+    waiting for the result of the previous image."""
+    height = dut.C_INPUT_HEIGHT.value.integer
+    width = dut.C_INPUT_WIDTH.value.integer
+    channel = dut.C_INPUT_CHANNEL.value.integer
+    image_count = 5
+    input_images = np.random.randint(
+        0, 255, (image_count, height, width, channel), dtype=np.uint8
+    )
+
+    bnn = load_bnn(MODEL_PATH)
+    class_scores = GoldenModel(bnn).predict(input_images)
+
+    # Each datum is sent every second cycle. The bottleneck layer defines,
+    # how often a new image can be sent.
+    input_interval = 2
+    estimation = latency_estimator.estimate_latency(bnn, input_interval)
+
+    output_bitwitdh = dut.C_OUTPUT_CHANNEL_BITWIDTH.value.integer
+    output_mon = ImageMonitor(
+        "output", dut.oslv_data, dut.osl_valid, dut.isl_clk, 1, output_bitwitdh,
+    )
+
+    clock_period = 10  # ns
+    tick = Tick(clock_period=clock_period)
+    cocotb.fork(Clock(dut.isl_clk, clock_period, units="ns").start())
+    finish_cycles = []
+    cocotb.fork(monitor_finish(dut, clock_period, finish_cycles))
+
+    # Probe the output valid signal of each layer. The first layer is the
+    # deserializer of the input.
+    input_probe = ValidProbe("input", dut.isl_valid, dut.isl_clk, clock_period)
+    layer_probes = {
+        layer["name"]: ValidProbe(
+            layer["name"],
+            getattr(dut, f"sl_valid_{layer['name']}"),
+            dut.isl_clk,
+            clock_period,
+        )
+        for layer in estimation["layers"]
+    }
+
+    # The input stalls, while the first layer flushes its padding. The interval
+    # is fixed, since the initiation interval gets compared to the estimation.
+    driver = StreamDriver(
+        dut.isl_clk,
+        dut.isl_valid,
+        dut.islv_data,
+        dut.isl_sof,
+        dut.isl_eof,
+        dut.osl_rdy,
+        fixed_gaps(input_interval - 1),
+    )
+    dut.isl_start <= 1
+    await tick.wait()
+    dut.isl_start <= 0
+    await tick.wait()
+
+    for image in input_images:
+        await driver.send(image.flatten())
+
+    await tick.wait_multiple(estimation["latency"] + height * width)
+
+    np.testing.assert_array_equal(
+        np.resize(np.array(output_mon.output), class_scores.shape), class_scores,
+    )
+
+    # The images follow each other without gaps, i. e. the sustained
+    # initiation interval is limited by the bottleneck layer only.
+    assert len(finish_cycles) == image_count
+    intervals = np.diff(finish_cycles)
+    print("initiation intervals:", intervals)
+    print("estimated initiation interval:", estimation["initiation_interval"])
+    assert intervals.max() <= estimation["initiation_interval"]
+
+    # The estimation is cycle accurate. A layer, which takes longer than
+    # estimated, is a latency regression.
+    images = latency_breakdown(
+        estimation,
+        input_probe.cycles,
+        {name: probe.cycles for name, probe in layer_probes.items()},
+    )
+    print_breakdown(estimation, images[0])
+    with open(os.environ.get("LATENCY_REPORT", "latency_bnn.json"), "w") as outfile:
+        json.dump({"estimation": estimation, "images": images}, outfile, indent=2)
+
+    for image in images:
+        assert image["latency"] <= estimation["latency"]
+        for measured, estimated in zip(image["layers"], estimation["layers"]):
+            for key in ("fill_latency", "processing_span", "drain_latency"):
+                assert measured[key] <= estimated[key], (
+                    f"{key} of layer {measured['name']}: {measured[key]} cycles, "
+                    f"estimated {estimated[key]} cycles"
+                )
+
+
+@pytest.mark.slow
 def test_bnn():
     generics = {}
+    # The latency breakdown of the streaming test gets written to a JSON file.
+    latency_report = os.path.abspath(os.path.join(WORK_DIR, "latency_bnn.json"))
     run(
         vhdl_sources=get_files(
             pathlib.Path(__file__).parent.absolute() / ".." / "src", "*.vhd"
@@ -86,4 +262,5 @@ def test_bnn():
         module="test_bnn",
         compile_args=["--work=bnn_lib", "--std=08"],
         parameters=generics,
+        extra_env={"LATENCY_REPORT": latency_report},
     )
@@ -0,0 +1,67 @@
+"""Bulk inference of the bnn by a file driven testbench, i. e. without cocotb.
+It can be run standalone on the Mnist test set:
+"python test_bnn_file.py --images 10000"
+"""
+
+import argparse
+import pathlib
+import sys
+
+import numpy as np
+import pytest
+
+from test_utils.file_testbench import run_testbench
+from test_utils.reference import load_bnn
+
+MODEL_PATH = str(pathlib.Path(__file__).parent.absolute() / ".." / "models" / "test")
+sys.path.append(str(pathlib.Path(__file__).parent.absolute() / ".." / "playground"))
+from golden_model import GoldenModel
+import latency_estimator
+
+
+def check_bnn(bnn, images: np.ndarray, input_interval: int = 2):
+    """Compare the simulated bnn with the golden model."""
+    result = run_testbench(bnn, images, input_interval)
+    # The input gets quantized like the stimulus.
+    bitwidth = bnn.input_layer_info["bitwidth"]
+    expected = GoldenModel(bnn).predict(images >> (8 - bitwidth))
+    expected = expected.reshape(len(images), -1)
+    np.testing.assert_array_equal(result.outputs, expected)
+
+    print(f"{len(images)} images")
+    print(f"latency: {result.latencies.min()} - {result.latencies.max()} cycles")
+    if len(images) > 1:
+        intervals = result.initiation_intervals
+        print(f"initiation interval: {intervals.min()} - {intervals.max()} cycles")
+    return result
+
+
+@pytest.mark.slow
+def test_bnn_file():
+    bnn = load_bnn(MODEL_PATH)
+    info = bnn.input_layer_info
+    images = np.random.randint(
+        0, 255, (20, info["height"], info["width"], info["channel"]), dtype=np.uint8
+    )
+
+    input_interval = 2
+    result = check_bnn(bnn, images, input_interval)
+
+    estimation = latency_estimator.estimate_latency(bnn, input_interval)
+    assert result.initiation_intervals.max() <= estimation["initiation_interval"]
+
+
+if __name__ == "__main__":
+    import tensorflow as tf
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--images", type=int, default=1000)
+    args = parser.parse_args()
+
+    bnn = load_bnn(args.model)
+    _, (test_images, test_labels) = tf.keras.datasets.mnist.load_data()
+    test_images = test_images[: args.images].reshape(-1, 28, 28, 1)
+    result = check_bnn(bnn, test_images)
+    accuracy = np.mean(np.argmax(result.outputs, axis=1) == test_labels[: args.images])
+    print(f"accuracy: {accuracy * 100:.2f} %")
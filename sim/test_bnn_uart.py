@@ -1,16 +1,56 @@
-from dataclasses import dataclass
+import json
+import math
+import os
 import pathlib
-from random import randint
-from typing import List
+import sys
+from typing import Optional
 
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import FallingEdge
-from cocotb_test.simulator import run
+from cocotb.utils import get_sim_time
 import numpy as np
+import pytest
 
 from test_utils.cocotb_helpers import Tick
 from test_utils.general import get_files
+from test_utils.reference import load_bnn
+from test_utils.simulation import run
+
+# The simulation runs in its own build directory. Thus use absolute paths.
+MODEL_PATH = str(pathlib.Path(__file__).parent.absolute() / ".." / "models" / "test")
+sys.path.append(str(pathlib.Path(__file__).parent.absolute() / ".." / "playground"))
+from golden_model import GoldenModel
+from uart_client import pack_image, unpack_scores
+
+# All simulations get the same images. Thus their cycles can be compared.
+IMAGE_SEED = 42
+
+
+async def uart_send(dut, tick, cycles_per_bit: int, word: int):
+    # start bit
+    dut.ftdi_txd <= 0
+    await tick.wait_multiple(cycles_per_bit)
+
+    # data bits, least significant bit first
+    for bit_index in range(8):
+        dut.ftdi_txd <= (word >> bit_index) & 1
+        await tick.wait_multiple(cycles_per_bit)
+
+    # stop bit
+    dut.ftdi_txd <= 1
+    await tick.wait_multiple(cycles_per_bit)
+
+
+async def uart_receive(dut, tick, cycles_per_bit: int) -> int:
+    await FallingEdge(dut.ftdi_rxd)
+    # sample in the middle of the data bits
+    await tick.wait_multiple(cycles_per_bit + cycles_per_bit // 2)
+    word = 0
+    for bit_index in range(8):
+        word |= dut.ftdi_rxd.value.integer << bit_index
+        await tick.wait_multiple(cycles_per_bit)
+    return word
 
 
 @cocotb.test()
@@ -18,10 +58,23 @@ async def run_test(dut):
     height = dut.i_bnn.C_INPUT_HEIGHT.value.integer
     width = dut.i_bnn.C_INPUT_WIDTH.value.integer
     channel = dut.i_bnn.C_INPUT_CHANNEL.value.integer
-    classes = dut.i_bnn.C_OUTPUT_CHANNEL.value.integer
+    input_bitwidth = dut.C_INPUT_BITWIDTH.value.integer
+    top_k = int(os.environ["TOP_K"])
+    output_score = bool(int(os.environ["OUTPUT_SCORE"]))
 
-    # input_image = np.random.randint(0, 255, (1, height, width, channel), dtype=np.uint8)
-    input_image = np.full((1, height, width, channel), 0, dtype=np.uint8)
+    image_count = 2
+    rng = np.random.default_rng(IMAGE_SEED)
+    input_images = rng.integers(
+        0, 255, (image_count, height, width, channel), dtype=np.uint8
+    )
+
+    # The golden model gets the same input as the bnn, i. e. the binarized pixels.
+    # The result contains all class scores or the best classes.
+    bnn = load_bnn(MODEL_PATH, input_bitwidth, top_k, output_score)
+    results = GoldenModel(bnn).predict(input_images >> (8 - input_bitwidth))
+    output_words = results.shape[1]
+    # Wide output words are sent as several uart words.
+    output_bytes = math.ceil(bnn.output_bitwidth / 8)
 
     # initialize the test
     clock_period = 40  # ns
@@ -37,38 +90,108 @@ async def run_test(dut):
     baudrate = 115200  # words / s
     cycles_per_bit = freq // baudrate
 
-    for pixel in input_image.flat:
-        # start bit
-        dut.ftdi_txd <= 0
-        await tick.wait_multiple(cycles_per_bit)
+    image_cycles = []
+    for image, expected in zip(input_images, results):
+        start_cycle = get_sim_time(units="ns") // clock_period
+        receiver = cocotb.fork(
+            receive_result(dut, tick, cycles_per_bit, output_words * output_bytes)
+        )
+        for word in pack_image(image, input_bitwidth):
+            await uart_send(dut, tick, cycles_per_bit, word)
+        result = list(unpack_scores(bytes(await receiver), output_bytes))
+        cycles = get_sim_time(units="ns") // clock_period - start_cycle
 
-        # data bits
-        for bit_index in range(8):
-            dut.ftdi_txd <= int(bin(pixel)[2:].zfill(8)[bit_index])
-            await tick.wait_multiple(cycles_per_bit)
+        print("expected result:", list(expected.flat))
+        print("actual result:", result)
+        assert result == list(expected.flat)
 
-        # stop bit
-        dut.ftdi_txd <= 1
-        await tick.wait_multiple(cycles_per_bit)
+        print(f"cycles per image: {cycles}")
+        image_cycles.append(cycles)
 
-    await FallingEdge(dut.ftdi_rxd)
-    await tick.wait_multiple(cycles_per_bit * 12 * classes)
+    # The measured cycles get compared between simulations,
+    # see "test_bnn_uart_packed_speedup()".
+    if "CYCLES_FILE" in os.environ:
+        transferred_words = len(pack_image(input_images[0], input_bitwidth)) + (
+            output_words * output_bytes
+        )
+        with open(os.environ["CYCLES_FILE"], "w") as outfile:
+            json.dump(
+                {"cycles": image_cycles, "transferred_words": transferred_words},
+                outfile,
+            )
 
-    # TODO: Add automated checks.
 
+async def receive_result(dut, tick, cycles_per_bit: int, words: int):
+    return [await uart_receive(dut, tick, cycles_per_bit) for _ in range(words)]
 
-def test_bnn_uart():
-    generics = {"C_QUARTZ_FREQ": 115200 * 4}  # 4 cycles per bit for faster simulation
-    run(
-        vhdl_sources=get_files(
-            pathlib.Path(__file__).parent.absolute() / ".." / "src", "*.vhd"
+
+def simulate_bnn_uart(
+    input_bitwidth: int,
+    top_k: int,
+    output_score: bool,
+    cycles_file: Optional[str] = None,
+):
+    src = pathlib.Path(__file__).parent.absolute() / ".." / "src"
+    vhdl_sources = get_files(src, "*.vhd")
+    if (input_bitwidth, top_k, output_score) != (8, 0, False):
+        # The bnn with packed input or argmax gets generated from the same model.
+        bnn = load_bnn(MODEL_PATH, input_bitwidth, top_k, output_score)
+        bnn_file = os.path.abspath(
+            f"sim_build/bnn_{input_bitwidth}_{top_k}_{int(output_score)}.vhd"
         )
-        + get_files(
-            pathlib.Path(__file__).parent.absolute() / ".." / "src" / "interface",
-            "*.vhd",
-        ),
+        os.makedirs(os.path.dirname(bnn_file), exist_ok=True)
+        with open(bnn_file, "w") as outfile:
+            outfile.write(bnn.to_vhdl())
+        vhdl_sources = [
+            source for source in vhdl_sources if source.name != "bnn.vhd"
+        ] + [bnn_file]
+
+    generics = {
+        "C_QUARTZ_FREQ": 115200 * 4,  # 4 cycles per bit for faster simulation
+        "C_INPUT_BITWIDTH": input_bitwidth,
+    }
+    extra_env = {"TOP_K": str(top_k), "OUTPUT_SCORE": str(int(output_score))}
+    if cycles_file is not None:
+        extra_env["CYCLES_FILE"] = cycles_file
+    run(
+        vhdl_sources=vhdl_sources + get_files(src / "interface", "*.vhd"),
         toplevel="bnn_uart",
         module="test_bnn_uart",
         compile_args=["--work=bnn_lib", "--std=08"],
         parameters=generics,
+        extra_env=extra_env,
+        clock_period=40,
+    )
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize(
+    "input_bitwidth,top_k,output_score",
+    [(8, 1, False), (1, 3, True)],
+)
+def test_bnn_uart(input_bitwidth, top_k, output_score):
+    simulate_bnn_uart(input_bitwidth, top_k, output_score)
+
+
+@pytest.mark.slow
+def test_bnn_uart_packed_speedup():
+    """Measure the cycles per image with 8 bit and with packed 1 bit input on the
+    same images."""
+    measured = {}
+    for input_bitwidth in (8, 1):
+        cycles_file = os.path.abspath(
+            f"sim_build/cycles_bnn_uart_{input_bitwidth}.json"
+        )
+        os.makedirs(os.path.dirname(cycles_file), exist_ok=True)
+        simulate_bnn_uart(input_bitwidth, 0, False, cycles_file)
+        with open(cycles_file) as infile:
+            measured[input_bitwidth] = json.load(infile)
+
+    speedup = np.mean(measured[8]["cycles"]) / np.mean(measured[1]["cycles"])
+    transfer_speedup = (
+        measured[8]["transferred_words"] / measured[1]["transferred_words"]
     )
+    print(f"speedup: {speedup:.2f}, speedup of the transfer: {transfer_speedup:.2f}")
+    # The latency of the bnn is small compared to the transfer. Thus most
+    # of the speedup of the transfer has to be reached.
+    assert speedup >= 0.5 * transfer_speedup
@@ -0,0 +1,58 @@
+"""Check that the keys of the bitstream build get invalidated by their inputs."""
+
+import argparse
+import pathlib
+import sys
+from typing import Dict
+
+sys.path.append(str(pathlib.Path(__file__).parent.absolute() / ".." / "playground"))
+from build_cache import BuildCache, bitstream_stages
+
+
+def stage_keys(tmp_path: pathlib.Path) -> Dict[str, str]:
+    """Calculate the keys of all stages without executing them."""
+    args = argparse.Namespace(
+        model=str(tmp_path / "model"),
+        toplevel=str(tmp_path / "bnn.vhd"),
+        init_files=str(tmp_path / "init"),
+        library=[
+            ["util", str(tmp_path / "util.vhd")],
+            ["bnn_lib", str(tmp_path / "bnn.vhd")],
+        ],
+        input_bitwidth=8,
+        top_k=0,
+        output_score=False,
+        ghdl_flags="--std=08",
+        top="bnn_uart",
+        device="85k",
+        package="CABGA381",
+        lpf=str(tmp_path / "board.lpf"),
+        workdir=str(tmp_path / "syn"),
+    )
+    cache = BuildCache(str(tmp_path / "cache"))
+    keys = {}
+    for stage in bitstream_stages(args):
+        stage.key = cache.key(stage)
+        keys[stage.name] = stage.key
+    return keys
+
+
+def test_init_files_invalidate_synthesis(tmp_path):
+    (tmp_path / "model").mkdir()
+    (tmp_path / "model" / "saved_model.pb").write_bytes(b"model")
+    (tmp_path / "init").mkdir()
+    (tmp_path / "init" / "weights_conv.mem").write_text("0f\n")
+    (tmp_path / "init" / "thresholds_conv.mem").write_text("01\n")
+    (tmp_path / "util.vhd").write_text("-- util\n")
+    (tmp_path / "bnn.vhd").write_text("-- bnn\n")
+    (tmp_path / "board.lpf").write_text("# lpf\n")
+    keys_before = stage_keys(tmp_path)
+
+    # Only the weights change, i. e. the toplevel stays the same.
+    (tmp_path / "init" / "weights_conv.mem").write_text("f0\n")
+    keys_after = stage_keys(tmp_path)
+
+    for name in ("toplevel", "ghdl -a util", "ghdl -a bnn_lib"):
+        assert keys_before[name] == keys_after[name]
+    for name in ("ghdl --synth", "yosys", "nextpnr", "ecppack"):
+        assert keys_before[name] != keys_after[name]
@@ -7,7 +7,6 @@ from typing import List
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import Timer
-from cocotb_test.simulator import run
 import pytest
 
 from test_utils.cocotb_helpers import Tick
@@ -17,6 +16,7 @@ from test_utils.general import (
     to_fixedint,
     get_files,
 )
+from test_utils.simulation import run
 
 
 @cocotb.test()
@@ -0,0 +1,222 @@
+from dataclasses import dataclass, field
+import math
+import os
+import pathlib
+import random
+from random import choice
+from typing import List
+
+import cocotb
+from cocotb.clock import Clock
+import numpy as np
+import pytest
+
+from test_utils.cocotb_helpers import ImageMonitor, StreamDriver, Tick
+from test_utils.general import (
+    concatenate_channel,
+    concatenate_integers,
+    get_files,
+)
+from test_utils.reference import batchnorm_heaviside
+from test_utils.simulation import run
+
+
+def replace_minus(values):
+    """Convert from LARQ format [-1, 1] to pocket-bnn format [0, 1]."""
+    return [0 if v == -1 else v for v in values]
+
+
+def write_weights(filename: str, weights: np.ndarray, pixel_count: int):
+    """Write the weights to a rom init file. One line contains the hexadecimal
+    weights of one pixel. The first weight is the most significant bit."""
+    with open(filename, "w") as outfile:
+        for row in weights.reshape(pixel_count, -1):
+            digits = math.ceil(len(row) / 4)
+            outfile.write(f"{concatenate_integers(replace_minus(row)):0{digits}x}\n")
+
+
+def read_weights(filename: str, row_length: int) -> np.ndarray:
+    """Read the weights from a rom init file in LARQ format."""
+    with open(filename) as infile:
+        rows = [
+            [int(bit) for bit in bin(int(line, 16))[2:].zfill(row_length)]
+            for line in infile.read().split()
+        ]
+    return 2 * np.array(rows) - 1
+
+
+@cocotb.test()
+async def run_test(dut):
+    # layer parameter
+    image_shape = (
+        dut.C_IMG_HEIGHT.value.integer,
+        dut.C_IMG_WIDTH.value.integer,
+        dut.C_INPUT_CHANNEL.value.integer,
+    )
+    output_channel = dut.C_OUTPUT_CHANNEL.value.integer
+    output_channel_bitwidth = dut.C_OUTPUT_CHANNEL_BITWIDTH.value.integer
+
+    # Needed to compensate the offset caused by converting between -1 (LARQ) and 0 (hdl).
+    fan_in = math.prod(image_shape)
+
+    # The weights are fixed, since they are read from rom.
+    weights = read_weights(
+        os.environ["WEIGHTS_FILE"], image_shape[2] * output_channel
+    ).reshape(fan_in, output_channel)
+
+    # The reference model is a quantized dense layer, followed by batchnorm
+    # (without scale, since we clip afterwards anyway) and the heaviside function.
+    # There is no batchnorm for output bitwidth > 1.
+    def random_batchnorm_params() -> List[np.ndarray]:
+        # Try to set realistic batchnorm parameter.
+        return [
+            np.array([random.uniform(0, 0.5) for _ in range(output_channel)]),
+            np.array([random.uniform(-1, 1) for _ in range(output_channel)]),
+            np.array([random.uniform(0, 1) * fan_in for _ in range(output_channel)]),
+        ]
+
+    # define the testcases
+    @dataclass
+    class Testcase:
+        input_image: List[int]
+        batchnorm_params: List[np.ndarray] = field(
+            default_factory=random_batchnorm_params
+        )
+
+        @property
+        def input_data(self) -> int:
+            # send all channels (i. e. one pixel) at a time
+            return concatenate_channel(
+                replace_minus(self.input_image), image_shape[2], 1
+            )
+
+        @property
+        def output_data(self) -> int:
+            # inference
+            result = np.array(self.input_image) @ weights
+
+            if output_channel_bitwidth == 1:
+                result = batchnorm_heaviside(result, *self.batchnorm_params)
+            else:
+                # compensate (see also threshold for batchnorm)
+                result = (result + fan_in) / 2
+
+            # The output bitwidth covers the whole score, i. e. it doesn't wrap.
+            result_list = list(result.astype(np.int64).flat)
+            return concatenate_channel(
+                result_list, output_channel, output_channel_bitwidth
+            )
+
+        def get_threshold(self):
+            # There is no batchnorm for output bitwidth > 1
+            if output_channel_bitwidth > 1:
+                return 0
+
+            threshold = []
+            for beta, mean, variance in zip(*self.batchnorm_params):
+                # see "test_window_convolution_activation.py"
+                threshold_batchnorm = mean - beta * math.sqrt(variance + 0.001)
+                threshold_pos = (threshold_batchnorm + fan_in) / 2
+                threshold.append(int(threshold_pos))
+
+            return concatenate_integers(
+                threshold, bitwidth=1 + math.ceil(math.log2(fan_in + 1)) + 1
+            )
+
+    cases = (
+        # zero activations
+        Testcase([-1] * fan_in),
+        # one activations
+        Testcase([1] * fan_in),
+        # maximum score of the first output channel, i. e. all bits match
+        Testcase(list(weights[:, 0])),
+        # mixed
+        Testcase([choice([-1, 1]) for _ in range(fan_in)]),
+        Testcase([choice([-1, 1]) for _ in range(fan_in)]),
+    )
+
+    # prepare coroutines
+    clock_period = 10  # ns
+    tick = Tick(clock_period=clock_period)
+    cocotb.fork(Clock(dut.isl_clk, clock_period, units="ns").start())
+    output_mon = ImageMonitor(
+        "output",
+        dut.oslv_data,
+        dut.osl_valid,
+        dut.isl_clk,
+        1,
+        output_channel * output_channel_bitwidth,
+    )
+    # The first and last datum of the frame are marked.
+    driver = StreamDriver(
+        dut.isl_clk, dut.isl_valid, dut.islv_data, dut.isl_sof, dut.isl_eof
+    )
+    dut.isl_start <= 0
+    await tick.wait()
+
+    # run the specific testcases
+    for case in cases:
+        dut.islv_threshold <= case.get_threshold()
+
+        dut.isl_start <= 1
+        await tick.wait()
+        dut.isl_start <= 0
+        await tick.wait()
+
+        await driver.send(case.input_data)
+        await tick.wait_multiple(20)
+
+        print("expected result:", case.output_data)
+        print("actual result:", output_mon.output)
+        assert output_mon.output == case.output_data
+        output_mon.clear()
+
+
+@pytest.mark.parametrize(
+    "input_channel,output_channel,output_channel_bitwidth,width,height",
+    [
+        (4, 8, 1, 4, 4),
+        (4, 8, 8, 4, 4),
+        (1, 10, 8, 7, 7),
+        (16, 10, 1, 5, 3),
+        # dense after dense, i. e. a single pixel
+        (32, 10, 8, 1, 1),
+        # fan in > 255, i. e. the score needs more than 8 bit
+        (16, 10, 9, 5, 5),
+    ],
+)
+def test_dense(input_channel, output_channel, output_channel_bitwidth, width, height):
+    # Input channel bitwidth > 1 is tested at convolution level.
+    input_channel_bitwidth = 1
+
+    # The weights are read from rom. Thus they are fixed for each simulation.
+    pixel_count = width * height
+    weights_file = os.path.abspath(
+        f"sim_build/weights_dense_{input_channel}_{output_channel}_{width}_{height}.mem"
+    )
+    os.makedirs(os.path.dirname(weights_file), exist_ok=True)
+    write_weights(
+        weights_file,
+        np.random.choice([-1, 1], (pixel_count * input_channel, output_channel)),
+        pixel_count,
+    )
+
+    generics = {
+        "C_INPUT_CHANNEL": input_channel,
+        "C_INPUT_CHANNEL_BITWIDTH": input_channel_bitwidth,
+        "C_OUTPUT_CHANNEL": output_channel,
+        "C_OUTPUT_CHANNEL_BITWIDTH": output_channel_bitwidth,
+        "C_IMG_WIDTH": width,
+        "C_IMG_HEIGHT": height,
+        "C_WEIGHTS_FILE": weights_file,
+    }
+    run(
+        vhdl_sources=get_files(
+            pathlib.Path(__file__).parent.absolute() / ".." / "src", "*.vhd"
+        ),
+        toplevel="dense",
+        module="test_dense",
+        compile_args=["--work=bnn_lib", "--std=08"],
+        parameters=generics,
+        extra_env={"WEIGHTS_FILE": weights_file},
+    )
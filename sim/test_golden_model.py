@@ -0,0 +1,104 @@
+"""Compare the golden model with the larq model it was converted from. The
+simulations check the hardware against the golden model, so this is the only
+check against an independent reference."""
+
+import pathlib
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).parent.absolute() / ".." / "playground"))
+from golden_model import GoldenModel, toplevel
+
+lq = pytest.importorskip("larq")
+tf = pytest.importorskip("tensorflow")
+
+
+def build_model(head: str, binary_input: bool, padding: bool, rng: np.random.Generator):
+    """Build a small larq model with random weights and batch normalization
+    statistics. The class scores are the logits before the softmax."""
+    quantization = {
+        "input_quantizer": "ste_sign",
+        "kernel_quantizer": "ste_sign",
+        "kernel_constraint": "weight_clip",
+        "use_bias": False,
+    }
+    model = tf.keras.Sequential()
+    model.add(tf.keras.Input((10, 10, 1)))
+    model.add(
+        lq.layers.QuantConv2D(
+            8,
+            3,
+            **{
+                **quantization,
+                "input_quantizer": "ste_sign" if binary_input else None,
+            },
+        )
+    )
+    model.add(tf.keras.layers.BatchNormalization(scale=False))
+    model.add(
+        lq.layers.QuantConv2D(
+            16,
+            3,
+            **(dict(padding="same", pad_values=1.0) if padding else {}),
+            **quantization,
+        )
+    )
+    model.add(tf.keras.layers.BatchNormalization(scale=False))
+    model.add(tf.keras.layers.MaxPooling2D(2))
+    if head == "conv":
+        model.add(lq.layers.QuantConv2D(10, 1, **quantization))
+        model.add(tf.keras.layers.GlobalAveragePooling2D())
+    else:
+        model.add(tf.keras.layers.Flatten())
+        model.add(lq.layers.QuantDense(32, **quantization))
+        model.add(tf.keras.layers.BatchNormalization(scale=False))
+        model.add(lq.layers.QuantDense(10, **quantization))
+    model.add(tf.keras.layers.Activation("softmax"))
+
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.layers.BatchNormalization):
+            channel = layer.get_weights()[0].shape[0]
+            layer.set_weights(
+                [
+                    rng.uniform(-1, 1, channel),  # beta
+                    rng.uniform(-5, 5, channel),  # mean
+                    rng.uniform(0.5, 4, channel),  # variance
+                ]
+            )
+        elif layer.get_weights():
+            kernel = layer.get_weights()[0]
+            layer.set_weights([rng.uniform(-1, 1, kernel.shape)])
+    return model
+
+
+@pytest.mark.parametrize("head", ("conv", "dense"))
+@pytest.mark.parametrize("binary_input", (False, True))
+@pytest.mark.parametrize("padding", (False, True))
+def test_golden_model(tmp_path, head, binary_input, padding):
+    rng = np.random.default_rng(0)
+    model = build_model(head, binary_input, padding, rng)
+    model_path = str(tmp_path / "model")
+    model.save(model_path)
+
+    bitwidth = 1 if binary_input else 8
+    bnn = toplevel.bnn_from_larq(model_path, bitwidth)
+    images = rng.integers(0, 256, (50, 10, 10, 1), dtype=np.uint8)
+    scores = GoldenModel(bnn).predict(images >> (8 - bitwidth)).reshape(50, -1)
+
+    # The binary input gets quantized like the hardware, i. e. by the MSB.
+    model_input = np.where(images >= 128, 1.0, -1.0) if binary_input else images / 1.0
+    logits_model = tf.keras.Model(model.inputs, model.layers[-2].output)
+    logits = logits_model(model_input.astype(np.float32)).numpy()
+
+    # The bnn counts the matching bits instead of summing -1 and 1.
+    fan_in = np.prod(model.layers[-2].input.shape[1:])
+    if head == "conv":
+        fan_in = model.layers[-3].input.shape[-1]
+    reference = (logits + fan_in) / 2
+    if head == "conv":
+        # The average gets rounded to an integer.
+        np.testing.assert_allclose(scores, reference, atol=0.5)
+    else:
+        np.testing.assert_array_equal(scores, reference)
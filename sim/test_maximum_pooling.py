@@ -6,11 +6,11 @@ from typing import List
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import Timer
-from cocotb_test.simulator import run
 import pytest
 
 from test_utils.cocotb_helpers import Tick
 from test_utils.general import concatenate_integers, get_files
+from test_utils.simulation import run
 
 
 @cocotb.test()
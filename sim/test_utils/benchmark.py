@@ -0,0 +1,159 @@
+"""History of the simulation performance, see "pytest --benchmark"."""
+
+import datetime
+import json
+import os
+import subprocess
+from typing import Dict, List, Optional
+import xml.etree.ElementTree as ET
+
+# A metric regresses, if it gets worse by more than this factor.
+REGRESSION_FACTOR = 1.2
+# Durations (in s) below this difference are considered as noise.
+MINIMUM_DIFFERENCE = 0.5
+
+
+def simulated_time(results_file: str) -> float:
+    """Sum of the simulated time (in ns) of all cocotb tests in a results file."""
+    tree = ET.parse(results_file)
+    return sum(
+        float(testcase.get("sim_time_ns", 0)) for testcase in tree.iter("testcase")
+    )
+
+
+def measurement_key(measurement: dict) -> str:
+    """A simulation is identified by its entity, its generics, the
+    environment variables, which configure the cocotb test, and the pattern of
+    the input stimulus."""
+    configuration = {
+        **measurement["generics"],
+        **measurement["environment"],
+        # Older runs were always full rate.
+        "stimulus": measurement.get("stimulus", "full_rate"),
+    }
+    return (
+        f"{measurement['toplevel']} "
+        f"{json.dumps(configuration, sort_keys=True, default=str)}"
+    )
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path: str) -> List[dict]:
+    if not os.path.isfile(path):
+        return []
+    with open(path) as infile:
+        return json.load(infile)
+
+
+def append_run(path: str, measurements: List[dict]) -> List[dict]:
+    """Append the measurements of a test run to the history."""
+    history = load_history(path)
+    history.append(
+        {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": current_commit(),
+            "simulations": sorted(measurements, key=measurement_key),
+        }
+    )
+    with open(path, "w") as outfile:
+        json.dump(history, outfile, indent=2, default=str)
+    return history
+
+
+def is_slower(before: float, after: float) -> bool:
+    """Check whether a duration (in s) regressed."""
+    return after > REGRESSION_FACTOR * before and after - before > MINIMUM_DIFFERENCE
+
+
+def compile_times(simulations: List[dict]) -> Dict[str, float]:
+    """Compile time of each entity. The parametrizations of a test share the
+    compiled design, i. e. only one of them compiles it. The others have a
+    compile time of 0. Thus the compile time is compared per entity."""
+    times = {}
+    for measurement in simulations:
+        toplevel = measurement["toplevel"]
+        times[toplevel] = max(times.get(toplevel, 0.0), measurement["compile_time"])
+    return times
+
+
+def regressions(baseline: dict, current: dict) -> Dict[str, str]:
+    """Compare a simulation to its baseline. Return the regressed metrics and
+    their change. The compile time is compared by "compile_times()"."""
+    result = {}
+    # Time, which should stay low.
+    before, after = baseline["wall_time"], current["wall_time"]
+    if is_slower(before, after):
+        result["wall_time"] = f"{before:.1f} s -> {after:.1f} s"
+    # Simulation speed, which should stay high.
+    before, after = baseline["cycles_per_second"], current["cycles_per_second"]
+    if after * REGRESSION_FACTOR < before:
+        result["cycles_per_second"] = f"{before:.0f} -> {after:.0f}"
+    # More simulated cycles indicate a higher latency of the design. The random
+    # stimulus is seeded per simulation, i. e. the cycles are reproducible.
+    if current["cycles"] > baseline["cycles"]:
+        result["cycles"] = f"{baseline['cycles']} -> {current['cycles']}"
+    return result
+
+
+def report(history: List[dict], baseline_index: int = -2) -> List[str]:
+    """Compare the last run of the history with a previous one. Return the
+    lines of the report."""
+    if not history:
+        return ["No benchmark runs."]
+    current = history[-1]
+    lines = [
+        f"{'simulation':<60} {'compile':>8} {'wall':>8} {'cycles':>10} {'cycles/s':>10}"
+    ]
+    for measurement in current["simulations"]:
+        lines.append(
+            f"{measurement_key(measurement)[:60]:<60}"
+            f" {measurement['compile_time']:>7.1f}s"
+            f" {measurement['wall_time']:>7.1f}s"
+            f" {measurement['cycles']:>10}"
+            f" {measurement['cycles_per_second']:>10.0f}"
+        )
+
+    if len(history) < 2:
+        lines.append("No baseline to compare with.")
+        return lines
+    baseline = history[baseline_index]
+    lines.append(
+        f"Baseline: {baseline['date']} ({baseline['commit']}), "
+        f"current: {current['date']} ({current['commit']})"
+    )
+    baseline_simulations = {
+        measurement_key(measurement): measurement
+        for measurement in baseline["simulations"]
+    }
+    regression_count = 0
+    # A cached design has a compile time of 0.
+    baseline_compile_times = compile_times(baseline["simulations"])
+    for toplevel, after in compile_times(current["simulations"]).items():
+        before = baseline_compile_times.get(toplevel, 0.0)
+        if before > 0 and after > 0 and is_slower(before, after):
+            lines.append(
+                f"REGRESSION {toplevel}: compile_time {before:.1f} s -> {after:.1f} s"
+            )
+            regression_count += 1
+    for measurement in current["simulations"]:
+        key = measurement_key(measurement)
+        if key not in baseline_simulations:
+            continue
+        for metric, change in regressions(
+            baseline_simulations[key], measurement
+        ).items():
+            lines.append(f"REGRESSION {key}: {metric} {change}")
+            regression_count += 1
+    lines.append(f"{regression_count} regressions")
+    return lines
@@ -1,7 +1,15 @@
 """Collection of common cocotb helper functions."""
 
+import itertools
+import os
+from random import randint, random
+from typing import Iterator
+
 from cocotb_bus.monitors import Monitor
 from cocotb.triggers import RisingEdge, Timer
+from cocotb.utils import get_sim_time
+
+from test_utils.general import split_integers
 
 
 def get_safe_int(signal, default: int = 0):
@@ -14,36 +22,84 @@ def get_safe_int(signal, default: int = 0):
 # TODO: evaluate streambusmonitor
 # https://github.com/cocotb/cocotb/blob/master/examples/mean/tests/test_mean.py#L16
 class ImageMonitor(Monitor):
-    """Observes single input or output of DUT."""
-
-    def __init__(self, name, signal, valid, clock, output_channels, bitwidth=1):
+    """Observes single input or output of DUT. The monitor only wakes at each
+    clock edge, while the valid signal is high. The samples are stored as
+    integer in a preallocated list. The channels get extracted in a batch,
+    when the output is requested."""
+
+    def __init__(
+        self, name, signal, valid, clock, output_channels, bitwidth=1, capacity=1024
+    ):
         self.name = name
         self.signal = signal
         self.valid = valid
         self.clock = clock
-        self.output = []
         self.bitwidth = bitwidth
         self.output_channels = output_channels
 
+        self.samples = [0] * capacity
+        self.count = 0
+
         super().__init__()
 
+    @property
+    def output(self) -> list:
+        """Extract the channels of all samples at once."""
+        if self.count == 0:
+            return []
+        channels = split_integers(
+            self.samples[: self.count], self.output_channels, self.bitwidth
+        )
+        return channels.flatten().tolist()
+
     def clear(self):
         """Clear the current output."""
-        self.output = []
+        self.count = 0
 
     async def _monitor_recv(self):
         clock_edge = RisingEdge(self.clock)
+        valid_edge = RisingEdge(self.valid)
 
         while True:
+            # Sleep until the next datum. It gets sampled at the following clock edge.
+            if get_safe_int(self.valid) != 1:
+                await valid_edge
             await clock_edge
 
-            if get_safe_int(self.valid) == 1:
-                vec = self.signal.value.binstr
-                output = [
-                    int(vec[ch * self.bitwidth : (ch + 1) * self.bitwidth], 2)
-                    for ch in range(self.output_channels)
-                ]
-                self.output.extend(output)
+            # Sample at each clock edge, as long as the data stays valid.
+            while get_safe_int(self.valid) == 1:
+                if self.count == len(self.samples):
+                    self.samples.extend([0] * len(self.samples))
+                self.samples[self.count] = self.signal.value.integer
+                self.count += 1
+                await clock_edge
+
+
+class ValidProbe(Monitor):
+    """Records the cycles, in which a valid signal is high. Like the
+    ImageMonitor, the probe only wakes while the signal is valid."""
+
+    def __init__(self, name, valid, clock, clock_period: int = 10):
+        self.name = name
+        self.valid = valid
+        self.clock = clock
+        self.clock_period = clock_period
+        self.cycles = []
+
+        super().__init__()
+
+    async def _monitor_recv(self):
+        clock_edge = RisingEdge(self.clock)
+        valid_edge = RisingEdge(self.valid)
+
+        while True:
+            if get_safe_int(self.valid) != 1:
+                await valid_edge
+            await clock_edge
+
+            while get_safe_int(self.valid) == 1:
+                self.cycles.append(get_sim_time(units="ns") // self.clock_period)
+                await clock_edge
 
 
 class Tick:
@@ -53,11 +109,100 @@ class Tick:
         self.clock_period = clock_period
         self.units = units
         self.tick = Timer(clock_period, units=units)
+        self.timers = {}
 
     async def wait(self):
         """Wait a single clock tick."""
         await self.tick
 
     async def wait_multiple(self, tick_count: int = 1):
-        """Wait multiple clock ticks."""
-        await Timer(self.clock_period * tick_count, units=self.units)
+        """Wait multiple clock ticks. The timers are reused."""
+        if tick_count not in self.timers:
+            self.timers[tick_count] = Timer(
+                self.clock_period * tick_count, units=self.units
+            )
+        await self.timers[tick_count]
+
+
+# Valid patterns, i. e. the number of cycles without valid after each datum.
+def full_rate() -> Iterator[int]:
+    """One datum per cycle."""
+    return itertools.repeat(0)
+
+
+def fixed_gaps(gap: int = 1) -> Iterator[int]:
+    """One datum every "gap + 1" cycles."""
+    return itertools.repeat(gap)
+
+
+def random_gaps(max_gap: int = 3, probability: float = 0.5) -> Iterator[int]:
+    """Random gaps of up to "max_gap" cycles after some data."""
+    while True:
+        yield randint(1, max_gap) if random() < probability else 0
+
+
+def bursts(length: int = 8, gap: int = 4) -> Iterator[int]:
+    """Bursts of "length" data at full rate, separated by "gap" cycles."""
+    while True:
+        yield from itertools.repeat(0, length - 1)
+        yield gap
+
+
+VALID_PATTERNS = {
+    "full_rate": full_rate,
+    "random": random_gaps,
+    "bursts": bursts,
+}
+
+
+def valid_pattern() -> Iterator[int]:
+    """Valid pattern selected by "pytest --stimulus", full rate by default."""
+    return VALID_PATTERNS[os.environ.get("STIMULUS", "full_rate")]()
+
+
+class StreamDriver:
+    """Drives a stream of data. After each datum, the valid signal is low for
+    the cycles given by the valid pattern. The start and end of frame are
+    marked, if the DUT has these inputs. If the DUT has a ready output, the
+    stream stalls while it is low."""
+
+    def __init__(
+        self, clock, valid, data, sof=None, eof=None, ready=None, pattern=None
+    ):
+        self.clock_edge = RisingEdge(clock)
+        self.valid = valid
+        self.data = data
+        self.sof = sof
+        self.eof = eof
+        self.ready = ready
+        self.gaps = valid_pattern() if pattern is None else pattern
+
+        self.valid <= 0
+        for flag in (self.sof, self.eof):
+            if flag is not None:
+                flag <= 0
+
+    async def send(self, data):
+        """Send the data as one frame, starting at the next clock edge."""
+        last_index = len(data) - 1
+        await self.clock_edge
+        for index, datum in enumerate(data):
+            if self.ready is not None:
+                while get_safe_int(self.ready, 1) == 0:
+                    self.valid <= 0
+                    await self.clock_edge
+
+            self.valid <= 1
+            if self.sof is not None:
+                self.sof <= int(index == 0)
+            if self.eof is not None:
+                self.eof <= int(index == last_index)
+            self.data <= int(datum)
+            await self.clock_edge
+
+            gap = next(self.gaps)
+            if gap > 0:
+                self.valid <= 0
+                for _ in range(gap):
+                    await self.clock_edge
+        self.valid <= 0
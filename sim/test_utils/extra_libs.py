@@ -10,12 +10,17 @@ from test_utils.general import get_files
 STD = "--std=08"
 WORK_DIR = "sim_build"
 ABSOLUTE_PATH = pathlib.Path(__file__).parent.absolute()
+SOURCE_PATHS = {
+    "util": ABSOLUTE_PATH / ".." / ".." / "src" / "util",
+    "window_ctrl_lib": ABSOLUTE_PATH / ".." / ".." / "src" / "window_ctrl",
+    "uart_lib": ABSOLUTE_PATH / ".." / ".." / "submodules" / "icestick-uart" / "hdl",
+}
 
 
 def analyze_util():
     """Analyze the utility library."""
     work = "util"
-    source_path = ABSOLUTE_PATH / ".." / ".." / "src" / "util"
+    source_path = SOURCE_PATHS[work]
     source_files = get_files(source_path, "*.vhd")
 
     if outdated(f"{WORK_DIR}/{work}-obj08.cf", source_files):
@@ -31,7 +36,7 @@ def analyze_window_ctrl_lib():
     analyze_util()
 
     work = "window_ctrl_lib"
-    source_path = ABSOLUTE_PATH / ".." / ".." / "src" / "window_ctrl"
+    source_path = SOURCE_PATHS[work]
     source_files = get_files(source_path, "*.vhd")
 
     if outdated(f"{WORK_DIR}/{work}-obj08.cf", source_files):
@@ -45,7 +50,7 @@ def analyze_window_ctrl_lib():
 def analyze_uart_lib():
     """Analyze the UART library."""
     work = "uart_lib"
-    source_path = ABSOLUTE_PATH / ".." / ".." / "submodules" / "icestick-uart" / "hdl"
+    source_path = SOURCE_PATHS[work]
     source_files = get_files(source_path, "*.vhd")
 
     if outdated(f"{WORK_DIR}/{work}-obj08.cf", source_files):
@@ -56,6 +61,15 @@ def analyze_uart_lib():
         subprocess.run(analyze_command, check=True)
 
 
+def library_sources() -> list:
+    """Obtain the sources of all additional libraries."""
+    return [
+        source
+        for source_path in SOURCE_PATHS.values()
+        for source in get_files(source_path, "*.vhd")
+    ]
+
+
 def outdated(output: str, dependencies: list) -> bool:
     """Check whether files are outdated with regards to a reference output."""
     if not os.path.isfile(output):
@@ -0,0 +1,126 @@
+"""Bulk inference of the bnn by the file driven testbench "tb_bnn_file.vhd"."""
+
+import dataclasses
+import hashlib
+import os
+import pathlib
+import subprocess
+import tempfile
+
+import numpy as np
+
+from test_utils.extra_libs import STD, WORK_DIR, analyze_window_ctrl_lib
+from test_utils.general import get_files, locked
+from test_utils.simulation import CACHE_DIR, STAMP, design_hash
+
+ABSOLUTE_PATH = pathlib.Path(__file__).parent.absolute()
+SOURCE_PATH = ABSOLUTE_PATH / ".." / ".." / "src"
+TESTBENCH = "tb_bnn_file"
+
+
+@dataclasses.dataclass
+class SimulationResult:
+    # one row of output words per image
+    outputs: np.ndarray
+    # cycle of the first input datum of each image
+    start_cycles: np.ndarray
+    # cycle of the last output of each image
+    finish_cycles: np.ndarray
+
+    @property
+    def latencies(self) -> np.ndarray:
+        return self.finish_cycles - self.start_cycles
+
+    @property
+    def initiation_intervals(self) -> np.ndarray:
+        return np.diff(self.finish_cycles)
+
+
+def write_stimulus(filename: str, images: np.ndarray, bitwidth: int = 8):
+    """Write the images as one byte per input datum. Only the most significant
+    "bitwidth" bits of each pixel are kept, like "pack_image()" of
+    "uart_client.py", i. e. 1 bit pixels are binarized at 128."""
+    (np.asarray(images, dtype=np.uint8) >> (8 - bitwidth)).tofile(filename)
+
+
+def read_results(filename: str) -> SimulationResult:
+    """Read the lines of the result file: start cycle, finish cycle and the
+    output words of an image."""
+    with open(filename) as infile:
+        rows = np.array([line.split() for line in infile], dtype=np.int64)
+    return SimulationResult(rows[:, 2:], rows[:, 0], rows[:, 1])
+
+
+def compile_testbench(bnn_file: str) -> str:
+    """Compile the testbench with the bnn. Return the build directory."""
+    analyze_window_ctrl_lib()
+
+    sources = [
+        source for source in get_files(SOURCE_PATH, "*.vhd") if source.name != "bnn.vhd"
+    ] + [
+        pathlib.Path(bnn_file).resolve(),
+        (ABSOLUTE_PATH / ".." / f"{TESTBENCH}.vhd").resolve(),
+    ]
+    compile_args = [STD, "--work=bnn_lib", f"-P{os.path.abspath(WORK_DIR)}"]
+    build_dir = os.path.abspath(
+        os.path.join(
+            CACHE_DIR, f"{TESTBENCH}_{design_hash(TESTBENCH, sources, compile_args)}"
+        )
+    )
+
+    with locked(f"{build_dir}.lock"):
+        if not os.path.isfile(os.path.join(build_dir, STAMP)):
+            os.makedirs(build_dir, exist_ok=True)
+            for command in (
+                ["ghdl", "-i", *compile_args, *map(str, sources)],
+                ["ghdl", "-m", *compile_args, TESTBENCH],
+            ):
+                subprocess.run(command, cwd=build_dir, check=True)
+            pathlib.Path(build_dir, STAMP).touch()
+    return build_dir
+
+
+def run_testbench(bnn, images: np.ndarray, input_interval: int = 2):
+    """Simulate the bnn for all images (uint8). The images are sent back to
+    back, one datum every "input_interval" cycles."""
+    images = np.asarray(images)
+    # GHDL might read the sources again, when running. Thus the bnn file is kept
+    # and only written, if it doesn't exist yet.
+    bnn_vhdl = bnn.to_vhdl()
+    bnn_file = os.path.join(
+        WORK_DIR, f"bnn_{hashlib.sha256(bnn_vhdl.encode()).hexdigest()[:16]}.vhd"
+    )
+    if not os.path.isfile(bnn_file):
+        os.makedirs(WORK_DIR, exist_ok=True)
+        with open(bnn_file, "w") as outfile:
+            outfile.write(bnn_vhdl)
+
+    with tempfile.TemporaryDirectory(dir=WORK_DIR) as run_dir:
+        run_dir = os.path.abspath(run_dir)
+        stimulus_file = os.path.join(run_dir, "stimulus.bin")
+        result_file = os.path.join(run_dir, "result.txt")
+        write_stimulus(stimulus_file, images, bnn.input_layer_info["bitwidth"])
+
+        generics = {
+            "C_STIMULUS_FILE": stimulus_file,
+            "C_RESULT_FILE": result_file,
+            "C_IMAGE_SIZE": images[0].size,
+            "C_INPUT_CHANNEL_BITWIDTH": bnn.input_layer_info["bitwidth"],
+            "C_OUTPUT_CHANNEL_BITWIDTH": bnn.output_bitwidth,
+            "C_INPUT_INTERVAL": input_interval,
+        }
+        subprocess.run(
+            [
+                "ghdl",
+                "-r",
+                STD,
+                "--work=bnn_lib",
+                f"-P{os.path.abspath(WORK_DIR)}",
+                TESTBENCH,
+                "--ieee-asserts=disable-at-0",
+            ]
+            + [f"-g{name}={value}" for name, value in generics.items()],
+            cwd=compile_testbench(bnn_file),
+            check=True,
+        )
+        return read_results(result_file)
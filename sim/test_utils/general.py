@@ -1,11 +1,14 @@
 """Collection of general test utilities."""
 
+import contextlib
 import dataclasses
+import fcntl
+import os
 import pathlib
 from random import randint
 from typing import List, Optional, Sequence
 
-from bitstring import Bits
+import numpy as np
 
 
 def position_to_index(col: int, row: int, width: int, height: int) -> int:
@@ -32,38 +35,89 @@ def get_files(path: pathlib.Path, pattern: str) -> List[str]:
     return [p.resolve() for p in list(path.glob(pattern))]
 
 
+@contextlib.contextmanager
+def locked(path: str):
+    """Lock a file exclusively. Thus only one process, e. g. one worker of
+    pytest-xdist, can enter at the same time."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def integers_to_bits(values, bitwidth: int = 1) -> np.ndarray:
+    """Convert unsigned integers to an array of bits. The last axis contains
+    the bits of each integer, the most significant bit first."""
+    # Wide integers don't fit into int64.
+    values = np.asarray(values, dtype=np.int64 if bitwidth < 63 else object)
+    if np.any((values < 0) | (values >= 2 ** bitwidth)):
+        raise ValueError(f"Values exceed {bitwidth} bit: {values}")
+    shifts = np.arange(bitwidth - 1, -1, -1)
+    return ((values[..., np.newaxis] >> shifts) & 1).astype(np.uint8)
+
+
+def bits_to_integers(bits: np.ndarray) -> List[int]:
+    """Convert each row of bits (most significant bit first) to an integer."""
+    bits = np.asarray(bits, dtype=np.uint8).reshape(len(bits), -1)
+    # Pad the rows at the front to whole bytes.
+    padded = np.zeros((len(bits), -(-bits.shape[1] // 8) * 8), dtype=np.uint8)
+    padded[:, padded.shape[1] - bits.shape[1] :] = bits
+    packed = np.packbits(padded, axis=1)
+    if packed.shape[1] <= 8:
+        # The integers fit into uint64.
+        weights = 1 << np.arange(8 * packed.shape[1] - 8, -1, -8, dtype=np.uint64)
+        return (packed.astype(np.uint64) @ weights).tolist()
+    return [int.from_bytes(row.tobytes(), "big") for row in packed]
+
+
 def concatenate_integers(integer_list: List[int], bitwidth=1) -> int:
-    """Concatenate multiple integers into a single integer."""
-    concatenated_integer = 0
-    for value in integer_list:
-        if value > 2 ** bitwidth:
-            raise ValueError(f"Value {value} exeeds range.")
-        concatenated_integer = (concatenated_integer << bitwidth) + value
-    return concatenated_integer
+    """Concatenate multiple integers into a single integer. The first integer
+    ends up in the most significant bits."""
+    return bits_to_integers(integers_to_bits(integer_list, bitwidth).reshape(1, -1))[0]
 
 
 def concatenate_channel(image, channel, bitwidth=1):
     """Concatenate the channels of an image."""
-    return [
-        concatenate_integers(
-            image[pixel_index : pixel_index + channel], bitwidth=bitwidth
-        )
-        for pixel_index in range(0, len(image), channel)
-    ]
-
-
-def to_fixedint(number: int, bitwidth: int, is_unsigned: bool = True):
-    """Convert signed int to fixed int."""
+    bits = integers_to_bits(image, bitwidth)
+    return bits_to_integers(bits.reshape(-1, channel * bitwidth))
+
+
+def split_integers(values: List[int], count: int, bitwidth: int = 1) -> np.ndarray:
+    """Split each value into "count" integers. Inverse of "concatenate_channel()",
+    i. e. the first integer is taken from the most significant bits."""
+    width = count * bitwidth
+    byte_count = (width + 7) // 8
+    raw = b"".join(value.to_bytes(byte_count, "big") for value in values)
+    bits = np.unpackbits(np.frombuffer(raw, dtype=np.uint8))
+    bits = bits.reshape(len(values), -1)[:, 8 * byte_count - width :]
+    weights = 1 << np.arange(bitwidth - 1, -1, -1, dtype=np.int64)
+    return bits.reshape(len(values), count, bitwidth) @ weights
+
+
+def to_fixedint(number, bitwidth: int, is_unsigned: bool = True):
+    """Convert signed int to fixed int, i. e. two's complement. Works for
+    single numbers and arrays."""
+    numbers = np.asarray(number, dtype=np.int64)
     if is_unsigned:
-        number_dict = {"uint": number, "length": bitwidth}
+        lower, upper = 0, 2 ** bitwidth
     else:
-        number_dict = {"int": number, "length": bitwidth}
-    return int(Bits(**number_dict).bin, 2)
-
-
-def from_fixedint(number: int, bitwidth: int, is_unsigned: bool = True):
-    """Convert fixed int to signed int."""
-    number_bin = bin(number)[2:].zfill(bitwidth)
-    if is_unsigned:
-        return Bits(bin=number_bin).uint
-    return Bits(bin=number_bin).int
+        lower, upper = -(2 ** (bitwidth - 1)), 2 ** (bitwidth - 1)
+    if np.any((numbers < lower) | (numbers >= upper)):
+        raise ValueError(f"Values don't fit in {bitwidth} bit: {number}")
+    fixedint = np.mod(numbers, 2 ** bitwidth)
+    return fixedint.item() if fixedint.ndim == 0 else fixedint
+
+
+def from_fixedint(number, bitwidth: int, is_unsigned: bool = True):
+    """Convert fixed int to signed int. Works for single numbers and arrays."""
+    numbers = np.asarray(number, dtype=np.int64)
+    if np.any((numbers < 0) | (numbers >= 2 ** bitwidth)):
+        raise ValueError(f"Values don't fit in {bitwidth} bit: {number}")
+    if not is_unsigned:
+        numbers = np.where(
+            numbers >= 2 ** (bitwidth - 1), numbers - 2 ** bitwidth, numbers
+        )
+    return numbers.item() if numbers.ndim == 0 else numbers
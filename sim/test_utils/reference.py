@@ -0,0 +1,106 @@
+"""Reference models of the simulations, which don't need tensorflow."""
+
+import hashlib
+from importlib import import_module
+import os
+import pathlib
+import pickle
+
+import numpy as np
+
+from test_utils.general import locked
+from test_utils.simulation import CACHE_DIR
+
+# The simulations run in their own build directory. Thus use an absolute path.
+BNN_CACHE_PATH = pathlib.Path(__file__).parent.parent.absolute() / CACHE_DIR / "bnn"
+
+
+def update_digest(sha, path: pathlib.Path):
+    """Hash the content of a file or of all files in a directory."""
+    if path.is_dir():
+        for child in sorted(path.iterdir()):
+            sha.update(child.name.encode())
+            update_digest(sha, child)
+    else:
+        sha.update(path.read_bytes())
+
+
+def load_bnn(
+    path: str,
+    input_channel_bitwidth: int = 8,
+    top_k: int = 0,
+    output_score: bool = False,
+):
+    """Convert a larq model like "bnn_from_larq()" of "04_custom_toplevel.py".
+    The bnn gets pickled, keyed by the content of the model, the converter and
+    the arguments. Thus only the first simulation has to load tensorflow.
+    The "playground" directory has to be in the module search path."""
+    toplevel = import_module("04_custom_toplevel")
+
+    sha = hashlib.sha256()
+    sha.update(f"{input_channel_bitwidth} {top_k} {output_score}".encode())
+    update_digest(sha, pathlib.Path(toplevel.__file__))
+    update_digest(sha, pathlib.Path(path))
+    cache_file = BNN_CACHE_PATH / f"bnn_{sha.hexdigest()[:16]}.pickle"
+
+    with locked(f"{cache_file}.lock"):
+        if not cache_file.is_file():
+            bnn = toplevel.bnn_from_larq(
+                path, input_channel_bitwidth, top_k, output_score
+            )
+            # Write to a temporary file first. Thus an interrupted run doesn't
+            # leave an incomplete entry.
+            temporary_file = cache_file.with_suffix(".tmp")
+            with open(temporary_file, "wb") as outfile:
+                pickle.dump(bnn, outfile)
+            os.replace(temporary_file, cache_file)
+
+    with open(cache_file, "rb") as infile:
+        return pickle.load(infile)
+
+
+def binary_convolution(
+    image: np.ndarray, weights: np.ndarray, stride: int, padding: int, pad_value: int
+) -> np.ndarray:
+    """Convolution like "lq.layers.QuantConv2D" without bias. The image
+    (H x W x CH) and the weights (K x K x CH x CH_OUT) are in LARQ format,
+    i. e. -1 and 1."""
+    kernel_size = weights.shape[0]
+    padded_image = np.pad(
+        image,
+        ((padding, padding), (padding, padding), (0, 0)),
+        constant_values=pad_value,
+    )
+    windows = np.lib.stride_tricks.sliding_window_view(
+        padded_image, (kernel_size, kernel_size), axis=(0, 1)
+    )[::stride, ::stride]
+    # windows: H_out x W_out x CH x K x K
+    return np.einsum("yxcij,ijco->yxo", windows, weights)
+
+
+def batchnorm_heaviside(
+    values: np.ndarray,
+    beta: np.ndarray,
+    mean: np.ndarray,
+    variance: np.ndarray,
+    epsilon: float = 0.001,
+) -> np.ndarray:
+    """Batch normalization without scale (in inference mode), followed by
+    "lq.quantizers.SteHeaviside"."""
+    normalized = (values - mean) / np.sqrt(variance + epsilon) + beta
+    return (normalized > 0).astype(np.uint8)
+
+
+def maximum_pooling(image: np.ndarray, kernel_size: int, stride: int) -> np.ndarray:
+    """Maximum pooling like "tf.keras.layers.MaxPooling2D" with "valid" padding.
+    The image has the shape H x W x CH."""
+    windows = np.lib.stride_tricks.sliding_window_view(
+        image, (kernel_size, kernel_size), axis=(0, 1)
+    )[::stride, ::stride]
+    return windows.max(axis=(3, 4))
+
+
+def global_average_pooling(image: np.ndarray) -> np.ndarray:
+    """Average of each channel like "tf.keras.layers.GlobalAveragePooling2D".
+    The image has the shape H x W x CH."""
+    return image.mean(axis=(0, 1))
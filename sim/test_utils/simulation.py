@@ -0,0 +1,107 @@
+"""Run the cocotb tests with a cache of the compiled designs."""
+
+import hashlib
+import json
+import os
+import pathlib
+import time
+from typing import List
+
+from cocotb_test.simulator import Ghdl
+
+from test_utils.benchmark import simulated_time
+from test_utils.extra_libs import WORK_DIR, library_sources
+from test_utils.general import locked
+
+CACHE_DIR = f"{WORK_DIR}/cache"
+# marks a complete cache entry
+STAMP = "compiled"
+# Performance of the simulations of the current test, see "pytest --benchmark".
+measurements = []
+
+
+class CachedGhdl(Ghdl):
+    """GHDL, which compiles only if the cache entry is incomplete."""
+
+    def outdated(self, output, dependencies):
+        return not os.path.isfile(os.path.join(self.sim_dir, STAMP))
+
+
+def design_hash(toplevel: str, vhdl_sources: list, compile_args: List[str]) -> str:
+    """Hash everything the compiled design depends on."""
+    design = hashlib.sha256()
+    design.update(" ".join([toplevel] + compile_args).encode())
+    for source in list(vhdl_sources) + library_sources():
+        design.update(str(source).encode())
+        design.update(pathlib.Path(source).read_bytes())
+    return design.hexdigest()[:16]
+
+
+def stimulus_seed(toplevel: str, parameters: dict, extra_env: dict) -> int:
+    """Seed of the random generator in the cocotb test, e. g. of the gaps of
+    "--stimulus random". It is fixed per simulation. Thus the simulated cycles
+    of different runs are comparable."""
+    configuration = json.dumps(
+        [toplevel, parameters, extra_env], sort_keys=True, default=str
+    )
+    return int(hashlib.sha256(configuration.encode()).hexdigest()[:8], 16)
+
+
+def run(
+    vhdl_sources: list,
+    toplevel: str,
+    compile_args=None,
+    clock_period: int = 10,
+    **kwargs,
+):
+    """Replacement of "cocotb_test.simulator.run". The analyzed libraries and the
+    elaborated design are cached per hash of the sources. The generics are set,
+    when the simulation starts. Thus all parametrizations of a test share a
+    single compiled design and unchanged designs don't get compiled again.
+    The clock period (in ns) is used to count the simulated cycles."""
+    # The additional libraries are analyzed once to the top of the work directory.
+    compile_args = list(compile_args or []) + [f"-P{os.path.abspath(WORK_DIR)}"]
+    sim_build = os.path.join(
+        CACHE_DIR, f"{toplevel}_{design_hash(toplevel, vhdl_sources, compile_args)}"
+    )
+    kwargs.update(
+        vhdl_sources=vhdl_sources,
+        toplevel=toplevel,
+        compile_args=compile_args,
+        sim_build=sim_build,
+    )
+    kwargs.setdefault(
+        "seed",
+        stimulus_seed(
+            toplevel, kwargs.get("parameters", {}), kwargs.get("extra_env", {})
+        ),
+    )
+
+    # Compile separately. Thus a failing simulation keeps the cache entry.
+    # Parallel runs of the same design wait until the first one compiled it.
+    compile_time = 0.0
+    with locked(f"{sim_build}.lock"):
+        if not os.path.isfile(os.path.join(sim_build, STAMP)):
+            start = time.perf_counter()
+            CachedGhdl(compile_only=True, **kwargs).run()
+            compile_time = time.perf_counter() - start
+            pathlib.Path(sim_build, STAMP).touch()
+
+    start = time.perf_counter()
+    results_file = CachedGhdl(**kwargs).run()
+    wall_time = time.perf_counter() - start
+    cycles = int(simulated_time(results_file) // clock_period)
+    measurements.append(
+        {
+            "test": os.environ.get("PYTEST_CURRENT_TEST", "").split(" ")[0],
+            "toplevel": toplevel,
+            "generics": kwargs.get("parameters", {}),
+            "environment": kwargs.get("extra_env", {}),
+            "stimulus": os.environ.get("STIMULUS", "full_rate"),
+            "compile_time": compile_time,
+            "wall_time": wall_time,
+            "cycles": cycles,
+            "cycles_per_second": cycles / wall_time,
+        }
+    )
+    return results_file
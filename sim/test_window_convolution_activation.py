@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 import math
+import os
 import pathlib
 import random
 from random import choice, randint
@@ -8,23 +9,96 @@ from typing import List
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import Timer
-from cocotb_test.simulator import run
 import pytest
 
-import larq as lq
 import numpy as np
-import tensorflow as tf
 
-from test_utils.cocotb_helpers import ImageMonitor, Tick
+from test_utils.cocotb_helpers import ImageMonitor, StreamDriver, Tick
 from test_utils.general import (
+    bits_to_integers,
     concatenate_channel,
     concatenate_integers,
     get_files,
+    integers_to_bits,
 )
+from test_utils.reference import batchnorm_heaviside, binary_convolution
+from test_utils.simulation import run
 
 
-def tensor_to_list(tensor):
-    return list(tensor.numpy().astype("uint8").flat)
+def replace_minus(values):
+    """Convert from LARQ format [-1, 1] to pocket-bnn format [0, 1].
+    This gets compensated by batchnorm/activation later.
+    """
+    return [0 if v == -1 else v for v in values]
+
+
+def random_batchnorm_params(
+    output_channel: int, fan_in: int, input_channel_bitwidth: int = 1
+) -> List[np.ndarray]:
+    """Try to set realistic batchnorm parameter: beta, mean and variance."""
+    return [
+        np.array([random.uniform(0, 0.5) for _ in range(output_channel)]),
+        np.array(
+            [
+                random.uniform(-1, 1) * input_channel_bitwidth
+                for _ in range(output_channel)
+            ]
+        ),
+        np.array(
+            [
+                random.uniform(0, 1) * fan_in * input_channel_bitwidth
+                for _ in range(output_channel)
+            ]
+        ),
+    ]
+
+
+def get_thresholds(batchnorm_params: List[np.ndarray], fan_in: int) -> List[int]:
+    """Convert the batchnorm parameter to the thresholds of the positive only
+    convolution result."""
+    threshold = []
+    for beta, mean, variance in zip(*batchnorm_params):
+        # use batch normalization as activation
+        # see also: https://arxiv.org/pdf/1612.07119.pdf, 4.2.2 Batchnorm-activation as Threshold
+        # 0.001 is added to avoid division by 0.
+        threshold_batchnorm = mean - beta * math.sqrt(variance + 0.001)
+
+        # get the following formula by solving:
+        # x - y = fan_in; x + y = threshold
+        threshold_pos = (threshold_batchnorm + fan_in) / 2
+        threshold.append(int(threshold_pos))
+    return replace_minus(threshold)
+
+
+def write_rom(filename: str, rows: np.ndarray):
+    """Write a rom init file. Each row of bits (least significant bit first)
+    gets a hexadecimal line."""
+    digits = math.ceil(rows.shape[1] / 4)
+    with open(filename, "w") as outfile:
+        for value in bits_to_integers(rows[:, ::-1]):
+            outfile.write(f"{value:0{digits}x}\n")
+
+
+def write_init_files(
+    basename: str,
+    weights: np.ndarray,
+    thresholds: List[int],
+    threshold_bitwidth: int,
+    folding: int,
+):
+    """Write the weights (LARQ format) and thresholds to rom init files, like
+    "Convolution.write_init_files()" of the generator. Each line contains the
+    weights (thresholds) of one output channel slice."""
+    output_channel = weights.shape[-1]
+    # Bits of islv_weights and islv_threshold, least significant bit first.
+    weight_bits = integers_to_bits(replace_minus(weights.flat))[::-1, 0]
+    threshold_bits = integers_to_bits(thresholds, threshold_bitwidth)[::-1, ::-1]
+    # output channel increments fastest for the weights and slowest for the thresholds
+    write_rom(
+        f"{basename}_weights.mem",
+        weight_bits.reshape(-1, output_channel).T.reshape(folding, -1),
+    )
+    write_rom(f"{basename}_thresholds.mem", threshold_bits.reshape(folding, -1))
 
 
 @cocotb.test()
@@ -39,46 +113,29 @@ async def run_test(dut):
     )
     output_channel = dut.C_OUTPUT_CHANNEL.value.integer
     output_channel_bitwidth = dut.C_OUTPUT_CHANNEL_BITWIDTH.value.integer
+    folding = dut.C_FOLDING.value.integer
+    padding = dut.C_PAD.value.integer
+    # pocket-bnn format [0, 1] -> LARQ format [-1, 1]
+    pad_value = 2 * dut.C_PAD_VALUE.value.integer - 1
 
     # Needed to compensate the offset caused by converting between -1 (LARQ) and 0 (hdl).
     # Conversion from LARQ format [-1, 1] to pocket-bnn format [0, 1] (positive only):
     # make the threshold compatible to positive only values
     fan_in = kernel_size[0] ** 2 * image_shape[2]
 
-    # define the reference model
-    batch_shape = (1,) + image_shape
-    input_ = tf.keras.Input(batch_shape=batch_shape, name="img")
-    x = lq.layers.QuantConv2D(
-        output_channel, kernel_size, strides=stride, use_bias=False, name="test_conv",
-    )(input_)
-    if output_channel_bitwidth == 1:
-        # Scale is not needed, since we clip afterwards anyway.
-        x = tf.keras.layers.BatchNormalization(name="test_batchnorm", scale=False)(x)
-        output_ = lq.quantizers.SteHeaviside()(x)
-    else:
-        # There is no batchnorm for output bitwidth > 1
-        output_ = x
-    model = tf.keras.Model(inputs=input_, outputs=output_)
-
-    if output_channel_bitwidth == 1:
-        # Try to set realistic batchnorm parameter.
-        input_channel_bitwidth = dut.C_INPUT_CHANNEL_BITWIDTH.value.integer
-        model.get_layer("test_batchnorm").set_weights(
-            [
-                np.array([random.uniform(0, 0.5) for _ in range(output_channel)]),
-                np.array(
-                    [
-                        random.uniform(-1, 1) * input_channel_bitwidth
-                        for _ in range(output_channel)
-                    ]
-                ),
-                np.array(
-                    [
-                        random.uniform(0, 1) * fan_in * input_channel_bitwidth
-                        for _ in range(output_channel)
-                    ]
-                ),
-            ]
+    # The reference model is a quantized convolution, followed by batchnorm
+    # (without scale, since we clip afterwards anyway) and the heaviside function.
+    # There is no batchnorm for output bitwidth > 1.
+    # With init files, the weights and thresholds are read from rom. Thus they
+    # are fixed for each simulation and the ports are unused.
+    init_files = "PARAMETER_FILE" in os.environ
+    if init_files:
+        parameter = np.load(os.environ["PARAMETER_FILE"])
+        rom_weights = list(parameter["weights"].flat)
+        batchnorm_params = [parameter[key] for key in ("beta", "mean", "variance")]
+    elif output_channel_bitwidth == 1:
+        batchnorm_params = random_batchnorm_params(
+            output_channel, fan_in, dut.C_INPUT_CHANNEL_BITWIDTH.value.integer
         )
 
     # define the testcases
@@ -87,33 +144,29 @@ async def run_test(dut):
         input_image: List[int]
         weights: List[int]
 
-        @staticmethod
-        def replace_minus(values):
-            """Convert from LARQ format [-1, 1] to pocket-bnn format [0, 1].
-            This gets compensated by batchnorm/activation later.
-            """
-            return [0 if v == -1 else v for v in values]
-
         @property
         def input_data(self) -> int:
             # send all channels (i. e. one pixel) at a time
             return concatenate_channel(
-                self.replace_minus(self.input_image), image_shape[2], 1
+                replace_minus(self.input_image), image_shape[2], 1
             )
 
         @property
         def output_data(self) -> int:
             # inference
-            image_tensor = tf.convert_to_tensor(self.input_image)
-            reshaped_tensor = tf.reshape(image_tensor, batch_shape)
-
-            extractor = tf.keras.Model(
-                inputs=model.inputs, outputs=[layer.output for layer in model.layers]
+            result = binary_convolution(
+                np.array(self.input_image).reshape(image_shape),
+                np.array(self.weights).reshape(
+                    kernel_size + (image_shape[2], output_channel)
+                ),
+                stride[0],
+                padding,
+                pad_value,
             )
-            features = extractor(reshaped_tensor)
-            result = features[-1].numpy()
 
-            if output_channel_bitwidth > 1:
+            if output_channel_bitwidth == 1:
+                result = batchnorm_heaviside(result, *batchnorm_params)
+            else:
                 # compensate (see also threshold for batchnorm)
                 result = (result + fan_in) / 2
 
@@ -125,30 +178,15 @@ async def run_test(dut):
 
         def get_weights(self):
             # Only binary weights are supported.
-            return concatenate_integers(self.replace_minus(self.weights), bitwidth=1)
+            return concatenate_integers(replace_minus(self.weights), bitwidth=1)
 
         def get_threshold(self):
             # There is no batchnorm for output bitwidth > 1
             if output_channel_bitwidth > 1:
                 return 0
 
-            threshold = []
-            batchnorm_params = [
-                a.tolist() for a in model.get_layer("test_batchnorm").get_weights()
-            ]
-            for beta, mean, variance in zip(*batchnorm_params):
-                # use batch normalization as activation
-                # see also: https://arxiv.org/pdf/1612.07119.pdf, 4.2.2 Batchnorm-activation as Threshold
-                # 0.001 is added to avoid division by 0.
-                threshold_batchnorm = mean - beta * math.sqrt(variance + 0.001)
-
-                # get the following formula by solving:
-                # x - y = fan_in; x + y = threshold
-                threshold_pos = (threshold_batchnorm + fan_in) / 2
-                threshold.append(int(threshold_pos))
-
             return concatenate_integers(
-                self.replace_minus(threshold),
+                get_thresholds(batchnorm_params, fan_in),
                 bitwidth=1
                 + math.ceil(math.log2(kernel_size[0] ** 2 * image_shape[2] + 1))
                 + 1,
@@ -184,6 +222,8 @@ async def run_test(dut):
             ],
         ),
     )
+    if init_files:
+        cases = tuple(Testcase(case.input_image, rom_weights) for case in cases)
 
     # prepare coroutines
     clock_period = 10  # ns
@@ -197,64 +237,110 @@ async def run_test(dut):
         1,
         output_channel * output_channel_bitwidth,
     )
-    dut.isl_valid <= 0
+    # The frame flags are sampled with each output.
+    sof_mon = ImageMonitor("sof", dut.osl_sof, dut.osl_valid, dut.isl_clk, 1)
+    eof_mon = ImageMonitor("eof", dut.osl_eof, dut.osl_valid, dut.isl_clk, 1)
+    # The first and last datum of the frame are marked.
+    # The window gets repeated for a folded layer, i. e. the input stalls.
+    driver = StreamDriver(
+        dut.isl_clk, dut.isl_valid, dut.islv_data, dut.isl_sof, dut.isl_eof, dut.osl_rdy
+    )
     dut.isl_start <= 0
     await tick.wait()
 
     # run the specific testcases
     for case in cases:
-        reshaped_weights = [
-            np.array(case.weights).reshape(
-                kernel_size + (image_shape[2], output_channel)
-            )
-        ]
-        model.get_layer("test_conv").set_weights(reshaped_weights)
-        # This is the way how we convert the weights of the model back.
-        assert list(reshaped_weights[0].flat) == case.weights
-
-        dut.islv_weights <= case.get_weights()
-        dut.islv_threshold <= case.get_threshold()
+        if not init_files:
+            dut.islv_weights <= case.get_weights()
+            dut.islv_threshold <= case.get_threshold()
 
         dut.isl_start <= 1
         await tick.wait()
         dut.isl_start <= 0
         await tick.wait()
 
-        for datum in case.input_data:
-            dut.isl_valid <= 1
-            dut.islv_data <= datum
-            await tick.wait()
-            dut.isl_valid <= 0
-            await tick.wait()
-
-        dut.isl_valid <= 0
-        await tick.wait_multiple(40)
+        await driver.send(case.input_data)
+        # The padding rows get flushed after the last input.
+        flush_count = padding * image_shape[0] + padding
+        await tick.wait_multiple(40 + folding + flush_count * (folding + 5))
 
         print("expected result:", case.output_data)
         print("actual result:", output_mon.output)
         assert output_mon.output == case.output_data
         output_mon.clear()
 
+        # The first output starts and the last output ends the frame.
+        output_count = len(sof_mon.output)
+        assert sof_mon.output == [1] + [0] * (output_count - 1)
+        assert eof_mon.output == [0] * (output_count - 1) + [1]
+        sof_mon.clear()
+        eof_mon.clear()
+
+    # Send the next frame as soon as the layer is ready. A padded layer flushes
+    # the bottom padding meanwhile. The weights of the last case are kept.
+    stream = [
+        Testcase(
+            [choice([-1, 1]) for _ in range(math.prod(image_shape))],
+            cases[-1].weights,
+        )
+        for _ in range(3)
+    ]
+    dut.isl_start <= 1
+    await tick.wait()
+    dut.isl_start <= 0
+    await tick.wait()
+
+    for case in stream:
+        await driver.send(case.input_data)
+    await tick.wait_multiple(40 + folding + flush_count * (folding + 5))
+
+    assert output_mon.output == [datum for case in stream for datum in case.output_data]
+    assert sof_mon.output.count(1) == len(stream)
+    assert eof_mon.output.count(1) == len(stream)
+
 
 # Don't run the full test matrix. Only the most common configs.
 @pytest.mark.parametrize(
-    "kernel_size,stride,input_channel,output_channel,output_channel_bitwidth",
+    "kernel_size,stride,input_channel,output_channel,output_channel_bitwidth,folding,padding,pad_value",
     [
-        (1, 1, 4, 8, 1),
-        (2, 1, 4, 8, 1),
-        (2, 2, 4, 8, 1),
-        (3, 1, 4, 8, 1),
-        (3, 1, 4, 8, 8),
-        (3, 1, 1, 4, 1),
-        (3, 1, 3, 8, 1),
-        (3, 1, 8, 16, 1),
-        (3, 2, 4, 8, 1),
-        (5, 1, 4, 8, 1),
-        (7, 1, 4, 8, 1),
+        (1, 1, 4, 8, 1, 1, 0, 0),
+        (2, 1, 4, 8, 1, 1, 0, 0),
+        (2, 2, 4, 8, 1, 1, 0, 0),
+        (3, 1, 4, 8, 1, 1, 0, 0),
+        (3, 1, 4, 8, 8, 1, 0, 0),
+        (3, 1, 1, 4, 1, 1, 0, 0),
+        (3, 1, 3, 8, 1, 1, 0, 0),
+        (3, 1, 8, 16, 1, 1, 0, 0),
+        (3, 2, 4, 8, 1, 1, 0, 0),
+        (5, 1, 4, 8, 1, 1, 0, 0),
+        pytest.param(7, 1, 4, 8, 1, 1, 0, 0, marks=pytest.mark.slow),
+        # folded, i. e. time-multiplexed output channel
+        (1, 1, 4, 8, 1, 4, 0, 0),
+        (2, 2, 4, 8, 1, 2, 0, 0),
+        (3, 1, 4, 8, 1, 2, 0, 0),
+        (3, 1, 4, 8, 1, 8, 0, 0),
+        (3, 1, 4, 8, 8, 4, 0, 0),
+        (3, 1, 8, 16, 1, 4, 0, 0),
+        (3, 2, 4, 8, 1, 8, 0, 0),
+        # padded, i. e. "same" convolution
+        (3, 1, 4, 8, 1, 1, 1, 0),
+        (3, 1, 4, 8, 1, 1, 1, 1),
+        (3, 1, 4, 8, 8, 1, 1, 1),
+        (3, 1, 1, 4, 1, 1, 1, 0),
+        (5, 1, 4, 8, 1, 1, 2, 1),
+        pytest.param(7, 1, 4, 8, 1, 1, 3, 0, marks=pytest.mark.slow),
+        (3, 1, 4, 8, 1, 4, 1, 1),
     ],
 )
 def test_window_convolution_activation(
-    kernel_size, stride, input_channel, output_channel, output_channel_bitwidth
+    kernel_size,
+    stride,
+    input_channel,
+    output_channel,
+    output_channel_bitwidth,
+    folding,
+    padding,
+    pad_value,
 ):
     # Input channel bitwidth > 1 is tested at convolution level.
     input_channel_bitwidth = 1
@@ -267,6 +353,77 @@ def test_window_convolution_activation(
         "C_OUTPUT_CHANNEL_BITWIDTH": output_channel_bitwidth,
         "C_IMG_WIDTH": 8,
         "C_IMG_HEIGHT": 8,
+        "C_FOLDING": folding,
+        "C_PAD": padding,
+        "C_PAD_VALUE": pad_value,
+    }
+    run(
+        vhdl_sources=get_files(
+            pathlib.Path(__file__).parent.absolute() / ".." / "src", "*.vhd"
+        ),
+        toplevel="window_convolution_activation",
+        module="test_window_convolution_activation",
+        compile_args=["--work=bnn_lib", "--std=08"],
+        parameters=generics,
+    )
+
+
+@pytest.mark.parametrize(
+    "kernel_size,stride,input_channel,output_channel,output_channel_bitwidth,folding",
+    [
+        (3, 1, 4, 8, 1, 1),
+        (3, 1, 4, 8, 8, 1),
+        (1, 1, 4, 8, 1, 8),
+        (3, 1, 4, 8, 1, 4),
+        (3, 2, 4, 8, 8, 2),
+        (3, 1, 8, 16, 1, 2),
+    ],
+)
+def test_window_convolution_activation_init_files(
+    kernel_size,
+    stride,
+    input_channel,
+    output_channel,
+    output_channel_bitwidth,
+    folding,
+):
+    # The weights and thresholds are read from rom. Thus they are fixed for
+    # each simulation.
+    fan_in = kernel_size ** 2 * input_channel
+    weights = np.random.choice(
+        [-1, 1], (kernel_size, kernel_size, input_channel, output_channel)
+    )
+    batchnorm_params = random_batchnorm_params(output_channel, fan_in)
+    basename = os.path.abspath(
+        f"sim_build/window_convolution_activation_{kernel_size}_{stride}_"
+        f"{input_channel}_{output_channel}_{output_channel_bitwidth}_{folding}"
+    )
+    os.makedirs(os.path.dirname(basename), exist_ok=True)
+    write_init_files(
+        basename,
+        weights,
+        get_thresholds(batchnorm_params, fan_in),
+        1 + math.ceil(math.log2(fan_in + 1)) + 1,
+        folding,
+    )
+    np.savez(
+        f"{basename}.npz",
+        weights=weights,
+        **dict(zip(("beta", "mean", "variance"), batchnorm_params)),
+    )
+
+    generics = {
+        "C_KERNEL_SIZE": kernel_size,
+        "C_STRIDE": stride,
+        "C_INPUT_CHANNEL": input_channel,
+        "C_INPUT_CHANNEL_BITWIDTH": 1,
+        "C_OUTPUT_CHANNEL": output_channel,
+        "C_OUTPUT_CHANNEL_BITWIDTH": output_channel_bitwidth,
+        "C_IMG_WIDTH": 8,
+        "C_IMG_HEIGHT": 8,
+        "C_FOLDING": folding,
+        "C_WEIGHTS_FILE": f"{basename}_weights.mem",
+        "C_THRESHOLDS_FILE": f"{basename}_thresholds.mem",
     }
     run(
         vhdl_sources=get_files(
@@ -276,4 +433,5 @@ def test_window_convolution_activation(
         module="test_window_convolution_activation",
         compile_args=["--work=bnn_lib", "--std=08"],
         parameters=generics,
+        extra_env={"PARAMETER_FILE": f"{basename}.npz"},
     )
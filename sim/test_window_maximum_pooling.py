@@ -8,12 +8,13 @@ from typing import List
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import Timer
-from cocotb_test.simulator import run
+import numpy as np
 import pytest
-import tensorflow as tf
 
-from test_utils.cocotb_helpers import ImageMonitor, Tick
+from test_utils.cocotb_helpers import ImageMonitor, StreamDriver, Tick
 from test_utils.general import concatenate_channel, get_files
+from test_utils.reference import maximum_pooling
+from test_utils.simulation import run
 
 
 @cocotb.test()
@@ -28,14 +29,6 @@ async def run_test(dut):
         dut.C_CHANNEL.value.integer,
     )
 
-    # define the reference model
-    batch_shape = (1,) + image_shape
-    input_ = tf.keras.Input(batch_shape=batch_shape, name="img")
-    output_ = tf.keras.layers.MaxPooling2D(pool_size=kernel_size, strides=stride)(
-        input_
-    )
-    model = tf.keras.Model(inputs=input_, outputs=output_)
-
     # define the testcases
     @dataclass
     class Testcase:
@@ -49,9 +42,12 @@ async def run_test(dut):
         @property
         def output_data(self) -> int:
             # inference
-            image_tensor = tf.convert_to_tensor(self.input_image)
-            result = model(tf.reshape(image_tensor, batch_shape))
-            result_list = list(result.numpy().astype("uint8").flat)
+            result = maximum_pooling(
+                np.array(self.input_image).reshape(image_shape),
+                kernel_size[0],
+                stride[0],
+            )
+            result_list = list(result.astype("uint8").flat)
             return concatenate_channel(result_list, image_shape[2], bitwidth)
 
     cases = (
@@ -77,7 +73,13 @@ async def run_test(dut):
         1,
         bitwidth * image_shape[2],
     )
-    dut.isl_valid <= 0
+    # The frame flags are sampled with each output.
+    sof_mon = ImageMonitor("sof", dut.osl_sof, dut.osl_valid, dut.isl_clk, 1)
+    eof_mon = ImageMonitor("eof", dut.osl_eof, dut.osl_valid, dut.isl_clk, 1)
+    # The first and last datum of the frame are marked.
+    driver = StreamDriver(
+        dut.isl_clk, dut.isl_valid, dut.islv_data, dut.isl_sof, dut.isl_eof
+    )
     dut.isl_start <= 0
     await tick.wait()
 
@@ -88,14 +90,7 @@ async def run_test(dut):
         dut.isl_start <= 0
         await tick.wait()
 
-        for datum in case.input_data:
-            dut.isl_valid <= 1
-            dut.islv_data <= datum
-            await tick.wait()
-            dut.isl_valid <= 0
-            await tick.wait()
-
-        dut.isl_valid <= 0
+        await driver.send(case.input_data)
         await tick.wait_multiple(40)
 
         print("Expected output:", case.output_data)
@@ -103,6 +98,13 @@ async def run_test(dut):
         assert output_mon.output == case.output_data
         output_mon.clear()
 
+        # The first output starts and the last output ends the frame.
+        output_count = len(sof_mon.output)
+        assert sof_mon.output == [1] + [0] * (output_count - 1)
+        assert eof_mon.output == [0] * (output_count - 1) + [1]
+        sof_mon.clear()
+        eof_mon.clear()
+
 
 # Don't run the full test matrix. Only the most common configs.
 @pytest.mark.parametrize(
@@ -0,0 +1,187 @@
+
+library ieee;
+  use ieee.std_logic_1164.all;
+  use ieee.numeric_std.all;
+
+-- Select the classes with the highest scores. The scores arrive one class at a
+-- time, e. g. from the average pooling or the serializer. The index of a class
+-- is its position in the stream. After the last class, the indices of the
+-- C_TOP_K best classes are sent, best class first. Optionally, each index is
+-- followed by the score. Equal scores are ranked by index, like numpy.argsort().
+
+entity argmax is
+  generic (
+    C_BITWIDTH : integer := 8;
+
+    C_CLASSES      : integer range 1 to 256 := 10;
+    C_TOP_K        : integer range 1 to 256 := 1;
+    C_OUTPUT_SCORE : integer range 0 to 1   := 0
+  );
+  port (
+    isl_clk   : in    std_logic;
+    isl_start : in    std_logic;
+    isl_valid : in    std_logic;
+    -- start and end of frame, valid together with isl_valid
+    isl_sof   : in    std_logic;
+    isl_eof   : in    std_logic;
+    islv_data : in    std_logic_vector(C_BITWIDTH - 1 downto 0);
+    -- index or score
+    oslv_data : out   std_logic_vector(C_BITWIDTH - 1 downto 0);
+    osl_valid : out   std_logic;
+    osl_sof   : out   std_logic;
+    osl_eof   : out   std_logic
+  );
+end entity argmax;
+
+architecture behavioral of argmax is
+
+  constant C_OUTPUT_WORDS : integer := C_TOP_K * (1 + C_OUTPUT_SCORE);
+
+  type t_score_array is array (0 to C_TOP_K - 1) of unsigned(C_BITWIDTH - 1 downto 0);
+
+  type t_index_array is array (0 to C_TOP_K - 1) of integer range 0 to C_CLASSES - 1;
+
+  -- The ranking of the current frame, sorted by score. Unused ranks are at the end.
+  signal a_score   : t_score_array                      := (others => (others => '0'));
+  signal a_index   : t_index_array                      := (others => 0);
+  signal slv_used  : std_logic_vector(0 to C_TOP_K - 1) := (others => '0');
+  signal int_class : integer range 0 to C_CLASSES - 1   := 0;
+
+  -- The ranking of the previous frame, which gets sent.
+  -- Thus the next frame can be ranked, while the result is sent.
+  signal a_output_score : t_score_array                     := (others => (others => '0'));
+  signal a_output_index : t_index_array                     := (others => 0);
+  signal int_open_words : integer range 0 to C_OUTPUT_WORDS := 0;
+
+  signal slv_data_out : std_logic_vector(C_BITWIDTH - 1 downto 0) := (others => '0');
+  signal sl_valid_out : std_logic                                 := '0';
+  signal sl_sof_out   : std_logic                                 := '0';
+  signal sl_eof_out   : std_logic                                 := '0';
+
+begin
+
+  assert C_TOP_K <= C_CLASSES
+    report "C_TOP_K exceeds the number of classes"
+    severity failure;
+  assert C_CLASSES <= 2 ** C_BITWIDTH
+    report "class index doesn't fit in C_BITWIDTH"
+    severity failure;
+
+  -------------------------------------------------------
+  -- Process: Ranking
+  -- Each new score gets inserted in a single cycle. All ranks with a lower
+  -- score move one rank down. The last rank gets dropped.
+  -------------------------------------------------------
+  proc_ranking : process (isl_clk) is
+
+    variable v_better : std_logic_vector(0 to C_TOP_K - 1);
+    variable v_score  : t_score_array;
+    variable v_index  : t_index_array;
+
+  begin
+
+    if (rising_edge(isl_clk)) then
+      if (isl_start = '1') then
+        int_class <= 0;
+        slv_used  <= (others => '0');
+      elsif (isl_valid = '1') then
+        -- Only a higher score is better. Thus a lower index wins at equal scores.
+        for rank in 0 to C_TOP_K - 1 loop
+
+          if (slv_used(rank) = '0' or unsigned(islv_data) > a_score(rank)) then
+            v_better(rank) := '1';
+          else
+            v_better(rank) := '0';
+          end if;
+
+        end loop;
+
+        v_score := a_score;
+        v_index := a_index;
+
+        for rank in 0 to C_TOP_K - 1 loop
+
+          if (rank = 0) then
+            if (v_better(rank) = '1') then
+              v_score(rank) := unsigned(islv_data);
+              v_index(rank) := int_class;
+            end if;
+          elsif (v_better(rank - 1) = '1') then
+            v_score(rank) := a_score(rank - 1);
+            v_index(rank) := a_index(rank - 1);
+          elsif (v_better(rank) = '1') then
+            v_score(rank) := unsigned(islv_data);
+            v_index(rank) := int_class;
+          end if;
+
+        end loop;
+
+        -- The counter starts again after the end of frame.
+        if (int_class = C_CLASSES - 1 or isl_eof = '1') then
+          assert int_open_words = 0
+            report "frame ended before the previous result was sent"
+            severity failure;
+          a_output_score <= v_score;
+          a_output_index <= v_index;
+          slv_used       <= (others => '0');
+          int_class      <= 0;
+        else
+          a_score   <= v_score;
+          a_index   <= v_index;
+          slv_used  <= '1' & slv_used(0 to slv_used'high - 1);
+          int_class <= int_class + 1;
+        end if;
+      end if;
+    end if;
+
+  end process proc_ranking;
+
+  -------------------------------------------------------
+  -- Process: Output
+  -- The result is sent one word per cycle, starting one cycle after the last class.
+  -------------------------------------------------------
+  proc_output : process (isl_clk) is
+
+    variable v_word : integer range 0 to C_OUTPUT_WORDS - 1;
+    variable v_rank : integer range 0 to C_TOP_K - 1;
+
+  begin
+
+    if (rising_edge(isl_clk)) then
+      sl_valid_out <= '0';
+      sl_sof_out   <= '0';
+      sl_eof_out   <= '0';
+
+      if (isl_start = '1') then
+        int_open_words <= 0;
+      elsif (isl_valid = '1' and (int_class = C_CLASSES - 1 or isl_eof = '1')) then
+        int_open_words <= C_OUTPUT_WORDS;
+      elsif (int_open_words > 0) then
+        v_word := C_OUTPUT_WORDS - int_open_words;
+        v_rank := v_word / (1 + C_OUTPUT_SCORE);
+
+        if (C_OUTPUT_SCORE = 1 and v_word mod 2 = 1) then
+          slv_data_out <= std_logic_vector(a_output_score(v_rank));
+        else
+          slv_data_out <= std_logic_vector(to_unsigned(a_output_index(v_rank), C_BITWIDTH));
+        end if;
+
+        sl_valid_out <= '1';
+        if (v_word = 0) then
+          sl_sof_out <= '1';
+        end if;
+        if (int_open_words = 1) then
+          sl_eof_out <= '1';
+        end if;
+        int_open_words <= int_open_words - 1;
+      end if;
+    end if;
+
+  end process proc_output;
+
+  oslv_data <= slv_data_out;
+  osl_valid <= sl_valid_out;
+  osl_sof   <= sl_sof_out;
+  osl_eof   <= sl_eof_out;
+
+end architecture behavioral;
@@ -21,9 +21,14 @@ entity average_pooling is
     isl_clk   : in    std_logic;
     isl_start : in    std_logic;
     isl_valid : in    std_logic;
+    -- start and end of frame, valid together with isl_valid
+    isl_sof   : in    std_logic;
+    isl_eof   : in    std_logic;
     islv_data : in    std_logic_vector(C_CHANNEL * C_BITWIDTH - 1 downto 0);
     oslv_data : out   std_logic_vector(C_BITWIDTH - 1 downto 0);
-    osl_valid : out   std_logic
+    osl_valid : out   std_logic;
+    osl_sof   : out   std_logic;
+    osl_eof   : out   std_logic
   );
 end entity average_pooling;
 
@@ -47,16 +52,24 @@ architecture behavioral of average_pooling is
 
   signal int_open_averages : integer range 0 to C_CHANNEL := 0;
   signal sl_full_image     : std_logic := '0';
+  signal sl_eof            : std_logic := '0';
+  signal sl_frame_end      : std_logic := '0';
+  signal sl_counter_reset  : std_logic := '0';
 
   type t_1d_array is array (natural range <>) of unsigned(C_INTW_SUM - 1 downto 0);
 
-  signal a_ch_buffer : t_1d_array(0 to C_CHANNEL - 1) := (others => (others => '0'));
+  -- The sums of the current frame and of the previous frame, which get averaged.
+  -- Thus the next frame can be summed up, while the averages are calculated.
+  signal a_ch_buffer      : t_1d_array(0 to C_CHANNEL - 1) := (others => (others => '0'));
+  signal a_average_buffer : t_1d_array(0 to C_CHANNEL - 1) := (others => (others => '0'));
 
   signal sl_output_valid : std_logic := '0';
+  signal sl_output_sof   : std_logic := '0';
+  signal sl_output_eof   : std_logic := '0';
 
-  type t_state is (CLEAR_BUFFER, SUM, CALCULATE_AVERAGE, PIPELINE_AVERAGE, OUTPUT_AVERAGE);
+  type t_state is (IDLE, CALCULATE_AVERAGE, PIPELINE_AVERAGE, OUTPUT_AVERAGE);
 
-  signal state : t_state := CLEAR_BUFFER;
+  signal state : t_state := IDLE;
 
 begin
 
@@ -67,63 +80,86 @@ begin
     )
     port map (
       isl_clk     => isl_clk,
-      isl_reset   => isl_start,
+      isl_reset   => sl_counter_reset,
       isl_valid   => isl_valid,
       oint_count  => open,
       osl_maximum => sl_full_image
     );
 
+  -- The counter starts again after the end of frame.
+  sl_counter_reset <= isl_start or (isl_valid and isl_eof);
+  -- The frame ends one cycle after the last pixel, i. e. when the sums are complete.
+  sl_frame_end <= sl_full_image or sl_eof;
+
   -------------------------------------------------------
-  -- Process: Average Pooling (average of each channel)
-  -- Stage 1: sum up the values of every channel
-  -- Stage 2*: multiply with reciprocal
-  -- Stage 3: pipeline DSP output
-  -- Stage 4: resize output
-  -- *Stage 2 is entered when full image except of last pixel (C_IMG_HEIGHT*C_IMG_WIDTH) is loaded
+  -- Process: Sum (sum of each channel)
+  -- The sums get moved to the average buffer at the end of frame. The next frame
+  -- is summed up from the following cycle on, i. e. there is no gap between frames.
   -------------------------------------------------------
-  proc_average_pooling : process (isl_clk) is
+  proc_sum : process (isl_clk) is
+
+    variable v_sum : unsigned(C_INTW_SUM - 1 downto 0);
+
   begin
 
     if (rising_edge(isl_clk)) then
-      sl_output_valid <= '0';
+      sl_eof <= isl_valid and isl_eof;
 
       if (isl_start = '1') then
-        state <= CLEAR_BUFFER;
+        a_ch_buffer <= (others => (others => '0'));
+      else
+        for ch in 0 to C_CHANNEL - 1 loop
+          if (sl_frame_end = '1') then
+            v_sum := (others => '0');
+          else
+            v_sum := a_ch_buffer(ch);
+          end if;
+
+          if (isl_valid = '1') then
+            v_sum := resize(v_sum + unsigned(get_slice(islv_data, ch, C_BITWIDTH)), v_sum'length);
+          end if;
+
+          a_ch_buffer(ch) <= v_sum;
+        end loop;
       end if;
+    end if;
 
-      case state is
+  end process proc_sum;
+
+  -------------------------------------------------------
+  -- Process: Average Pooling (average of each channel)
+  -- Stage 1*: multiply with reciprocal
+  -- Stage 2: pipeline DSP output
+  -- Stage 3: resize output
+  -- *Stage 1 is entered at the end of frame. All averages have to be sent
+  --  before the next frame ends, i. e. a frame needs at least 3 * C_CHANNEL cycles.
+  -------------------------------------------------------
+  proc_average_pooling : process (isl_clk) is
+  begin
 
-        when CLEAR_BUFFER =>
-          a_ch_buffer <= (others => (others => '0'));
-          state       <= SUM;
+    if (rising_edge(isl_clk)) then
+      sl_output_valid <= '0';
+      sl_output_sof   <= '0';
+      sl_output_eof   <= '0';
 
-        when SUM =>
-          if (isl_valid = '1') then
-            for ch in 0 to C_CHANNEL - 1 loop
-              a_ch_buffer(ch) <= resize(a_ch_buffer(ch) +
-                                        unsigned(get_slice(islv_data, ch, C_BITWIDTH)),
-                                        a_ch_buffer(0)'length);
-            end loop;
-          end if;
+      case state is
 
-          if (sl_full_image = '1') then
-            state             <= CALCULATE_AVERAGE;
-            int_open_averages <= C_CHANNEL;
-          end if;
+        when IDLE =>
+          null;
 
         when CALCULATE_AVERAGE =>
           ------------------------DIVIDE OPTIONS---------------------------
           -- 1. simple divide
-          -- ufix_average <= a_ch_buffer(0)/to_ufixed(C_IMG_HEIGHT*C_IMG_WIDTH, 8, 0);
+          -- ufix_average <= a_average_buffer(0)/to_ufixed(C_IMG_HEIGHT*C_IMG_WIDTH, 8, 0);
           --
           -- 2. divide with round properties (round, guard bits)
-          -- ufix_average <= divide(a_ch_buffer(0), to_ufixed(C_IMG_HEIGHT*C_IMG_WIDTH, 8, 0), fixed_truncate, 0)
+          -- ufix_average <= divide(a_average_buffer(0), to_ufixed(C_IMG_HEIGHT*C_IMG_WIDTH, 8, 0), fixed_truncate, 0)
           --
           -- 3. multiply with reciprocal -> best for timing and ressource usage!
-          -- ufix_average <= a_ch_buffer(0) * C_RECIPROCAL;
+          -- ufix_average <= a_average_buffer(0) * C_RECIPROCAL;
           -----------------------------------------------------------------
-          a_ch_buffer  <= a_ch_buffer(a_ch_buffer'high) & a_ch_buffer(0 to a_ch_buffer'high - 1);
-          ufix_average <= to_ufixed(a_ch_buffer(a_ch_buffer'high), C_INTW_SUM - 1, 0) * C_RECIPROCAL;
+          a_average_buffer <= a_average_buffer(a_average_buffer'high) & a_average_buffer(0 to a_average_buffer'high - 1);
+          ufix_average     <= to_ufixed(a_average_buffer(a_average_buffer'high), C_INTW_SUM - 1, 0) * C_RECIPROCAL;
 
           int_open_averages <= int_open_averages - 1;
           state             <= PIPELINE_AVERAGE;
@@ -136,19 +172,51 @@ begin
           slv_average     <= to_slv(resize(ufix_average_d1, C_BITWIDTH - 1, 0, fixed_wrap, fixed_round));
           sl_output_valid <= '1';
 
+          if (int_open_averages = C_CHANNEL - 1) then
+            sl_output_sof <= '1';
+          end if;
+
           if (int_open_averages /= 0) then
             state <= CALCULATE_AVERAGE;
           else
-            state <= CLEAR_BUFFER;
+            sl_output_eof <= '1';
+            state         <= IDLE;
           end if;
 
       end case;
 
+      if (isl_start = '1') then
+        state <= IDLE;
+      elsif (sl_frame_end = '1') then
+        a_average_buffer  <= a_ch_buffer;
+        int_open_averages <= C_CHANNEL;
+        state             <= CALCULATE_AVERAGE;
+      end if;
     end if;
 
   end process proc_average_pooling;
 
+  -- synthesis translate off
+  -- The remaining averages would get dropped, if the next frame ends before all
+  -- averages of the previous frame were sent.
+  proc_overlap_check : process (isl_clk) is
+  begin
+
+    if (rising_edge(isl_clk)) then
+      if (isl_start = '0' and sl_frame_end = '1') then
+        assert state = IDLE or (state = OUTPUT_AVERAGE and int_open_averages = 0)
+          report "frame ended before all averages of the previous frame were sent"
+          severity failure;
+      end if;
+    end if;
+
+  end process proc_overlap_check;
+
+  -- synthesis translate on
+
   oslv_data <= slv_average;
   osl_valid <= sl_output_valid;
+  osl_sof   <= sl_output_sof;
+  osl_eof   <= sl_output_eof;
 
 end architecture behavioral;
@@ -0,0 +1,261 @@
+
+library ieee;
+  use ieee.std_logic_1164.all;
+  use ieee.numeric_std.all;
+
+library bnn_lib;
+
+library util;
+  use util.array_pkg.all;
+  use util.math_pkg.all;
+
+-- Fully connected layer, which processes the flattened image as pixel stream.
+-- The weights of the current pixel are read from rom. The xnor-popcount of each
+-- output channel (i. e. neuron) gets accumulated over all pixels. Thus the image
+-- doesn't need to be buffered. The output of all channel is valid after the last pixel.
+
+entity dense is
+  generic (
+    C_INPUT_CHANNEL           : integer               := 4;
+    C_INPUT_CHANNEL_BITWIDTH  : integer               := 1;
+    C_OUTPUT_CHANNEL          : integer               := 8;
+    C_OUTPUT_CHANNEL_BITWIDTH : integer range 1 to 32 := 1;
+
+    C_IMG_WIDTH  : integer := 4;
+    C_IMG_HEIGHT : integer := 4;
+
+    -- Bit "(pixel * C_INPUT_CHANNEL + ch) * C_OUTPUT_CHANNEL + och" belongs to
+    -- the pixel in stream order, input channel ch and output channel och.
+    -- If the init file is specified, the weights get read from it instead.
+    -- One line contains the weights of one pixel.
+    C_WEIGHTS      : std_logic_vector(C_IMG_WIDTH * C_IMG_HEIGHT * C_INPUT_CHANNEL * C_OUTPUT_CHANNEL - 1 downto 0) := (others => '0');
+    C_WEIGHTS_FILE : string                                                                                        := ""
+  );
+  port (
+    isl_clk   : in    std_logic;
+    isl_start : in    std_logic;
+    isl_valid : in    std_logic;
+    -- start and end of frame, valid together with isl_valid
+    isl_sof   : in    std_logic;
+    isl_eof   : in    std_logic;
+    islv_data : in    std_logic_vector(C_INPUT_CHANNEL * C_INPUT_CHANNEL_BITWIDTH - 1 downto 0);
+    -- islv_threshold is a constant
+    islv_threshold : in    std_logic_vector(C_OUTPUT_CHANNEL * (C_INPUT_CHANNEL_BITWIDTH + log2(C_IMG_WIDTH * C_IMG_HEIGHT * C_INPUT_CHANNEL + 1) + 1) - 1 downto 0);
+    oslv_data      : out   std_logic_vector(C_OUTPUT_CHANNEL * C_OUTPUT_CHANNEL_BITWIDTH - 1 downto 0);
+    osl_valid      : out   std_logic;
+    -- There is only one output per frame. Thus start and end of frame equal the valid signal.
+    osl_sof : out   std_logic;
+    osl_eof : out   std_logic
+  );
+end entity dense;
+
+architecture behavioral of dense is
+
+  constant C_PIXEL_COUNT : integer := C_IMG_WIDTH * C_IMG_HEIGHT;
+  constant C_ADDR_WIDTH  : integer := maximum(1, log2(C_PIXEL_COUNT));
+
+  type t_slv_array_1d is array(natural range <>) of std_logic_vector;
+
+  -- bitwidth of the xnor-popcount of one pixel and of the whole image
+  constant C_POST_CONVOLUTION_BITWIDTH : integer := C_INPUT_CHANNEL_BITWIDTH + log2(C_INPUT_CHANNEL + 1) + 1;
+  constant C_POST_DENSE_BITWIDTH       : integer := C_INPUT_CHANNEL_BITWIDTH + log2(C_PIXEL_COUNT * C_INPUT_CHANNEL + 1) + 1;
+
+  -- Index of the current pixel. The index of the next cycle is needed to read the rom in time.
+  signal int_pixel      : integer range 0 to C_PIXEL_COUNT - 1 := 0;
+  signal int_pixel_next : integer range 0 to C_PIXEL_COUNT - 1 := 0;
+  signal int_pixel_sum  : integer range 0 to C_PIXEL_COUNT - 1 := 0;
+
+  signal slv_weights_rom : std_logic_vector(C_INPUT_CHANNEL * C_OUTPUT_CHANNEL - 1 downto 0);
+  signal a_weights       : t_slv_array_1d(0 to C_OUTPUT_CHANNEL - 1)(C_INPUT_CHANNEL - 1 downto 0);
+
+  signal slv_valid_convolution : std_logic_vector(C_OUTPUT_CHANNEL - 1 downto 0);
+  signal sl_eof_convolution    : std_logic := '0';
+  signal a_data_convolution    : t_slv_array_1d(0 to C_OUTPUT_CHANNEL - 1)(C_POST_CONVOLUTION_BITWIDTH - 1 downto 0);
+
+  signal a_sum        : t_slv_array_1d(0 to C_OUTPUT_CHANNEL - 1)(C_POST_DENSE_BITWIDTH - 1 downto 0) := (others => (others => '0'));
+  signal sl_valid_sum : std_logic := '0';
+  signal a_data_sum   : t_slv_array_1d(0 to C_OUTPUT_CHANNEL - 1)(C_POST_DENSE_BITWIDTH - 1 downto 0);
+  signal a_threshold  : t_slv_array_1d(0 to C_OUTPUT_CHANNEL - 1)(C_POST_DENSE_BITWIDTH - 1 downto 0);
+
+  function is_batch_normalization_unsigned return integer is
+  begin
+
+    if (C_INPUT_CHANNEL_BITWIDTH = 1) then
+      return 1;
+    end if;
+
+    return 0;
+  end function is_batch_normalization_unsigned;
+
+  -- Bitwidth of the class score (i. e. without batch normalization), which covers
+  -- the whole value range. The xnor-popcount of binary input is unsigned.
+  function get_score_bitwidth return integer is
+  begin
+
+    if (C_INPUT_CHANNEL_BITWIDTH = 1) then
+      return log2(C_PIXEL_COUNT * C_INPUT_CHANNEL + 1);
+    end if;
+
+    return C_POST_DENSE_BITWIDTH;
+  end function get_score_bitwidth;
+
+  -- Resize the sum to the class score. The xnor-popcount of binary input is unsigned.
+  -- Resizing it as signed would drop the most significant bit.
+  function resize_score (slv_sum : std_logic_vector) return std_logic_vector is
+  begin
+
+    if (C_INPUT_CHANNEL_BITWIDTH = 1) then
+      return std_logic_vector(resize(unsigned(slv_sum), C_OUTPUT_CHANNEL_BITWIDTH));
+    end if;
+
+    return std_logic_vector(resize(signed(slv_sum), C_OUTPUT_CHANNEL_BITWIDTH));
+  end function resize_score;
+
+  signal slv_valid_batch_normalization : std_logic_vector(C_OUTPUT_CHANNEL - 1 downto 0);
+  signal slv_data_batch_normalization  : std_logic_vector(oslv_data'range);
+  signal a_data_batch_normalization    : t_slv_array_1d(0 to C_OUTPUT_CHANNEL - 1)(C_OUTPUT_CHANNEL_BITWIDTH - 1 downto 0);
+
+begin
+
+  int_pixel_next <= 0 when isl_start = '1' else
+                    int_pixel when isl_valid = '0' else
+                    0 when int_pixel = C_PIXEL_COUNT - 1 or isl_eof = '1' else
+                    int_pixel + 1;
+
+  proc_pixel_counter : process (isl_clk) is
+  begin
+
+    if (rising_edge(isl_clk)) then
+      int_pixel <= int_pixel_next;
+    end if;
+
+  end process proc_pixel_counter;
+
+  -- one cycle delay, i. e. the rom output matches the current pixel
+  i_weights_rom : entity util.brom
+    generic map (
+      C_DATA_WIDTH => slv_weights_rom'length,
+      C_ADDR_WIDTH => C_ADDR_WIDTH,
+      C_INIT_VALUE => std_logic_vector(resize(unsigned(C_WEIGHTS), 2 ** C_ADDR_WIDTH * slv_weights_rom'length)),
+      C_INIT_FILE  => C_WEIGHTS_FILE
+    )
+    port map (
+      isl_clk   => isl_clk,
+      islv_addr => std_logic_vector(to_unsigned(int_pixel_next, C_ADDR_WIDTH)),
+      oslv_data => slv_weights_rom
+    );
+
+  gen_convolution : for output_channel in 0 to C_OUTPUT_CHANNEL - 1 generate
+    -- output channel increments fastest
+    a_weights(output_channel) <= get_fastest_increment(slv_weights_rom, output_channel, C_OUTPUT_CHANNEL);
+
+    -- xnor-popcount of a single pixel, i. e. a 1x1 convolution
+    i_convolution : entity bnn_lib.convolution
+      generic map (
+        C_KERNEL_SIZE            => 1,
+        C_INPUT_CHANNEL          => C_INPUT_CHANNEL,
+        C_INPUT_CHANNEL_BITWIDTH => C_INPUT_CHANNEL_BITWIDTH
+      )
+      port map (
+        isl_clk      => isl_clk,
+        isl_valid    => isl_valid,
+        islv_data    => islv_data,
+        islv_weights => a_weights(output_channel),
+        oslv_data    => a_data_convolution(output_channel),
+        osl_valid    => slv_valid_convolution(output_channel)
+      );
+
+  end generate gen_convolution;
+
+  -- The pixels keep their order. Thus the end of frame can be queued. The latency of the
+  -- 1x1 convolution is at most log2(C_INPUT_CHANNEL) + 4 cycles.
+  i_frame_queue : entity util.frame_queue
+    generic map (
+      C_DEPTH => log2(C_INPUT_CHANNEL) + 4
+    )
+    port map (
+      isl_clk   => isl_clk,
+      isl_reset => isl_start,
+      isl_push  => isl_valid,
+      isl_sof   => isl_sof,
+      isl_eof   => isl_eof,
+      isl_pop   => slv_valid_convolution(0),
+      osl_sof   => open,
+      osl_eof   => sl_eof_convolution
+    );
+
+  proc_accumulate : process (isl_clk) is
+
+    variable v_sum : signed(C_POST_DENSE_BITWIDTH - 1 downto 0);
+
+  begin
+
+    if (rising_edge(isl_clk)) then
+      sl_valid_sum <= '0';
+
+      if (isl_start = '1') then
+        int_pixel_sum <= 0;
+        a_sum         <= (others => (others => '0'));
+      elsif (slv_valid_convolution(0) = '1') then
+        for output_channel in 0 to C_OUTPUT_CHANNEL - 1 loop
+          v_sum := signed(a_sum(output_channel)) + resize(signed(a_data_convolution(output_channel)), C_POST_DENSE_BITWIDTH);
+
+          if (int_pixel_sum = C_PIXEL_COUNT - 1 or sl_eof_convolution = '1') then
+            a_data_sum(output_channel) <= std_logic_vector(v_sum);
+            a_sum(output_channel)      <= (others => '0');
+          else
+            a_sum(output_channel) <= std_logic_vector(v_sum);
+          end if;
+        end loop;
+
+        if (int_pixel_sum = C_PIXEL_COUNT - 1 or sl_eof_convolution = '1') then
+          int_pixel_sum <= 0;
+          sl_valid_sum  <= '1';
+        else
+          int_pixel_sum <= int_pixel_sum + 1;
+        end if;
+      end if;
+    end if;
+
+  end process proc_accumulate;
+
+  gen_output : for output_channel in 0 to C_OUTPUT_CHANNEL - 1 generate
+
+    gen_batch_normalization : if C_OUTPUT_CHANNEL_BITWIDTH = 1 generate
+      -- TODO: output channel increments fastest, not slowest
+      a_threshold(output_channel) <= get_slice(islv_threshold, output_channel, C_POST_DENSE_BITWIDTH);
+
+      i_batch_normalization : entity bnn_lib.batch_normalization
+        generic map (
+          C_POST_CONVOLUTION_BITWIDTH => C_POST_DENSE_BITWIDTH,
+          C_UNSIGNED                  => is_batch_normalization_unsigned
+        )
+        port map (
+          isl_clk        => isl_clk,
+          isl_valid      => sl_valid_sum,
+          islv_data      => a_data_sum(output_channel),
+          islv_threshold => a_threshold(output_channel),
+          oslv_data      => a_data_batch_normalization(output_channel),
+          osl_valid      => slv_valid_batch_normalization(output_channel)
+        );
+
+      slv_data_batch_normalization((output_channel + 1) * C_OUTPUT_CHANNEL_BITWIDTH - 1 downto output_channel * C_OUTPUT_CHANNEL_BITWIDTH) <= a_data_batch_normalization(output_channel);
+    else generate
+      -- The score must not wrap. Negative scores of multi bit input get sign extended.
+      assert C_OUTPUT_CHANNEL_BITWIDTH >= get_score_bitwidth
+        report "required bitwidth for the class score: " & to_string(get_score_bitwidth) &
+               ", actual bitwidth: " & to_string(C_OUTPUT_CHANNEL_BITWIDTH)
+        severity failure;
+
+      slv_data_batch_normalization((output_channel + 1) * C_OUTPUT_CHANNEL_BITWIDTH - 1 downto output_channel * C_OUTPUT_CHANNEL_BITWIDTH) <= resize_score(a_data_sum(output_channel));
+      slv_valid_batch_normalization(output_channel)                                                                                        <= sl_valid_sum;
+    end generate gen_batch_normalization;
+
+  end generate gen_output;
+
+  oslv_data <= slv_data_batch_normalization;
+  osl_valid <= slv_valid_batch_normalization(0);
+  osl_sof   <= slv_valid_batch_normalization(0);
+  osl_eof   <= slv_valid_batch_normalization(0);
+
+end architecture behavioral;
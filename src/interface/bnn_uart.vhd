@@ -2,15 +2,23 @@
 
 library ieee;
   use ieee.std_logic_1164.all;
+  use ieee.numeric_std.all;
 
 library bnn_lib;
+  use bnn_lib.bnn_pkg.all;
 
 library uart_lib;
 
+library util;
+
 entity bnn_uart is
   generic (
     C_BITS        : integer range 5 to 8 := 8;
-    C_QUARTZ_FREQ : integer              := 25000000 -- Hz
+    C_QUARTZ_FREQ : integer              := 25000000; -- Hz
+
+    -- Bitwidth of the bnn input. It has to match the generated bnn.
+    -- Smaller bitwidths are packed into one uart word by the host.
+    C_INPUT_BITWIDTH : integer range 1 to 8 := 8
   );
   port (
     clk_25mhz : in    std_logic;
@@ -36,17 +44,44 @@ architecture behavioral of bnn_uart is
   signal slv_data_out_uart_rx : std_logic_vector(C_BITS - 1 downto 0) := (others => '0');
   signal sl_ready_uart_tx     : std_logic := '0';
 
+  -- unpacking
+  -- The values of a word are spread evenly over the transmission time of the next word
+  -- (start bit, data bits, stop bit). I. e. the bnn input isn't bursty.
+  constant C_VALUES_PER_WORD : integer := C_BITS / C_INPUT_BITWIDTH;
+  constant C_UNPACK_INTERVAL : integer := (C_BITS + 2) * C_CYCLES_PER_BIT / C_VALUES_PER_WORD;
+
+  signal sl_valid_in_bnn : std_logic := '0';
+  signal sl_sof_in_bnn   : std_logic := '0';
+  signal sl_eof_in_bnn   : std_logic := '0';
+  signal slv_data_in_bnn : std_logic_vector(C_INPUT_BITWIDTH - 1 downto 0) := (others => '0');
+
   -- BNN
   signal sl_finish : std_logic := '0';
 
   signal sl_valid_out_bnn : std_logic := '0';
-  signal slv_data_out_bnn : std_logic_vector(C_BITS - 1 downto 0) := (others => '0');
+  signal slv_data_out_bnn : std_logic_vector(C_OUTPUT_BITWIDTH - 1 downto 0) := (others => '0');
 
   -- glue
+  -- All words of an image get buffered, i. e. all class scores or the best classes.
+  -- C_OUTPUT_WORDS and C_OUTPUT_BITWIDTH are defined by the generated bnn.
+  -- Wide output words are split into several uart words, the least significant first.
+  constant C_UART_WORDS_PER_OUTPUT : integer := (C_OUTPUT_BITWIDTH + C_BITS - 1) / C_BITS;
+
+  type t_output_array is array(natural range <>) of std_logic_vector(C_BITS - 1 downto 0);
 
-  type t_output_array is array(0 to 9) of std_logic_vector(C_BITS - 1 downto 0);
+  function split_output_word (slv_data : std_logic_vector) return t_output_array is
+    variable v_data  : std_logic_vector(C_UART_WORDS_PER_OUTPUT * C_BITS - 1 downto 0);
+    variable v_words : t_output_array(0 to C_UART_WORDS_PER_OUTPUT - 1);
+  begin
+
+    v_data := std_logic_vector(resize(unsigned(slv_data), v_data'length));
+    for word in v_words'range loop
+      v_words(word) := v_data((word + 1) * C_BITS - 1 downto word * C_BITS);
+    end loop;
+    return v_words;
+  end function split_output_word;
 
-  signal   a_output_buffer         : t_output_array := (others => (others => '0'));
+  signal   a_output_buffer         : t_output_array(0 to C_OUTPUT_WORDS * C_UART_WORDS_PER_OUTPUT - 1) := (others => (others => '0'));
   signal   sl_valid_buffer         : std_logic := '0';
   signal   int_valid_buffer_values : integer range 0 to a_output_buffer'length := 0;
   constant C_ZEROS                 : std_logic_vector(C_BITS - 1 downto 0) := (others => '0');
@@ -92,14 +127,89 @@ begin
       osl_valid => sl_valid_out_uart_rx
     );
 
+  gen_input : if C_VALUES_PER_WORD > 1 generate
+
+    signal sl_valid_unpacked : std_logic := '0';
+    signal sl_last_of_word   : std_logic := '0';
+    signal slv_data_unpacked : std_logic_vector(C_INPUT_BITWIDTH - 1 downto 0) := (others => '0');
+
+    -- C_INPUT_VALUES (height * width * channel) is defined by the generated bnn.
+    -- It is needed to drop the padding of the last word.
+    signal int_input_value : integer range 0 to C_INPUT_VALUES - 1 := 0;
+    signal sl_padding      : std_logic := '0';
+
+  begin
+
+    -- The first value is in the least significant bits of the uart word.
+    -- The end of frame input marks the last value of each word.
+    i_unpack : entity util.serializer
+      generic map (
+        C_DATA_COUNT      => C_VALUES_PER_WORD,
+        C_DATA_BITWIDTH   => C_INPUT_BITWIDTH,
+        C_OUTPUT_INTERVAL => C_UNPACK_INTERVAL
+      )
+      port map (
+        isl_clk   => isl_clk,
+        isl_valid => sl_valid_out_uart_rx,
+        isl_sof   => '0',
+        isl_eof   => '1',
+        islv_data => slv_data_out_uart_rx(C_VALUES_PER_WORD * C_INPUT_BITWIDTH - 1 downto 0),
+        oslv_data => slv_data_unpacked,
+        osl_valid => sl_valid_unpacked,
+        osl_sof   => open,
+        osl_eof   => sl_last_of_word
+      );
+
+    -- Each image starts with a new word. The remaining values of the last word are padding.
+    proc_frame : process (isl_clk) is
+    begin
+
+      if (rising_edge(isl_clk)) then
+        if (isl_start = '1') then
+          int_input_value <= 0;
+          sl_padding      <= '0';
+        elsif (sl_valid_unpacked = '1') then
+          if (sl_padding = '1') then
+            sl_padding <= not sl_last_of_word;
+          elsif (int_input_value = C_INPUT_VALUES - 1) then
+            int_input_value <= 0;
+            sl_padding      <= not sl_last_of_word;
+          else
+            int_input_value <= int_input_value + 1;
+          end if;
+        end if;
+      end if;
+
+    end process proc_frame;
+
+    sl_valid_in_bnn <= sl_valid_unpacked and not sl_padding;
+    sl_sof_in_bnn   <= '1' when int_input_value = 0 else
+                       '0';
+    sl_eof_in_bnn   <= '1' when int_input_value = C_INPUT_VALUES - 1 else
+                       '0';
+    slv_data_in_bnn <= slv_data_unpacked;
+  else generate
+    -- The uart stream doesn't mark the frames. The layers count the pixels instead.
+    sl_valid_in_bnn <= sl_valid_out_uart_rx;
+    sl_sof_in_bnn   <= '0';
+    sl_eof_in_bnn   <= '0';
+    slv_data_in_bnn <= slv_data_out_uart_rx(C_INPUT_BITWIDTH - 1 downto 0);
+  end generate gen_input;
+
   i_bnn : entity bnn_lib.bnn
+    generic map (
+      C_INPUT_CHANNEL_BITWIDTH => C_INPUT_BITWIDTH
+    )
     port map (
       isl_clk    => isl_clk,
       isl_start  => isl_start,
-      isl_valid  => sl_valid_out_uart_rx,
-      islv_data  => slv_data_out_uart_rx,
+      isl_valid  => sl_valid_in_bnn,
+      isl_sof    => sl_sof_in_bnn,
+      isl_eof    => sl_eof_in_bnn,
+      islv_data  => slv_data_in_bnn,
       oslv_data  => slv_data_out_bnn,
       osl_valid  => sl_valid_out_bnn,
+      osl_rdy    => open,
       osl_finish => sl_finish
     );
 
@@ -120,8 +230,8 @@ begin
 
         when FILL =>
           if (sl_valid_out_bnn = '1') then
-            a_output_buffer         <= a_output_buffer(1 to a_output_buffer'high) & slv_data_out_bnn;
-            int_valid_buffer_values <= int_valid_buffer_values + 1;
+            a_output_buffer         <= a_output_buffer(C_UART_WORDS_PER_OUTPUT to a_output_buffer'high) & split_output_word(slv_data_out_bnn);
+            int_valid_buffer_values <= int_valid_buffer_values + C_UART_WORDS_PER_OUTPUT;
           end if;
 
           if (int_valid_buffer_values = a_output_buffer'length) then
@@ -2,14 +2,21 @@
 library ieee;
   use ieee.std_logic_1164.all;
   use ieee.numeric_std.all;
+  use std.textio.all;
+
+-- The rom gets initialized either by C_INIT_VALUE or by C_INIT_FILE.
+-- The init file contains one hexadecimal word per line, starting at address 0.
+-- The output is registered to allow the mapping to block ram.
 
 entity brom is
   generic (
-    C_DATA_WIDTH : integer                                                    := 8;
-    C_ADDR_WIDTH : integer                                                    := 9;
-    C_INIT_VALUE : std_logic_vector(C_ADDR_WIDTH * C_DATA_WIDTH - 1 downto 0) := (others => '1')
+    C_DATA_WIDTH : integer                                                         := 8;
+    C_ADDR_WIDTH : integer                                                         := 9;
+    C_INIT_VALUE : std_logic_vector(2 ** C_ADDR_WIDTH * C_DATA_WIDTH - 1 downto 0) := (others => '1');
+    C_INIT_FILE  : string                                                          := ""
   );
   port (
+    isl_clk   : in    std_logic;
     islv_addr : in    std_logic_vector(C_ADDR_WIDTH - 1 downto 0);
     oslv_data : out   std_logic_vector(C_DATA_WIDTH - 1 downto 0)
   );
@@ -17,17 +24,48 @@ end entity brom;
 
 architecture behavioral of brom is
 
-begin
+  type t_rom is array(0 to 2 ** C_ADDR_WIDTH - 1) of std_logic_vector(C_DATA_WIDTH - 1 downto 0);
+
+  impure function init_rom return t_rom is
+    file     f_init : text;
+    variable v_line : line;
+    variable a_rom  : t_rom;
+  begin
+
+    a_rom := (others => (others => '0'));
 
-  proc_bram : process (islv_addr) is
+    if (C_INIT_FILE = "") then
+      for addr in a_rom'range loop
+        a_rom(addr) := C_INIT_VALUE((addr + 1) * C_DATA_WIDTH - 1 downto addr * C_DATA_WIDTH);
+      end loop;
+    else
+      file_open(f_init, C_INIT_FILE, read_mode);
+      for addr in a_rom'range loop
+        exit when endfile(f_init);
+        readline(f_init, v_line);
+        hread(v_line, a_rom(addr));
+      end loop;
+      file_close(f_init);
+    end if;
 
-    variable int_addr : integer range 0 to 2 ** C_ADDR_WIDTH - 1;
+    return a_rom;
+  end function init_rom;
 
+  constant C_ROM : t_rom := init_rom;
+
+  signal slv_data : std_logic_vector(C_DATA_WIDTH - 1 downto 0) := C_ROM(0);
+
+begin
+
+  proc_brom : process (isl_clk) is
   begin
 
-    int_addr := to_integer(unsigned(islv_addr));
-    oslv_data <= C_INIT_VALUE((int_addr + 1) * C_DATA_WIDTH - 1 downto int_addr * C_DATA_WIDTH);
+    if (rising_edge(isl_clk)) then
+      slv_data <= C_ROM(to_integer(unsigned(islv_addr)));
+    end if;
+
+  end process proc_brom;
 
-  end process proc_bram;
+  oslv_data <= slv_data;
 
 end architecture behavioral;
@@ -9,9 +9,14 @@ entity deserializer is
   port (
     isl_clk   : in    std_logic;
     isl_valid : in    std_logic;
+    -- start and end of frame, valid together with isl_valid
+    isl_sof   : in    std_logic;
+    isl_eof   : in    std_logic;
     islv_data : in    std_logic_vector(C_DATA_BITWIDTH - 1 downto 0);
     oslv_data : out   std_logic_vector(C_DATA_COUNT * C_DATA_BITWIDTH - 1 downto 0);
-    osl_valid : out   std_logic
+    osl_valid : out   std_logic;
+    osl_sof   : out   std_logic;
+    osl_eof   : out   std_logic
   );
 end entity deserializer;
 
@@ -21,6 +26,11 @@ architecture rtl of deserializer is
   signal slv_data_out    : std_logic_vector(oslv_data'range) := (others => '0');
   signal sl_valid_out    : std_logic := '0';
 
+  -- The start of frame belongs to the first and the end of frame to the last input.
+  signal sl_sof     : std_logic := '0';
+  signal sl_sof_out : std_logic := '0';
+  signal sl_eof_out : std_logic := '0';
+
 begin
 
   proc_deserializer : process (isl_clk) is
@@ -28,15 +38,24 @@ begin
 
     if (rising_edge(isl_clk)) then
       sl_valid_out <= '0';
+      sl_sof_out   <= '0';
+      sl_eof_out   <= '0';
 
       if (isl_valid = '1') then
         slv_data_out <= islv_data & slv_data_out(slv_data_out'high downto C_DATA_BITWIDTH);
 
-        if (int_input_count /= C_DATA_COUNT - 1) then
+        if (int_input_count = 0) then
+          sl_sof <= isl_sof;
+        end if;
+
+        -- The end of frame completes the output, too.
+        if (int_input_count /= C_DATA_COUNT - 1 and isl_eof = '0') then
           int_input_count <= int_input_count + 1;
         else
           int_input_count <= 0;
           sl_valid_out    <= '1';
+          sl_sof_out      <= isl_sof when int_input_count = 0 else sl_sof;
+          sl_eof_out      <= isl_eof;
         end if;
       end if;
     end if;
@@ -45,5 +64,7 @@ begin
 
   osl_valid <= sl_valid_out;
   oslv_data <= slv_data_out;
+  osl_sof   <= sl_sof_out;
+  osl_eof   <= sl_eof_out;
 
 end architecture rtl;
@@ -0,0 +1,72 @@
+
+library ieee;
+  use ieee.std_logic_1164.all;
+
+-- The frame flags (start and end of frame) take the same path as the data
+-- through a pipeline. The pipeline has to keep the order of the data and
+-- C_DEPTH has to be at least the number of data inside the pipeline.
+-- The flags get pushed with the pipeline input and popped with the pipeline output.
+-- The output flags are valid in the same cycle as isl_pop.
+
+entity frame_queue is
+  generic (
+    C_DEPTH : integer range 1 to 64 := 8
+  );
+  port (
+    isl_clk   : in    std_logic;
+    isl_reset : in    std_logic;
+    isl_push  : in    std_logic;
+    isl_sof   : in    std_logic;
+    isl_eof   : in    std_logic;
+    isl_pop   : in    std_logic;
+    osl_sof   : out   std_logic;
+    osl_eof   : out   std_logic
+  );
+end entity frame_queue;
+
+architecture behavioral of frame_queue is
+
+  -- The newest flags are at index 0, the oldest at index int_count - 1.
+  signal slv_sof   : std_logic_vector(C_DEPTH - 1 downto 0) := (others => '0');
+  signal slv_eof   : std_logic_vector(C_DEPTH - 1 downto 0) := (others => '0');
+  signal int_count : integer range 0 to C_DEPTH             := 0;
+
+begin
+
+  proc_queue : process (isl_clk) is
+
+    variable v_count : integer range -1 to C_DEPTH + 1;
+
+  begin
+
+    if (rising_edge(isl_clk)) then
+      if (isl_reset = '1') then
+        int_count <= 0;
+      else
+        v_count := int_count;
+
+        if (isl_pop = '1') then
+          v_count := v_count - 1;
+        end if;
+
+        if (isl_push = '1') then
+          slv_sof <= slv_sof(slv_sof'high - 1 downto 0) & isl_sof;
+          slv_eof <= slv_eof(slv_eof'high - 1 downto 0) & isl_eof;
+          v_count := v_count + 1;
+        end if;
+
+        assert v_count >= 0 and v_count <= C_DEPTH
+          report "frame queue underflow or overflow"
+          severity failure;
+        int_count <= v_count;
+      end if;
+    end if;
+
+  end process proc_queue;
+
+  osl_sof <= slv_sof(int_count - 1) when isl_pop = '1' and int_count > 0 else
+             '0';
+  osl_eof <= slv_eof(int_count - 1) when isl_pop = '1' and int_count > 0 else
+             '0';
+
+end architecture behavioral;
@@ -7,14 +7,21 @@ library util;
 entity serializer is
   generic (
     C_DATA_COUNT    : integer := 4;
-    C_DATA_BITWIDTH : integer := 8
+    C_DATA_BITWIDTH : integer := 8;
+    -- cycles between two outputs
+    C_OUTPUT_INTERVAL : integer := 1
   );
   port (
     isl_clk   : in    std_logic;
     isl_valid : in    std_logic;
+    -- start and end of frame, valid together with isl_valid
+    isl_sof   : in    std_logic;
+    isl_eof   : in    std_logic;
     islv_data : in    std_logic_vector(C_DATA_COUNT * C_DATA_BITWIDTH - 1 downto 0);
     oslv_data : out   std_logic_vector(C_DATA_BITWIDTH - 1 downto 0);
-    osl_valid : out   std_logic
+    osl_valid : out   std_logic;
+    osl_sof   : out   std_logic;
+    osl_eof   : out   std_logic
   );
 end entity serializer;
 
@@ -25,6 +32,12 @@ architecture rtl of serializer is
   signal a_data : t_data;
 
   signal int_output_valid_cycles : integer range 0 to C_DATA_COUNT;
+  signal int_interval            : integer range 0 to C_OUTPUT_INTERVAL - 1 := 0;
+  signal sl_output               : std_logic;
+
+  -- The start of frame belongs to the first and the end of frame to the last output.
+  signal sl_sof : std_logic := '0';
+  signal sl_eof : std_logic := '0';
 
 begin
 
@@ -32,26 +45,39 @@ begin
   begin
 
     if (rising_edge(isl_clk)) then
-      a_data <= a_data(1 to a_data'high) & a_data(0);
+      if (int_output_valid_cycles > 0) then
+        if (int_interval = C_OUTPUT_INTERVAL - 1) then
+          int_interval            <= 0;
+          a_data                  <= a_data(1 to a_data'high) & a_data(0);
+          int_output_valid_cycles <= int_output_valid_cycles - 1;
+        else
+          int_interval <= int_interval + 1;
+        end if;
+      end if;
 
       if (isl_valid = '1') then
         assert int_output_valid_cycles = 0
           severity failure;
         int_output_valid_cycles <= C_DATA_COUNT;
+        int_interval            <= 0;
+        sl_sof                  <= isl_sof;
+        sl_eof                  <= isl_eof;
         for i in a_data'range loop
           a_data(i)             <= get_slice(islv_data, i, C_DATA_BITWIDTH);
         end loop;
       end if;
-
-      if (int_output_valid_cycles > 0) then
-        int_output_valid_cycles <= int_output_valid_cycles - 1;
-      end if;
     end if;
 
   end process proc_serializer;
 
-  osl_valid <= '1' when int_output_valid_cycles > 0 else
+  sl_output <= '1' when int_output_valid_cycles > 0 and int_interval = 0 else
                '0';
+
+  osl_valid <= sl_output;
   oslv_data <= a_data(0);
+  osl_sof   <= sl_sof when sl_output = '1' and int_output_valid_cycles = C_DATA_COUNT else
+               '0';
+  osl_eof   <= sl_eof when sl_output = '1' and int_output_valid_cycles = 1 else
+               '0';
 
 end architecture rtl;
@@ -22,32 +22,57 @@ entity window_convolution_activation is
     C_OUTPUT_CHANNEL_BITWIDTH : integer range 1 to 32 := 1;
 
     C_IMG_WIDTH  : integer := 4;
-    C_IMG_HEIGHT : integer := 4
+    C_IMG_HEIGHT : integer := 4;
+
+    -- Padding of each side. The pad value is the same for each input channel.
+    -- For binary input, 0 corresponds to -1 and 1 to +1.
+    C_PAD       : integer range 0 to 3 := 0;
+    C_PAD_VALUE : integer              := 0;
+
+    -- How often the hardware gets reused for each window. The window gets repeated
+    -- and C_OUTPUT_CHANNEL / C_FOLDING output channel are computed per cycle.
+    C_FOLDING : integer range 1 to 512 := 1;
+
+    -- If the init files are specified, the weights and thresholds get read from rom.
+    -- One line contains the weights (thresholds) of one output channel slice.
+    C_WEIGHTS_FILE    : string := "";
+    C_THRESHOLDS_FILE : string := ""
   );
   port (
     isl_clk   : in    std_logic;
     isl_start : in    std_logic;
     isl_valid : in    std_logic;
+    -- start and end of frame, valid together with isl_valid
+    isl_sof   : in    std_logic;
+    isl_eof   : in    std_logic;
     islv_data : in    std_logic_vector(C_INPUT_CHANNEL * C_INPUT_CHANNEL_BITWIDTH - 1 downto 0);
-    -- islv_weights and islv_threshold are constants
+    -- islv_weights and islv_threshold are constants, if no init files are used
     islv_weights   : in    std_logic_vector(C_KERNEL_SIZE * C_KERNEL_SIZE * C_INPUT_CHANNEL * C_OUTPUT_CHANNEL - 1 downto 0);
     islv_threshold : in    std_logic_vector(C_OUTPUT_CHANNEL * (C_INPUT_CHANNEL_BITWIDTH + log2(C_KERNEL_SIZE ** 2 * C_INPUT_CHANNEL + 1) + 1) - 1 downto 0);
     oslv_data      : out   std_logic_vector(C_OUTPUT_CHANNEL * C_OUTPUT_CHANNEL_BITWIDTH - 1 downto 0);
-    osl_valid      : out   std_logic
+    osl_valid      : out   std_logic;
+    osl_sof        : out   std_logic;
+    osl_eof        : out   std_logic;
+    osl_rdy        : out   std_logic
   );
 end entity window_convolution_activation;
 
 architecture behavioral of window_convolution_activation is
 
+  -- number of output channel, which get computed in parallel
+  constant C_PARALLEL_OUTPUT_CHANNEL : integer := C_OUTPUT_CHANNEL / C_FOLDING;
+
   signal sl_valid_window_ctrl : std_logic := '0';
+  signal sl_sof_window_ctrl   : std_logic := '0';
+  signal sl_eof_window_ctrl   : std_logic := '0';
   signal slv_data_window_ctrl : std_logic_vector(C_KERNEL_SIZE ** 2 * C_INPUT_CHANNEL * C_INPUT_CHANNEL_BITWIDTH - 1 downto 0);
 
-  signal slv_valid_convolution : std_logic_vector(C_OUTPUT_CHANNEL - 1 downto 0);
+  signal slv_valid_convolution : std_logic_vector(C_PARALLEL_OUTPUT_CHANNEL - 1 downto 0);
 
   type t_slv_array_1d is array(natural range <>) of std_logic_vector;
 
   constant C_POST_CONVOLUTION_BITWIDTH : integer := C_INPUT_CHANNEL_BITWIDTH + log2(C_KERNEL_SIZE ** 2 * C_INPUT_CHANNEL + 1) + 1;
-  signal   a_data_convolution          : t_slv_array_1d(0 to C_OUTPUT_CHANNEL - 1)(C_POST_CONVOLUTION_BITWIDTH - 1 downto 0);
+  signal   a_data_convolution          : t_slv_array_1d(0 to C_PARALLEL_OUTPUT_CHANNEL - 1)(C_POST_CONVOLUTION_BITWIDTH - 1 downto 0);
 
   function is_batch_normalization_unsigned return integer is
   begin
@@ -59,25 +84,72 @@ architecture behavioral of window_convolution_activation is
     return 0;
   end function is_batch_normalization_unsigned;
 
-  signal slv_valid_batch_normalization : std_logic_vector(C_OUTPUT_CHANNEL - 1 downto 0);
-  signal slv_data_batch_normalization  : std_logic_vector(C_OUTPUT_CHANNEL * C_OUTPUT_CHANNEL_BITWIDTH - 1 downto 0);
-  signal a_data_batch_normalization    : t_slv_array_1d(0 to C_OUTPUT_CHANNEL - 1)(C_OUTPUT_CHANNEL_BITWIDTH - 1 downto 0);
+  signal slv_valid_batch_normalization : std_logic_vector(C_PARALLEL_OUTPUT_CHANNEL - 1 downto 0);
+  signal slv_data_batch_normalization  : std_logic_vector(C_PARALLEL_OUTPUT_CHANNEL * C_OUTPUT_CHANNEL_BITWIDTH - 1 downto 0);
+  signal a_data_batch_normalization    : t_slv_array_1d(0 to C_PARALLEL_OUTPUT_CHANNEL - 1)(C_OUTPUT_CHANNEL_BITWIDTH - 1 downto 0);
 
   signal sl_valid_out : std_logic := '0';
   signal slv_data_out : std_logic_vector(oslv_data'range);
 
+  -- Frame flags of the windows inside the convolution and batch normalization pipeline.
+  -- The pipeline latency is at most log2(C_KERNEL_SIZE ** 2 * C_INPUT_CHANNEL) + 4 cycles.
+  -- At most one window enters per cycle.
+  constant C_FRAME_QUEUE_DEPTH : integer := log2(C_KERNEL_SIZE ** 2 * C_INPUT_CHANNEL) + 4;
+
+  signal sl_sof_slice     : std_logic := '0';
+  signal sl_eof_slice     : std_logic := '0';
+  signal sl_sof_slice_out : std_logic := '0';
+  signal sl_sof_out       : std_logic := '0';
+  signal sl_eof_out       : std_logic := '0';
+
+  -- weights and thresholds of all output channel
   signal a_weights   : t_slv_array_1d(0 to C_OUTPUT_CHANNEL - 1)(C_KERNEL_SIZE * C_KERNEL_SIZE * C_INPUT_CHANNEL - 1 downto 0);
   signal a_threshold : t_slv_array_1d(0 to C_OUTPUT_CHANNEL - 1)(C_POST_CONVOLUTION_BITWIDTH - 1 downto 0);
 
+  -- weights and thresholds of the currently processed output channel
+  signal a_weights_slice   : t_slv_array_1d(0 to C_PARALLEL_OUTPUT_CHANNEL - 1)(C_KERNEL_SIZE * C_KERNEL_SIZE * C_INPUT_CHANNEL - 1 downto 0);
+  signal a_threshold_slice : t_slv_array_1d(0 to C_PARALLEL_OUTPUT_CHANNEL - 1)(C_POST_CONVOLUTION_BITWIDTH - 1 downto 0);
+
+  -- Index of the currently processed output channel slice. It differs between
+  -- convolution input, batch normalization input and output.
+  signal int_slice_weights        : integer range 0 to C_FOLDING - 1 := 0;
+  signal int_slice_weights_next   : integer range 0 to C_FOLDING - 1 := 0;
+  signal int_slice_threshold      : integer range 0 to C_FOLDING - 1 := 0;
+  signal int_slice_threshold_next : integer range 0 to C_FOLDING - 1 := 0;
+  signal int_slice_out            : integer range 0 to C_FOLDING - 1 := 0;
+
+  constant C_SLICE_ADDR_WIDTH : integer := maximum(1, log2(C_FOLDING));
+
+  signal slv_weights_rom   : std_logic_vector(C_PARALLEL_OUTPUT_CHANNEL * C_KERNEL_SIZE * C_KERNEL_SIZE * C_INPUT_CHANNEL - 1 downto 0);
+  signal slv_threshold_rom : std_logic_vector(C_PARALLEL_OUTPUT_CHANNEL * C_POST_CONVOLUTION_BITWIDTH - 1 downto 0);
+
+  function get_pad_value return std_logic_vector is
+    variable v_pad_value : std_logic_vector(islv_data'range);
+  begin
+
+    for input_channel in 0 to C_INPUT_CHANNEL - 1 loop
+      v_pad_value((input_channel + 1) * C_INPUT_CHANNEL_BITWIDTH - 1 downto input_channel * C_INPUT_CHANNEL_BITWIDTH) := std_logic_vector(to_unsigned(C_PAD_VALUE, C_INPUT_CHANNEL_BITWIDTH));
+    end loop;
+
+    return v_pad_value;
+  end function get_pad_value;
+
 begin
 
+  assert C_OUTPUT_CHANNEL mod C_FOLDING = 0
+    report "invalid folding factor " & to_string(C_FOLDING)
+    severity failure;
+
+  -- The window gets repeated C_FOLDING times.
   i_window_ctrl : entity window_ctrl_lib.window_ctrl
     generic map (
       C_BITWIDTH    => C_INPUT_CHANNEL * C_INPUT_CHANNEL_BITWIDTH,
       C_CH_IN       => 1,
-      C_CH_OUT      => 1,
+      C_CH_OUT      => C_FOLDING,
       C_IMG_WIDTH   => C_IMG_WIDTH,
       C_IMG_HEIGHT  => C_IMG_HEIGHT,
+      C_PAD         => C_PAD,
+      C_PAD_VALUE   => get_pad_value,
       C_KERNEL_SIZE => C_KERNEL_SIZE,
       C_STRIDE      => C_STRIDE,
       C_PARALLEL_CH => 1
@@ -86,13 +158,98 @@ begin
       isl_clk   => isl_clk,
       isl_start => isl_start,
       isl_valid => isl_valid,
+      isl_sof   => isl_sof,
+      isl_eof   => isl_eof,
       islv_data => islv_data,
       oslv_data => slv_data_window_ctrl,
       osl_valid => sl_valid_window_ctrl,
-      osl_rdy   => open
+      osl_sof   => sl_sof_window_ctrl,
+      osl_eof   => sl_eof_window_ctrl,
+      osl_rdy   => osl_rdy
     );
 
-  gen_convolution : for output_channel in 0 to C_OUTPUT_CHANNEL - 1 generate
+  gen_parameter : for output_channel in 0 to C_OUTPUT_CHANNEL - 1 generate
+    -- output channel increments fastest
+    a_weights(output_channel) <= get_fastest_increment(islv_weights, output_channel, C_OUTPUT_CHANNEL);
+    -- TODO: output channel increments fastest, not slowest
+    a_threshold(output_channel) <= get_slice(islv_threshold, output_channel, C_POST_CONVOLUTION_BITWIDTH);
+  end generate gen_parameter;
+
+  -- The index of the next cycle is needed to read the rom in time.
+  int_slice_weights_next <= 0 when isl_start = '1' else
+                            int_slice_weights when sl_valid_window_ctrl = '0' else
+                            0 when int_slice_weights = C_FOLDING - 1 else
+                            int_slice_weights + 1;
+
+  int_slice_threshold_next <= 0 when isl_start = '1' else
+                              int_slice_threshold when slv_valid_convolution(0) = '0' else
+                              0 when int_slice_threshold = C_FOLDING - 1 else
+                              int_slice_threshold + 1;
+
+  proc_slice_counter : process (isl_clk) is
+  begin
+
+    if (rising_edge(isl_clk)) then
+      int_slice_weights   <= int_slice_weights_next;
+      int_slice_threshold <= int_slice_threshold_next;
+    end if;
+
+  end process proc_slice_counter;
+
+  gen_weights : if C_WEIGHTS_FILE = "" generate
+
+    gen_weights_slice : for output_channel in 0 to C_PARALLEL_OUTPUT_CHANNEL - 1 generate
+      a_weights_slice(output_channel) <= a_weights(int_slice_weights * C_PARALLEL_OUTPUT_CHANNEL + output_channel);
+    end generate gen_weights_slice;
+
+  else generate
+
+    -- one cycle delay, i. e. the rom output matches the current slice
+    i_weights_rom : entity util.brom
+      generic map (
+        C_DATA_WIDTH => slv_weights_rom'length,
+        C_ADDR_WIDTH => C_SLICE_ADDR_WIDTH,
+        C_INIT_FILE  => C_WEIGHTS_FILE
+      )
+      port map (
+        isl_clk   => isl_clk,
+        islv_addr => std_logic_vector(to_unsigned(int_slice_weights_next, C_SLICE_ADDR_WIDTH)),
+        oslv_data => slv_weights_rom
+      );
+
+    gen_weights_slice : for output_channel in 0 to C_PARALLEL_OUTPUT_CHANNEL - 1 generate
+      a_weights_slice(output_channel) <= get_slice(slv_weights_rom, output_channel, a_weights_slice(0)'length);
+    end generate gen_weights_slice;
+
+  end generate gen_weights;
+
+  gen_threshold : if C_THRESHOLDS_FILE = "" generate
+
+    gen_threshold_slice : for output_channel in 0 to C_PARALLEL_OUTPUT_CHANNEL - 1 generate
+      a_threshold_slice(output_channel) <= a_threshold(int_slice_threshold * C_PARALLEL_OUTPUT_CHANNEL + output_channel);
+    end generate gen_threshold_slice;
+
+  else generate
+
+    i_threshold_rom : entity util.brom
+      generic map (
+        C_DATA_WIDTH => slv_threshold_rom'length,
+        C_ADDR_WIDTH => C_SLICE_ADDR_WIDTH,
+        C_INIT_FILE  => C_THRESHOLDS_FILE
+      )
+      port map (
+        isl_clk   => isl_clk,
+        islv_addr => std_logic_vector(to_unsigned(int_slice_threshold_next, C_SLICE_ADDR_WIDTH)),
+        oslv_data => slv_threshold_rom
+      );
+
+    gen_threshold_slice : for output_channel in 0 to C_PARALLEL_OUTPUT_CHANNEL - 1 generate
+      a_threshold_slice(output_channel) <= get_slice(slv_threshold_rom, output_channel, C_POST_CONVOLUTION_BITWIDTH);
+    end generate gen_threshold_slice;
+
+  end generate gen_threshold;
+
+  gen_convolution : for output_channel in 0 to C_PARALLEL_OUTPUT_CHANNEL - 1 generate
 
     i_convolution : entity bnn_lib.convolution
       generic map (
@@ -104,14 +261,11 @@ begin
         isl_clk      => isl_clk,
         isl_valid    => sl_valid_window_ctrl,
         islv_data    => slv_data_window_ctrl,
-        islv_weights => a_weights(output_channel),
+        islv_weights => a_weights_slice(output_channel),
         oslv_data    => a_data_convolution(output_channel),
         osl_valid    => slv_valid_convolution(output_channel)
       );
 
-    -- output channel increments fastest
-    a_weights(output_channel) <= get_fastest_increment(islv_weights, output_channel, C_OUTPUT_CHANNEL);
-
     gen_batch_normalization : if C_OUTPUT_CHANNEL_BITWIDTH = 1 generate
 
       i_batch_normalization : entity bnn_lib.batch_normalization
@@ -123,13 +277,11 @@ begin
           isl_clk        => isl_clk,
           isl_valid      => slv_valid_convolution(output_channel),
           islv_data      => a_data_convolution(output_channel),
-          islv_threshold => a_threshold(output_channel),
+          islv_threshold => a_threshold_slice(output_channel),
           oslv_data      => a_data_batch_normalization(output_channel),
           osl_valid      => slv_valid_batch_normalization(output_channel)
         );
 
-      -- TODO: output channel increments fastest, not slowest
-      a_threshold(output_channel)                                                                                                          <= get_slice(islv_threshold, output_channel, C_POST_CONVOLUTION_BITWIDTH);
       slv_data_batch_normalization((output_channel + 1) * C_OUTPUT_CHANNEL_BITWIDTH - 1 downto output_channel * C_OUTPUT_CHANNEL_BITWIDTH) <= a_data_batch_normalization(output_channel);
     else generate
       slv_data_batch_normalization((output_channel + 1) * C_OUTPUT_CHANNEL_BITWIDTH - 1 downto output_channel * C_OUTPUT_CHANNEL_BITWIDTH) <= std_logic_vector(resize(unsigned(a_data_convolution(output_channel)), C_OUTPUT_CHANNEL_BITWIDTH));
@@ -138,7 +290,66 @@ begin
 
   end generate gen_convolution;
 
-  oslv_data <= slv_data_batch_normalization;
-  osl_valid <= slv_valid_batch_normalization(0);
+  -- The windows keep their order. Thus the frame flags can be queued.
+  i_frame_queue : entity util.frame_queue
+    generic map (
+      C_DEPTH => C_FRAME_QUEUE_DEPTH
+    )
+    port map (
+      isl_clk   => isl_clk,
+      isl_reset => isl_start,
+      isl_push  => sl_valid_window_ctrl,
+      isl_sof   => sl_sof_window_ctrl,
+      isl_eof   => sl_eof_window_ctrl,
+      isl_pop   => slv_valid_batch_normalization(0),
+      osl_sof   => sl_sof_slice,
+      osl_eof   => sl_eof_slice
+    );
+
+  gen_output : if C_FOLDING = 1 generate
+    slv_data_out <= slv_data_batch_normalization;
+    sl_valid_out <= slv_valid_batch_normalization(0);
+    sl_sof_out   <= sl_sof_slice;
+    sl_eof_out   <= sl_eof_slice;
+  else generate
+
+    -- Assemble the output channel slices. The output is valid after the last slice.
+    proc_output : process (isl_clk) is
+    begin
+
+      if (rising_edge(isl_clk)) then
+        sl_valid_out <= '0';
+        sl_sof_out   <= '0';
+        sl_eof_out   <= '0';
+
+        if (isl_start = '1') then
+          int_slice_out <= 0;
+        elsif (slv_valid_batch_normalization(0) = '1') then
+          assign_slice(slv_data_out, int_slice_out, slv_data_batch_normalization);
+
+          -- The start of frame belongs to the first slice, the end of frame to the last slice.
+          if (int_slice_out = 0) then
+            sl_sof_slice_out <= sl_sof_slice;
+          end if;
+
+          if (int_slice_out /= C_FOLDING - 1) then
+            int_slice_out <= int_slice_out + 1;
+          else
+            int_slice_out <= 0;
+            sl_valid_out  <= '1';
+            sl_sof_out    <= sl_sof_slice_out;
+            sl_eof_out    <= sl_eof_slice;
+          end if;
+        end if;
+      end if;
+
+    end process proc_output;
+
+  end generate gen_output;
+
+  oslv_data <= slv_data_out;
+  osl_valid <= sl_valid_out;
+  osl_sof   <= sl_sof_out;
+  osl_eof   <= sl_eof_out;
 
 end architecture behavioral;
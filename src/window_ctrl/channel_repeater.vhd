@@ -19,9 +19,13 @@ entity channel_repeater is
   port (
     isl_clk   : in    std_logic;
     isl_valid : in    std_logic;
+    isl_sof   : in    std_logic;
+    isl_eof   : in    std_logic;
     ia_data   : in    t_slv_array_2d(0 to C_KERNEL_SIZE - 1, 0 to C_KERNEL_SIZE - 1)(C_BITWIDTH - 1 downto 0);
     oa_data   : out   t_kernel_array(0 to C_PARALLEL_CH - 1)(0 to C_KERNEL_SIZE - 1, 0 to C_KERNEL_SIZE - 1)(C_BITWIDTH - 1 downto 0);
     osl_valid : out   std_logic;
+    osl_sof   : out   std_logic;
+    osl_eof   : out   std_logic;
     osl_rdy   : out   std_logic
   );
 end entity channel_repeater;
@@ -33,6 +37,11 @@ architecture behavior of channel_repeater is
   signal int_ch_out_cnt : integer range 0 to C_CH - 1 := 0;
   signal int_repeat_cnt : integer range 0 to C_REPEAT - 1 := 0;
 
+  -- The start of frame belongs to the first and the end of frame to the last output of a burst.
+  signal sl_sof_in  : std_logic := '0';
+  signal sl_sof_out : std_logic := '0';
+  signal sl_eof_out : std_logic := '0';
+
   signal a_ch : t_kernel_array(0 to C_CH - 1)(0 to C_KERNEL_SIZE - 1, 0 to C_KERNEL_SIZE - 1)(C_BITWIDTH - 1 downto 0) := (others => (others => (others => (others => '0'))));
 
 begin
@@ -101,12 +110,18 @@ begin
 
     if (rising_edge(isl_clk)) then
       if (isl_valid = '1') then
+        if (int_ch_in_cnt = 0) then
+          sl_sof_in <= isl_sof;
+        end if;
+
         -- for C_PARALLEL_CH = 1 the input can get directly forwarded
         if (C_PARALLEL_CH /= 1 and int_ch_in_cnt /= C_CH - 1) then
           int_ch_in_cnt <= int_ch_in_cnt + 1;
         else
           int_ch_in_cnt <= 0;
           sl_valid_out  <= '1';
+          sl_sof_out    <= isl_sof when int_ch_in_cnt = 0 else sl_sof_in;
+          sl_eof_out    <= isl_eof;
         end if;
       end if;
 
@@ -130,6 +145,10 @@ begin
 
   osl_rdy   <= not (sl_valid_out or isl_valid);
   osl_valid <= sl_valid_out;
+  osl_sof   <= sl_sof_out when sl_valid_out = '1' and int_ch_out_cnt = 0 and int_repeat_cnt = 0 else
+               '0';
+  osl_eof   <= sl_eof_out when sl_valid_out = '1' and int_ch_out_cnt = C_CH - C_PARALLEL_CH and int_repeat_cnt = C_REPEAT - 1 else
+               '0';
   oa_data   <= a_ch(0 to C_PARALLEL_CH - 1);
 
 end architecture behavior;
@@ -22,9 +22,8 @@ entity window_ctrl is
     C_IMG_HEIGHT : integer range 1 to 512 := 8; -- image height
 
     -- padding
-    -- TODO: not yet supported
-    C_PAD       : integer range 0 to 1   := 0; -- padding for each side
-    C_PAD_VALUE : integer range 0 to 255 := 0; -- (constant) value to pad
+    C_PAD       : integer range 0 to 3                       := 0;               -- padding for each side
+    C_PAD_VALUE : std_logic_vector(C_BITWIDTH - 1 downto 0) := (others => '0'); -- (constant) value to pad
 
     -- kernel properties
     C_KERNEL_SIZE : integer range 1 to 7 := 3; -- kernel size (squared)
@@ -37,19 +36,53 @@ entity window_ctrl is
     isl_clk   : in    std_logic;
     isl_start : in    std_logic;
     isl_valid : in    std_logic;
+    -- start and end of frame, valid together with isl_valid
+    isl_sof   : in    std_logic;
+    isl_eof   : in    std_logic;
     islv_data : in    std_logic_vector(C_BITWIDTH - 1 downto 0);
     oslv_data : out   std_logic_vector(C_PARALLEL_CH * C_KERNEL_SIZE * C_KERNEL_SIZE * C_BITWIDTH - 1 downto 0);
     osl_valid : out   std_logic;
+    osl_sof   : out   std_logic;
+    osl_eof   : out   std_logic;
     osl_rdy   : out   std_logic
   );
 end entity window_ctrl;
 
 architecture behavioral of window_ctrl is
 
+  -- The bottom padding rows get flushed after the last input pixel.
+  -- Thus the counter includes the padding rows and the first pixels of the next row.
+  function get_counter_height return integer is
+  begin
+
+    if (C_PAD = 0) then
+      return C_IMG_HEIGHT;
+    end if;
+
+    return C_IMG_HEIGHT + C_PAD + 1;
+  end function get_counter_height;
+
+  constant C_COUNTER_HEIGHT : integer := get_counter_height;
+
+  -- bottom right pixel of the first and last window, including the padding
+  constant C_FIRST_POSITION : integer := C_KERNEL_SIZE - 1 - C_PAD;
+  constant C_LAST_ROW       : integer := C_FIRST_POSITION + C_STRIDE * ((C_IMG_HEIGHT + 2 * C_PAD - C_KERNEL_SIZE) / C_STRIDE);
+  constant C_LAST_COL       : integer := C_FIRST_POSITION + C_STRIDE * ((C_IMG_WIDTH + 2 * C_PAD - C_KERNEL_SIZE) / C_STRIDE);
+
   -- counter
   signal int_col       : integer range 0 to C_IMG_WIDTH - 1 := 0;
-  signal int_row       : integer range 0 to C_IMG_HEIGHT - 1 := 0;
-  signal int_pixel_cnt : integer range 0 to C_IMG_HEIGHT * C_IMG_WIDTH := 0;
+  signal int_row       : integer range 0 to C_COUNTER_HEIGHT - 1 := 0;
+  signal int_ch        : integer range 0 to C_CH_IN - 1 := 0;
+  signal int_pixel_cnt : integer range 0 to C_COUNTER_HEIGHT * C_IMG_WIDTH := 0;
+  signal sl_cnt_reset  : std_logic := '0';
+
+  -- input and flushed padding data
+  signal sl_flush       : std_logic := '0';
+  signal sl_flush_valid : std_logic := '0';
+  signal sl_flush_last  : std_logic := '0';
+  signal sl_valid_in    : std_logic := '0';
+  signal slv_data_in    : std_logic_vector(C_BITWIDTH - 1 downto 0) := (others => '0');
+  signal sl_rdy         : std_logic := '0';
 
   -- for line buffer
   signal sl_lb_valid_out : std_logic := '0';
@@ -65,11 +98,25 @@ architecture behavioral of window_ctrl is
   signal sl_selector_valid_out    : std_logic := '0';
   signal sl_selector_valid_out_d1 : std_logic := '0';
   signal sl_selector_valid_out_d2 : std_logic := '0';
+  signal sl_selector_sof_out      : std_logic := '0';
+  signal sl_selector_sof_out_d1   : std_logic := '0';
+  signal sl_selector_sof_out_d2   : std_logic := '0';
+  signal sl_selector_eof_out      : std_logic := '0';
+  signal sl_selector_eof_out_d1   : std_logic := '0';
+  signal sl_selector_eof_out_d2   : std_logic := '0';
   signal a_selector_data_in       : t_slv_array_2d(0 to C_KERNEL_SIZE - 1, 0 to C_KERNEL_SIZE - 1)(C_BITWIDTH - 1 downto 0) := (others => (others => (others => '0')));
   signal a_selector_data_out      : t_slv_array_2d(0 to C_KERNEL_SIZE - 1, 0 to C_KERNEL_SIZE - 1)(C_BITWIDTH - 1 downto 0) := (others => (others => (others => '0')));
 
+  -- The masked columns and rows of the window get replaced by the pad value.
+  signal slv_mask_col    : std_logic_vector(0 to C_KERNEL_SIZE - 1) := (others => '0');
+  signal slv_mask_row    : std_logic_vector(0 to C_KERNEL_SIZE - 1) := (others => '0');
+  signal slv_mask_col_d1 : std_logic_vector(0 to C_KERNEL_SIZE - 1) := (others => '0');
+  signal slv_mask_row_d1 : std_logic_vector(0 to C_KERNEL_SIZE - 1) := (others => '0');
+
   -- for channel repeater
   signal sl_repeater_valid_out : std_logic := '0';
+  signal sl_repeater_sof_out   : std_logic := '0';
+  signal sl_repeater_eof_out   : std_logic := '0';
   signal a_repeater_data_out   : t_kernel_array(0 to C_PARALLEL_CH - 1)(0 to C_KERNEL_SIZE - 1, 0 to C_KERNEL_SIZE - 1)(C_BITWIDTH - 1 downto 0) := (others => (others => (others => (others => '0'))));
   signal sl_repeater_rdy       : std_logic := '0';
 
@@ -84,8 +131,16 @@ begin
       severity failure;
 
     sl_selector_valid_out_d2  <= isl_valid;
+    sl_selector_sof_out_d2    <= isl_sof;
+    sl_selector_eof_out_d2    <= isl_eof;
     a_selector_data_out(0, 0) <= islv_data;
   else generate
+
+    -- The window must not contain padding of both sides.
+    assert C_PAD = 0 or (2 * C_PAD < C_KERNEL_SIZE and C_KERNEL_SIZE <= C_IMG_WIDTH)
+      report "invalid padding " & to_string(C_PAD)
+      severity failure;
+
     -- one cycle delay
     i_line_buffer : entity window_ctrl_lib.line_buffer(ram)
       generic map (
@@ -96,8 +151,8 @@ begin
       )
       port map (
         isl_clk   => isl_clk,
-        isl_valid => isl_valid,
-        islv_data => islv_data,
+        isl_valid => sl_valid_in,
+        islv_data => slv_data_in,
         oa_data   => a_lb_data_out,
         osl_valid => sl_lb_valid_out
       );
@@ -126,29 +181,98 @@ begin
     --    2. every C_STRIDE row
     --    3. every C_STRIDE column
     --    4. when the window is not shifted at end/start of line
+    -- With padding, the first C_PAD pixels of a row complete the windows
+    -- at the end of the previous row. The padded rows and columns get masked.
     -------------------------------------------------------
-    sl_trim <= '1' when int_pixel_cnt < (C_KERNEL_SIZE - 1) * C_IMG_WIDTH + C_KERNEL_SIZE - 1 else
+    sl_trim <= '1' when int_pixel_cnt < (C_KERNEL_SIZE - 1 - C_PAD) * C_IMG_WIDTH + C_KERNEL_SIZE - 1 - C_PAD else
                '0';
 
     proc_selector : process (isl_clk) is
+
+      -- bottom right pixel of the window, including the padding
+      variable v_row : integer range -1 to C_COUNTER_HEIGHT - 1;
+      variable v_col : integer range 0 to C_IMG_WIDTH + C_PAD - 1;
+
     begin
 
       if (rising_edge(isl_clk)) then
+        if (int_col < C_PAD) then
+          v_row := int_row - 1;
+          v_col := int_col + C_IMG_WIDTH;
+        else
+          v_row := int_row;
+          v_col := int_col;
+        end if;
+
         -- The delay is caused by line and window buffer.
         sl_selector_valid_out_d1 <= sl_selector_valid_out;
         sl_selector_valid_out_d2 <= sl_selector_valid_out_d1;
+        sl_selector_sof_out_d1   <= sl_selector_sof_out;
+        sl_selector_sof_out_d2   <= sl_selector_sof_out_d1;
+        sl_selector_eof_out_d1   <= sl_selector_eof_out;
+        sl_selector_eof_out_d2   <= sl_selector_eof_out_d1;
 
-        if (isl_valid = '1' and                                           -- ??
+        if (sl_valid_in = '1' and                                         -- ??
             sl_trim = '0' and
-            (int_row + 1 - C_KERNEL_SIZE + C_STRIDE) mod C_STRIDE = 0 and
-            (int_col + 1 - C_KERNEL_SIZE + C_STRIDE) mod C_STRIDE = 0 and
-            int_col + 1 > C_KERNEL_SIZE - 1) then
+            (v_row + 1 - C_KERNEL_SIZE + C_PAD + C_STRIDE) mod C_STRIDE = 0 and
+            (v_col + 1 - C_KERNEL_SIZE + C_PAD + C_STRIDE) mod C_STRIDE = 0 and
+            v_row + 1 > C_KERNEL_SIZE - 1 - C_PAD and
+            v_row < C_IMG_HEIGHT + C_PAD and
+            v_col + 1 > C_KERNEL_SIZE - 1 - C_PAD) then
           sl_selector_valid_out <= '1';
         else
           sl_selector_valid_out <= '0';
         end if;
 
-        a_selector_data_out <= a_selector_data_in;
+        -- The frame starts with the first and ends with the last window.
+        if (sl_valid_in = '1' and
+            sl_trim = '0' and
+            v_row = C_FIRST_POSITION and
+            v_col = C_FIRST_POSITION and
+            int_ch = 0) then
+          sl_selector_sof_out <= '1';
+        else
+          sl_selector_sof_out <= '0';
+        end if;
+
+        if (sl_valid_in = '1' and
+            v_row = C_LAST_ROW and
+            v_col = C_LAST_COL and
+            int_ch = C_CH_IN - 1) then
+          sl_selector_eof_out <= '1';
+        else
+          sl_selector_eof_out <= '0';
+        end if;
+
+        if (C_PAD > 0) then
+          -- Columns left or right of the image and rows above the image.
+          -- The rows below the image are flushed with the pad value already.
+          for i in 0 to C_KERNEL_SIZE - 1 loop
+            if (v_col - i < 0 or v_col - i >= C_IMG_WIDTH) then
+              slv_mask_col(i) <= '1';
+            else
+              slv_mask_col(i) <= '0';
+            end if;
+
+            if (v_row - i < 0) then
+              slv_mask_row(i) <= '1';
+            else
+              slv_mask_row(i) <= '0';
+            end if;
+          end loop;
+        end if;
+        slv_mask_col_d1 <= slv_mask_col;
+        slv_mask_row_d1 <= slv_mask_row;
+
+        for col in 0 to C_KERNEL_SIZE - 1 loop
+          for row in 0 to C_KERNEL_SIZE - 1 loop
+            if (slv_mask_col_d1(col) = '1' or slv_mask_row_d1(row) = '1') then
+              a_selector_data_out(col, row) <= C_PAD_VALUE;
+            else
+              a_selector_data_out(col, row) <= a_selector_data_in(col, row);
+            end if;
+          end loop;
+        end loop;
       end if;
 
     end process proc_selector;
@@ -169,32 +293,97 @@ begin
       port map (
         isl_clk   => isl_clk,
         isl_valid => sl_selector_valid_out_d2,
+        isl_sof   => sl_selector_sof_out_d2,
+        isl_eof   => sl_selector_eof_out_d2,
         ia_data   => a_selector_data_out,
         oa_data   => a_repeater_data_out,
         osl_valid => sl_repeater_valid_out,
+        osl_sof   => sl_repeater_sof_out,
+        osl_eof   => sl_repeater_eof_out,
         osl_rdy   => sl_repeater_rdy
       );
 
   else generate
     sl_repeater_valid_out  <= sl_selector_valid_out_d2;
+    sl_repeater_sof_out    <= sl_selector_sof_out_d2;
+    sl_repeater_eof_out    <= sl_selector_eof_out_d2;
     a_repeater_data_out(0) <= a_selector_data_out;
     sl_repeater_rdy        <= '1';
   end generate gen_channel_repeater;
 
+  gen_flush : if C_PAD > 0 generate
+    -- After the last input pixel (i. e. the end of frame), C_PAD rows and C_PAD pixels
+    -- get flushed with the pad value. Like the input, they are only sent when the
+    -- window control is ready.
+    sl_flush_last <= '1' when sl_valid_in = '1' and
+                              int_row = C_COUNTER_HEIGHT - 1 and
+                              int_col = C_PAD - 1 and
+                              int_ch = C_CH_IN - 1 else
+                     '0';
+
+    proc_flush : process (isl_clk) is
+    begin
+
+      if (rising_edge(isl_clk)) then
+        if (isl_start = '1' or sl_flush_last = '1') then
+          sl_flush <= '0';
+        elsif (isl_valid = '1' and
+               (isl_eof = '1' or
+               (int_row = C_IMG_HEIGHT - 1 and
+               int_col = C_IMG_WIDTH - 1 and
+               int_ch = C_CH_IN - 1))) then
+          sl_flush <= '1';
+        end if;
+
+        sl_flush_valid <= sl_flush and sl_rdy and not isl_start;
+      end if;
+
+    end process proc_flush;
+
+    -- synthesis translate off
+    -- The input isn't ready while flushing. Input data would be replaced by the pad
+    -- value, e. g. if the next frame doesn't wait for osl_rdy.
+    proc_flush_check : process (isl_clk) is
+    begin
+
+      if (rising_edge(isl_clk)) then
+        assert not (isl_valid = '1' and sl_flush = '1')
+          report "input while flushing the padding"
+          severity failure;
+      end if;
+
+    end process proc_flush_check;
+
+    -- synthesis translate on
+
+  else generate
+    sl_flush       <= '0';
+    sl_flush_valid <= '0';
+    -- Without padding, the frame ends with the last input pixel.
+    sl_flush_last <= isl_valid and isl_eof;
+  end generate gen_flush;
+
+  sl_valid_in <= isl_valid or sl_flush_valid;
+  slv_data_in <= C_PAD_VALUE when sl_flush = '1' else
+                 islv_data;
+
+  -- The counter starts again after the flushed pixels, i. e. at the next frame.
+  sl_cnt_reset <= isl_start or sl_flush_last;
+
   i_pixel_counter_in : entity util.pixel_counter(single_process)
     generic map (
-      C_HEIGHT  => C_IMG_HEIGHT,
+      C_HEIGHT  => C_COUNTER_HEIGHT,
       C_WIDTH   => C_IMG_WIDTH,
       C_CHANNEL => C_CH_IN
     )
     port map (
       isl_clk      => isl_clk,
-      isl_reset    => isl_start,
-      isl_valid    => isl_valid,
+      isl_reset    => sl_cnt_reset,
+      isl_valid    => sl_valid_in,
       oint_pixel   => int_pixel_cnt,
       oint_row     => int_row,
       oint_column  => int_col,
-      oint_channel => open
+      oint_channel => int_ch
     );
 
   -- synthesis translate off
@@ -219,9 +408,13 @@ begin
 
   oslv_data <= array_to_slv(a_repeater_data_out);
   osl_valid <= sl_repeater_valid_out;
+  osl_sof   <= sl_repeater_sof_out;
+  osl_eof   <= sl_repeater_eof_out;
   -- Use isl_valid, sl_lb_valid_out and sl_wb_valid_out to get three less cycles of the ready signal.
   -- Else too much data would get sent in.
-  osl_rdy <= '1' when sl_trim else
-             sl_repeater_rdy and not (isl_valid or sl_lb_valid_out or sl_wb_valid_out);
+  sl_rdy  <= sl_repeater_rdy and not (sl_valid_in or sl_lb_valid_out or sl_wb_valid_out);
+  osl_rdy <= '0' when sl_flush else
+             '1' when sl_trim else
+             sl_rdy;
 
 end architecture behavioral;
@@ -21,18 +21,27 @@ entity window_maximum_pooling is
     isl_clk   : in    std_logic;
     isl_start : in    std_logic;
     isl_valid : in    std_logic;
+    -- start and end of frame, valid together with isl_valid
+    isl_sof   : in    std_logic;
+    isl_eof   : in    std_logic;
     islv_data : in    std_logic_vector(C_CHANNEL - 1 downto 0);
     oslv_data : out   std_logic_vector(C_CHANNEL - 1 downto 0);
-    osl_valid : out   std_logic
+    osl_valid : out   std_logic;
+    osl_sof   : out   std_logic;
+    osl_eof   : out   std_logic
   );
 end entity window_maximum_pooling;
 
 architecture behavioral of window_maximum_pooling is
 
   signal sl_valid_window_ctrl : std_logic := '0';
+  signal sl_sof_window_ctrl   : std_logic := '0';
+  signal sl_eof_window_ctrl   : std_logic := '0';
   signal slv_data_window_ctrl : std_logic_vector(C_KERNEL_SIZE * C_KERNEL_SIZE * C_CHANNEL - 1 downto 0);
 
   signal sl_valid_maximum_pooling : std_logic := '0';
+  signal sl_sof_maximum_pooling   : std_logic := '0';
+  signal sl_eof_maximum_pooling   : std_logic := '0';
   signal slv_data_maximum_pooling : std_logic_vector(oslv_data'range);
 
 begin
@@ -40,6 +49,8 @@ begin
   gen_no_maximum_pooling : if C_KERNEL_SIZE = 0 generate
     slv_data_maximum_pooling <= islv_data;
     sl_valid_maximum_pooling <= isl_valid;
+    sl_sof_maximum_pooling   <= isl_sof;
+    sl_eof_maximum_pooling   <= isl_eof;
   else generate
 
     i_window_ctrl : entity window_ctrl_lib.window_ctrl
@@ -57,9 +68,13 @@ begin
         isl_clk   => isl_clk,
         isl_start => isl_start,
         isl_valid => isl_valid,
+        isl_sof   => isl_sof,
+        isl_eof   => isl_eof,
         islv_data => islv_data,
         oslv_data => slv_data_window_ctrl,
         osl_valid => sl_valid_window_ctrl,
+        osl_sof   => sl_sof_window_ctrl,
+        osl_eof   => sl_eof_window_ctrl,
         osl_rdy   => open
       );
 
@@ -76,9 +91,22 @@ begin
         osl_valid => sl_valid_maximum_pooling
       );
 
+    -- The maximum pooling has a delay of one cycle.
+    proc_frame_flags : process (isl_clk) is
+    begin
+
+      if (rising_edge(isl_clk)) then
+        sl_sof_maximum_pooling <= sl_sof_window_ctrl;
+        sl_eof_maximum_pooling <= sl_eof_window_ctrl;
+      end if;
+
+    end process proc_frame_flags;
+
   end generate gen_no_maximum_pooling;
 
   oslv_data <= slv_data_maximum_pooling;
   osl_valid <= sl_valid_maximum_pooling;
+  osl_sof   <= sl_sof_maximum_pooling;
+  osl_eof   <= sl_eof_maximum_pooling;
 
 end architecture behavioral;